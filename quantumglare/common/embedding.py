@@ -1,6 +1,18 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
 import time
 
 import minorminer
+import numpy as np
+from scipy import sparse
+
+# parameters of minorminer.find_embedding that do not affect the embedding
+_NON_EMBEDDING_PARAMETERS = ('verbose', 'interactive')
+
+logger = logging.getLogger(__name__)
 
 
 def find_embedding(S, T, **kwargs):
@@ -17,8 +29,254 @@ def find_embedding(S, T, **kwargs):
     :return: an embedding
 
     """
-    t0 = time.time()
+    t0 = time.perf_counter()
     embedding = minorminer.find_embedding(S, T, **kwargs)
-    t1 = time.time()
-    print(f"\nTime to get embedding: {t1-t0:.2f} s")
+    t1 = time.perf_counter()
+    logger.info('time to get embedding: %.2f s', t1 - t0)
     return embedding
+
+
+def _get_canonical_edges(edges) -> list:
+    """Get the edges sorted, each one with its labels sorted, so that the
+    result does not depend on the order in which the edges are listed.
+
+    :param edges: an iterable of label pairs
+
+    :return: sorted list of sorted label pairs
+
+    """
+    return sorted(
+        {tuple(sorted((str(u), str(v)))) for u, v in edges}
+    )
+
+
+def get_edges_digest(edges) -> str:
+    """Get a digest of a graph that does not depend on the order in which its
+    edges are listed.
+
+    :param edges: an iterable of label pairs
+
+    :return: hexadecimal SHA-256 digest
+
+    """
+    content = json.dumps(_get_canonical_edges(edges))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_embedding_key(S, T, target_digest: str = None, **kwargs) -> str:
+    """Get the key identifying the embedding of the source S into the target
+    T obtained with the given minorminer parameters.
+
+    :param S: an iterable of label pairs representing the edges in the source
+    graph
+    :param T: an iterable of label pairs representing the edges in the target
+    graph
+    :param target_digest: digest of T computed with get_edges_digest, computed
+    from T if not set
+    :param kwargs: keyword arguments passed to minorminer
+
+    :return: hexadecimal SHA-256 digest
+
+    """
+    parameters = {
+        k: v for k, v in kwargs.items() if k not in _NON_EMBEDDING_PARAMETERS
+    }
+    content = json.dumps(
+        {
+            'source': get_edges_digest(S),
+            'target': target_digest or get_edges_digest(T),
+            'parameters': parameters,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _read_cached_embedding(filename: str):
+    """Read an embedding written by _write_cached_embedding.
+
+    :param filename: name of the cache file
+
+    :return: a tuple made of the embedding and the time it took to find it,
+    None if the file does not exist
+
+    """
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as f:
+        cached = json.load(f)
+    return cached['embedding'], cached['time_embedding']
+
+
+def _write_cached_embedding(
+        filename: str, embedding: dict, time_embedding: float
+) -> None:
+    """Write an embedding to the cache. The file is written to a temporary
+    file first and then renamed, so that a concurrent reader never sees a
+    partial file.
+
+    :param filename: name of the cache file
+    :param embedding: embedding
+    :param time_embedding: time it took to find the embedding
+
+    :return:
+
+    """
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(
+            {
+                'embedding': {
+                    str(k): list(v) for k, v in embedding.items()
+                },
+                'time_embedding': time_embedding,
+            },
+            f,
+        )
+    os.replace(tmp_filename, filename)
+    return None
+
+
+def find_embedding_cached(
+        S,
+        T,
+        cache_dir: str = None,
+        target_digest: str = None,
+        **kwargs
+) -> tuple:
+    """Return an embedding for the edges S of the source and the edges T of
+    the target, reading it from the cache in cache_dir when the same source,
+    target and minorminer parameters have already been embedded.
+
+    The source labels are stored as strings, so they must be strings to be
+    found again in the embedding read from the cache.
+
+    :param S: an iterable of label pairs representing the edges in the source
+    graph
+    :param T: an iterable of label pairs representing the edges in the target
+    graph
+    :param cache_dir: directory of the cache, the cache is not used if not set
+    :param target_digest: digest of T computed with get_edges_digest, computed
+    from T if not set
+    :param kwargs: keyword arguments passed to minorminer
+
+    :return: a tuple made of:
+        - the embedding
+        - a dictionary with the time to get the embedding, whether it was
+          found in the cache and the time saved by the cache
+
+    """
+    S = list(S)
+    T = list(T)
+    t0 = time.perf_counter()
+    cached = None
+    if cache_dir:
+        filename = os.path.join(
+            cache_dir,
+            get_embedding_key(S, T, target_digest, **kwargs) + '.json',
+        )
+        cached = _read_cached_embedding(filename)
+
+    if cached is not None:
+        embedding, time_embedding_cached = cached
+        time_embedding = time.perf_counter() - t0
+        logger.info('embedding read from cache in %.2f s', time_embedding)
+        return embedding, {
+            'time_embedding': time_embedding,
+            'embedding_cache_hit': True,
+            'time_embedding_saved': time_embedding_cached - time_embedding,
+        }
+
+    embedding = find_embedding(S, T, **kwargs)
+    time_embedding = time.perf_counter() - t0
+    if cache_dir and embedding:
+        _write_cached_embedding(filename, embedding, time_embedding)
+    return embedding, {
+        'time_embedding': time_embedding,
+        'embedding_cache_hit': False,
+        'time_embedding_saved': 0.0,
+    }
+
+
+def get_chain_strength(bqm) -> float:
+    """Get a chain strength from the range of the biases of the problem: the
+    largest absolute bias of its Ising form, so that no single term of the
+    problem is stronger than a chain.
+
+    :param bqm: problem to be embedded
+
+    :return: chain strength
+
+    """
+    bqm = bqm.spin
+    linear, (_, _, quadratic), _ = bqm.to_numpy_vectors()
+    return float(np.max(np.abs(np.concatenate([linear, quadratic]))))
+
+
+def get_chains(embedding: dict, labels: list, target_variables: list) -> tuple:
+    """Get the chains of the embedding as columns of the samples of the
+    target, grouped contiguously.
+
+    :param embedding: embedding of the source variables into the target
+    :param labels: source variables, in the order of the chains
+    :param target_variables: target variables, in the order of the columns
+    of the samples of the target
+
+    :return: a tuple made of the columns of the qubits of all the chains and
+    the index pointer delimiting each chain
+
+    """
+    index = {v: i for i, v in enumerate(target_variables)}
+    chains = [embedding[label] for label in labels]
+    lengths = np.array([len(chain) for chain in chains], dtype=np.int64)
+    columns = np.fromiter(
+        (index[v] for chain in chains for v in chain),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    return columns, indptr
+
+
+def unembed_samples(
+        target_samples: np.ndarray,
+        columns: np.ndarray,
+        indptr: np.ndarray,
+        bqm,
+        labels: list,
+) -> tuple:
+    """Unembed samples of the target by majority vote of the qubits of each
+    chain. A chain with as many qubits up as down takes the value of lower
+    energy given the other variables.
+
+    :param target_samples: samples of the target, of shape (n_samples,
+    n_target_variables)
+    :param columns: columns of the qubits of the chains, from get_chains
+    :param indptr: index pointer delimiting each chain, from get_chains
+    :param bqm: binary problem of the source
+    :param labels: source variables, in the order of the chains
+
+    :return: a tuple made of the 0/1 samples of the source, of shape
+    (n_samples, n_variables), and a boolean matrix of the same shape telling
+    which chains are broken
+
+    """
+    qubits = (np.asarray(target_samples)[:, columns] > 0).astype(np.int64)
+    lengths = np.diff(indptr)
+    n_up = np.add.reduceat(qubits, indptr[:-1], axis=1)
+    is_broken = (n_up > 0) & (n_up < lengths)
+    samples = (2 * n_up > lengths).astype(np.int8)
+    is_tie = 2 * n_up == lengths
+    if np.any(is_tie):
+        linear, (row, col, quadratic), _ = bqm.binary.to_numpy_vectors(
+            variable_order=labels
+        )
+        J = sparse.coo_matrix(
+            (quadratic, (row, col)), shape=(len(labels), len(labels))
+        ).tocsr()
+        fields = linear + ((J + J.T) @ samples.T).T
+        samples[is_tie] = fields[is_tie] < 0
+    return samples, is_broken
@@ -1,12 +1,237 @@
-from itertools import permutations
+from itertools import chain, permutations
+import json
+import os
 import random
 
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 
-def is_valid(edges_output: list, edges_input: list) -> bool:
+# extension of the graph files written by save_graph
+GRAPH_FILE_EXTENSION = '.npy'
+
+
+class DiGraph:
+    """Directed graph stored as an array of edges together with CSR-style
+    out- and in-adjacency arrays, so that degrees are read in O(1) and the
+    edges of a vertex are an O(deg) slice.
+
+    The vertices are labelled by the integers used in the input edges and
+    indexed internally in increasing order of label. The edges are indexed by
+    their position in the input.
+
+    :param edges: edges of the graph
+
+    """
+
+    def __init__(self, edges):
+        self.edges = _get_edge_array(edges)
+        self.vertices, vertex_ids = np.unique(self.edges, return_inverse=True)
+        vertex_ids = vertex_ids.reshape(-1, 2)
+        self.tails = vertex_ids[:, 0]
+        self.heads = vertex_ids[:, 1]
+
+        self.out_edges = np.argsort(self.tails, kind='stable')
+        self.out_indptr = _get_indptr(self.tails, self.n_vertices)
+        self.in_edges = np.argsort(self.heads, kind='stable')
+        self.in_indptr = _get_indptr(self.heads, self.n_vertices)
+
+        self._vertex_index = None
+        self._sorted_codes = None
+        self._reverse_edges = None
+
+    @property
+    def n_vertices(self) -> int:
+        return len(self.vertices)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edges)
+
+    @property
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.out_indptr)
+
+    @property
+    def in_degrees(self) -> np.ndarray:
+        return np.diff(self.in_indptr)
+
+    @property
+    def reverse_edges(self) -> np.ndarray:
+        """Index of the edge (v, u) for every edge (u, v), -1 if there is no
+        such edge.
+
+        """
+        if self._reverse_edges is None:
+            self._reverse_edges = self._find_codes(
+                self.heads * self.n_vertices + self.tails
+            )
+        return self._reverse_edges
+
+    def get_vertex_index(self, vertex: int):
+        """Get the internal index of the vertex, None if the vertex is not in
+        the graph.
+
+        :param vertex: label of the vertex
+
+        :return: index of the vertex
+
+        """
+        if self._vertex_index is None:
+            self._vertex_index = dict(
+                zip(self.vertices.tolist(), range(self.n_vertices))
+            )
+        return self._vertex_index.get(vertex)
+
+    def out_degree(self, vertex: int) -> int:
+        return len(self.edges_out(vertex))
+
+    def in_degree(self, vertex: int) -> int:
+        return len(self.edges_in(vertex))
+
+    def edges_out(self, vertex: int) -> np.ndarray:
+        """Get the indices of the edges having the vertex as first element.
+
+        :param vertex: label of the vertex
+
+        :return: edge indices, in increasing order
+
+        """
+        return _get_slice(
+            self.out_edges, self.out_indptr, self.get_vertex_index(vertex)
+        )
+
+    def edges_in(self, vertex: int) -> np.ndarray:
+        """Get the indices of the edges having the vertex as second element.
+
+        :param vertex: label of the vertex
+
+        :return: edge indices, in increasing order
+
+        """
+        return _get_slice(
+            self.in_edges, self.in_indptr, self.get_vertex_index(vertex)
+        )
+
+    def edges_of(self, vertex: int) -> np.ndarray:
+        """Get the indices of the edges containing the vertex.
+
+        :param vertex: label of the vertex
+
+        :return: edge indices, in increasing order
+
+        """
+        return np.union1d(self.edges_out(vertex), self.edges_in(vertex))
+
+    def find_edges(self, edges) -> np.ndarray:
+        """Get the indices of the input edges in the graph.
+
+        :param edges: edges to be looked up
+
+        :return: index of each edge, -1 for edges not in the graph
+
+        """
+        edges = _get_edge_array(edges)
+        indices = np.full(len(edges), -1, dtype=np.int64)
+        if self.n_edges == 0:
+            return indices
+        vertex_ids = np.minimum(
+            np.searchsorted(self.vertices, edges), self.n_vertices - 1
+        )
+        known = np.all(self.vertices[vertex_ids] == edges, axis=1)
+
+        indices[known] = self._find_codes(
+            vertex_ids[known, 0] * self.n_vertices + vertex_ids[known, 1]
+        )
+        return indices
+
+    def _find_codes(self, codes_query: np.ndarray) -> np.ndarray:
+        """Get the indices of the edges with the given codes, where the code
+        of an edge is tail * n_vertices + head in terms of vertex indices.
+
+        :param codes_query: codes to be looked up
+
+        :return: index of each edge, -1 for codes not in the graph
+
+        """
+        if self._sorted_codes is None:
+            codes = self.tails * self.n_vertices + self.heads
+            order = np.argsort(codes, kind='stable')
+            self._sorted_codes = (codes[order], order)
+        codes, order = self._sorted_codes
+        positions = np.minimum(
+            np.searchsorted(codes, codes_query), max(self.n_edges - 1, 0)
+        )
+        found = codes[positions] == codes_query
+        return np.where(found, order[positions], -1)
+
+    def to_list(self, edge_indices=None) -> list:
+        """Get the edges as a list of tuples.
+
+        :param edge_indices: indices of the edges to be returned, all the
+        edges if not set
+
+        :return: edges
+
+        """
+        edges = self.edges if edge_indices is None else self.edges[
+            edge_indices
+        ]
+        return [tuple(e) for e in edges.tolist()]
+
+
+def _get_edge_array(edges) -> np.ndarray:
+    """Convert the input edges into an integer array of shape (n_edges, 2).
+
+    :param edges: edges of the graph
+
+    :return: array of edges
+
+    """
+    if isinstance(edges, DiGraph):
+        return edges.edges
+    return np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def _get_indptr(vertex_ids: np.ndarray, n_vertices: int) -> np.ndarray:
+    """Get the CSR index pointer for edges grouped by the given endpoint.
+
+    :param vertex_ids: endpoint of each edge
+    :param n_vertices: number of vertices
+
+    :return: index pointer of length n_vertices + 1
+
+    """
+    indptr = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(vertex_ids, minlength=n_vertices), out=indptr[1:])
+    return indptr
+
+
+def _get_slice(indices: np.ndarray, indptr: np.ndarray, i) -> np.ndarray:
+    if i is None:
+        return indices[:0]
+    return indices[indptr[i]:indptr[i + 1]]
+
+
+def to_digraph(edges) -> DiGraph:
+    """Get the DiGraph for the input edges, which are returned unchanged if
+    they already are a DiGraph.
+
+    :param edges: edges of the graph or DiGraph
+
+    :return: DiGraph
+
+    """
+    if isinstance(edges, DiGraph):
+        return edges
+    return DiGraph(edges)
+
+
+def is_valid(edges_output: list, edges_input) -> bool:
     """Check if edges_output is a partition of edges_input into Hamiltonian
     cycles of length of 3 or more.
 
-    :param edges_input: edges defining the original graph
+    :param edges_input: edges defining the original graph, or DiGraph
     :param edges_output: subset of edges_input returned by the algorithm used
     to find a partition of edges_input into Hamiltonian cycles of length of 3
     or more.
@@ -15,43 +240,84 @@ def is_valid(edges_output: list, edges_input: list) -> bool:
     Hamiltonian cycles of length of 3 or more, False otherwise.
 
     """
-    vertices_input = get_vertices(edges_input)
-    vertices_output = get_vertices(edges_output)
-    if set(vertices_input) != set(vertices_output):
+    graph = to_digraph(edges_input)
+    edge_indices = graph.find_edges(edges_output)
+    if np.any(edge_indices < 0):
+        return False
+    if len(np.unique(edge_indices)) != len(edge_indices):
         return False
+    sample = np.zeros((1, graph.n_edges), dtype=bool)
+    sample[0, edge_indices] = True
+    return bool(is_valid_batch(sample, graph)[0])
+
+
+def is_valid_batch(samples: np.ndarray, edges_input) -> np.ndarray:
+    """Check which samples select a partition of edges_input into Hamiltonian
+    cycles of length of 3 or more.
 
-    vertices = vertices_output
-    edges = edges_output
-    while True:
-        vertices_cycle = []
-        edges_cycle = []
-        u_start = random.choice(vertices)
-        u_from = u_start
-        while True:
-            edges_u_from = [edge for edge in edges if edge[0] == u_from]
-            # if there is not exactly one edge the output is not a solution
-            if len(edges_u_from) != 1:
-                return False
-            vertices_cycle += [u_from]
-            edges_cycle += edges_u_from
-            u_to = edges_u_from[0][1]
-            # if we went through all the edges but the path does not close the
-            # output is not a solution
-            if all([
-                u_to != u_start,
-                len(edges_cycle) == len(edges) or (u_to in vertices_cycle)
-            ]):
-                return False
-            if u_to == u_start:
-                break
-            u_from = u_to
-        if len(vertices_cycle) == 2:
-            return False
-        vertices = [v for v in vertices if v not in vertices_cycle]
-        edges = [e for e in edges if e not in edges_cycle]
-
-        if len(edges) == 0 and len(vertices) == 0:
-            return True
+    A sample is valid when every vertex has exactly one selected edge out and
+    one selected edge in, so that the successor of each vertex defines a
+    permutation, and when no vertex is its own successor or the successor of
+    its successor, i.e. the permutation has no cycles of length 1 or 2.
+
+    :param samples: boolean matrix of shape (n_samples, n_edges), where the
+    column j tells if the j-th edge of edges_input is selected
+    :param edges_input: edges defining the original graph, or DiGraph
+
+    :return: boolean array telling which samples are valid
+
+    """
+    graph = to_digraph(edges_input)
+    samples = np.asarray(samples, dtype=bool).reshape(-1, graph.n_edges)
+    n_samples = len(samples)
+    n_vertices = graph.n_vertices
+    rows, cols = np.nonzero(samples)
+
+    # exactly one edge out and one edge in for every vertex
+    shape = (n_samples, n_vertices)
+    n_out = np.bincount(
+        rows * n_vertices + graph.tails[cols], minlength=n_samples * n_vertices
+    ).reshape(shape)
+    n_in = np.bincount(
+        rows * n_vertices + graph.heads[cols], minlength=n_samples * n_vertices
+    ).reshape(shape)
+    valid = np.all(n_out == 1, axis=1) & np.all(n_in == 1, axis=1)
+
+    # no cycles of length 1 or 2
+    candidates = np.flatnonzero(valid)
+    is_candidate = valid[rows]
+    successors = np.empty((len(candidates), n_vertices), dtype=np.int64)
+    successors[
+        np.searchsorted(candidates, rows[is_candidate]),
+        graph.tails[cols[is_candidate]],
+    ] = graph.heads[cols[is_candidate]]
+    vertices = np.arange(n_vertices)
+    short_cycle = (successors == vertices) | (
+        np.take_along_axis(successors, successors, axis=1) == vertices
+    )
+    valid[candidates] = ~np.any(short_cycle, axis=1)
+    return valid
+
+
+def get_components(edges) -> tuple:
+    """Get the weakly connected components of a graph. No two edges of
+    different components share a vertex.
+
+    :param edges: edges of the graph, or DiGraph
+
+    :return: a tuple made of the number of components and the component of
+    each edge
+
+    """
+    graph = to_digraph(edges)
+    adjacency = sparse.csr_matrix(
+        (np.ones(graph.n_edges), (graph.tails, graph.heads)),
+        shape=(graph.n_vertices, graph.n_vertices),
+    )
+    n_components, vertex_components = csgraph.connected_components(
+        adjacency, directed=True, connection='weak'
+    )
+    return n_components, vertex_components[graph.tails]
 
 
 def get_vertex_permutations(vertices: list) -> list:
@@ -66,52 +332,54 @@ def get_vertex_permutations(vertices: list) -> list:
     return vertex_permutations
 
 
-def get_vertices(edges: list) -> list:
+def get_vertices(edges) -> list:
     """Get all the vertices belonging to input edges
 
-    :param edges: edges in the graph
+    :param edges: edges in the graph, or DiGraph
 
     :return: vertices
 
     """
-    edges_list_of_tuples = [list(e) for e in edges]
-    return list(set(sum(edges_list_of_tuples, [])))
+    return to_digraph(edges).vertices.tolist()
 
 
-def get_edges_for_vertex(edges: list, vertex: int) -> list:
+def get_edges_for_vertex(edges, vertex: int) -> list:
     """Get all the edges in the input edges containing the input vertex
 
-    :param edges: edges of the graph
+    :param edges: edges of the graph, or DiGraph
     :param vertex: vertex of which we want to find the corresponding edges
 
     :return: selected edges
 
     """
-    return [e for e in edges if e[0] == vertex or e[1] == vertex]
+    graph = to_digraph(edges)
+    return graph.to_list(graph.edges_of(vertex))
 
 
-def get_edges_out_for_vertex(edges: list, vertex: int) -> list:
+def get_edges_out_for_vertex(edges, vertex: int) -> list:
     """Get a sublist of edges that have the specified vertex as first element
 
-    :param edges: edges of the graph
+    :param edges: edges of the graph, or DiGraph
     :param vertex: vertex of which we want to find the corresponding edges
 
     :return: selected edges
 
     """
-    return [e for e in edges if e[0] == vertex]
+    graph = to_digraph(edges)
+    return graph.to_list(graph.edges_out(vertex))
 
 
-def get_edges_in_for_vertex(edges: list, vertex: int) -> list:
+def get_edges_in_for_vertex(edges, vertex: int) -> list:
     """Get a sublist of edges that have the specified vertex as second element
 
-    :param edges: edges of the graph
+    :param edges: edges of the graph, or DiGraph
     :param vertex: vertex of which we want to find the corresponding edges
 
     :return: selected edges
 
     """
-    return [e for e in edges if e[1] == vertex]
+    graph = to_digraph(edges)
+    return graph.to_list(graph.edges_in(vertex))
 
 
 def _create_singe_cycle(start_vertex: int, n_vertices: int) -> list:
@@ -124,50 +392,241 @@ def _create_singe_cycle(start_vertex: int, n_vertices: int) -> list:
     :return: the edges forming a cycle
 
     """
-    edges = []
-    for v in range(start_vertex, start_vertex + n_vertices - 1):
-        edges += [(v, v + 1)]
-    edges += [(start_vertex + n_vertices - 1, start_vertex)]
-    return edges
+    return create_graph_hamiltonian_cycles(1, n_vertices, start_vertex)
 
 
-def create_graph_hamiltonian_cycles(n_cycles: int, cycle_length: int) -> list:
+def create_graph_hamiltonian_cycles(
+        n_cycles: int, cycle_length: int, start_vertex: int = 0
+) -> list:
     """Create a a graph composed of the specified number of hamiltonian cycles
     with the specified cycle length.
 
     :param n_cycles: number of cycles
     :param cycle_length: length of each cycle
+    :param start_vertex: first vertex of the first cycle
 
     :return: the edges forming the constructed graph
 
     """
-    edges = []
-    for j in range(n_cycles):
-        edges += _create_singe_cycle(j * cycle_length, cycle_length)
-    return edges
+    edges = generate_cycles([cycle_length] * n_cycles) + start_vertex
+    return [tuple(edge) for edge in edges.tolist()]
+
+
+def generate_cycles(
+        cycle_lengths,
+        seed=None,
+        relabel: bool = False,
+) -> np.ndarray:
+    """Generate a graph made of disjoint cycles of the given lengths. The
+    vertices are numbered from 0 in the order of the cycles, unless they are
+    relabelled at random.
+
+    :param cycle_lengths: length of each cycle
+    :param seed: seed of the random number generator, or np.random.Generator
+    :param relabel: whether to relabel the vertices with a random
+    permutation
 
+    :return: array of edges of shape (n_edges, 2), the edges of each cycle
+    follow each other
 
-def add_noise(edges: list, n_edges_to_add: int, seed: int) -> list:
+    """
+    cycle_lengths = np.asarray(cycle_lengths, dtype=np.int64).ravel()
+    if np.any(cycle_lengths < 1):
+        raise ValueError('cycle lengths must be positive')
+    n_vertices = int(cycle_lengths.sum())
+    cycle_ends = np.cumsum(cycle_lengths) - 1
+    tails = np.arange(n_vertices)
+    heads = tails + 1
+    heads[cycle_ends] = cycle_ends - cycle_lengths + 1
+    if relabel:
+        labels = np.random.default_rng(seed).permutation(n_vertices)
+        tails, heads = labels[tails], labels[heads]
+    return np.stack([tails, heads], axis=1)
+
+
+def generate_noise_edges(edges, n_edges_to_add: int, seed=None) -> np.ndarray:
+    """Generate the specified number of new edges connecting the existing
+    vertices of the input graph, all distinct, without self-loops and not
+    already in the graph.
+
+    The head of each edge is drawn among the vertices different from its
+    tail, so that no self-loop is ever drawn, and the edges are drawn in
+    batches, removing the existing and repeated ones at once. When more than
+    half of the possible edges are requested, they are drawn without
+    replacement among all the possible ones.
+
+    :param edges: edges of the input graph, or DiGraph
+    :param n_edges_to_add: number of edges to be added
+    :param seed: seed of the random number generator, or np.random.Generator
+
+    :return: array of edges of shape (n_edges_to_add, 2)
+
+    """
+    rng = np.random.default_rng(seed)
+    if isinstance(edges, DiGraph):
+        vertices, tails, heads = edges.vertices, edges.tails, edges.heads
+    else:
+        vertices, vertex_ids = np.unique(
+            _get_edge_array(edges), return_inverse=True
+        )
+        tails, heads = vertex_ids.reshape(-1, 2).T
+    n_vertices = len(vertices)
+    is_loop = tails == heads
+    existing = np.sort(tails[~is_loop] * n_vertices + heads[~is_loop])
+    existing = existing[np.append(True, existing[1:] != existing[:-1])]
+    n_available = n_vertices * (n_vertices - 1) - len(existing)
+    if n_edges_to_add > n_available:
+        raise ValueError(
+            f'cannot add {n_edges_to_add} edges, only {n_available} are '
+            f'available'
+        )
+
+    if 2 * n_edges_to_add > n_available:
+        codes = np.arange(n_vertices * n_vertices)
+        codes = codes[codes // n_vertices != codes % n_vertices]
+        codes = np.setdiff1d(codes, existing, assume_unique=True)
+        noise = rng.choice(codes, size=n_edges_to_add, replace=False)
+    else:
+        noise = np.empty(0, dtype=np.int64)
+        while len(noise) < n_edges_to_add:
+            n_missing = n_edges_to_add - len(noise)
+            # probability for a draw to be a new edge
+            p_new = (n_available - len(noise)) \
+                / (n_vertices * (n_vertices - 1))
+            n_draws = int(n_missing / p_new * 1.05) + 16
+            tails = rng.integers(n_vertices, size=n_draws)
+            heads = (
+                tails + 1 + rng.integers(n_vertices - 1, size=n_draws)
+            ) % n_vertices
+            codes = tails * n_vertices + heads
+            # the existing edges come first and are all kept
+            noise = _drop_repeated(
+                np.concatenate([existing, noise, codes])
+            )[len(existing):n_edges_to_add + len(existing)]
+    return np.stack(
+        [vertices[noise // n_vertices], vertices[noise % n_vertices]],
+        axis=1,
+    )
+
+
+def _drop_repeated(values: np.ndarray) -> np.ndarray:
+    """Drop the values already present earlier in the array.
+
+    :param values: array of values
+
+    :return: array of the first occurrence of each value, in their order
+
+    """
+    order = np.argsort(values, kind='stable')
+    is_repeated = np.zeros(len(values), dtype=bool)
+    is_repeated[order[1:]] = values[order[1:]] == values[order[:-1]]
+    return values[~is_repeated]
+
+
+def add_noise(edges, n_edges_to_add: int, seed: int) -> list:
     """ Add the specified number of edges connecting the existing vertices of
     the input graph.
 
-    :param edges: list of edges of the input graph
+    The edges are the ones drawn with the random module seeded with seed, as
+    they have always been, but from a private random.Random instance, so that
+    the global random state is untouched and several threads can add noise at
+    once.
+
+    :param edges: list of edges of the input graph, or DiGraph
     :param n_edges_to_add: list of edges to be added
     :param seed: seed of random number generator
 
     :return: the edges forming the graph with added noise
 
     """
-    vertices = get_vertices(edges)
+    if isinstance(edges, DiGraph):
+        edges = edges.to_list()
+    # the vertices are drawn from in the order of the set of vertices, as
+    # they have always been, which is not sorted for any labels
+    vertices = list(set(chain.from_iterable(edges)))
+    n_vertices = len(vertices)
+    existing = set(edges)
+    n_available = n_vertices * (n_vertices - 1) \
+        - len({(u, v) for (u, v) in existing if u != v})
+    if n_edges_to_add > n_available:
+        raise ValueError(
+            f'cannot add {n_edges_to_add} edges, only {n_available} are '
+            f'available'
+        )
+    # for the vertices 0, ..., n - 1, list(set(vertices) - {vertex_0}) is
+    # the sorted list without vertex_0, no need to build it at every draw
+    is_range = vertices == list(range(n_vertices))
     edges_noise = []
 
-    random.seed(seed)
+    rng = random.Random(seed)
     while len(edges_noise) < n_edges_to_add:
-        vertex_0 = random.choice(vertices)
-        other_vertices = list(set(vertices) - {vertex_0})
-        vertex_1 = random.choice(other_vertices)
+        vertex_0 = rng.choice(vertices)
+        if is_range:
+            vertex_1 = rng.choice(range(n_vertices - 1))
+            if vertex_1 >= vertex_0:
+                vertex_1 += 1
+        else:
+            other_vertices = list(set(vertices) - {vertex_0})
+            vertex_1 = rng.choice(other_vertices)
         edge_temp = (vertex_0, vertex_1)
-        if edge_temp not in (edges + edges_noise):
+        if edge_temp not in existing:
+            existing.add(edge_temp)
             edges_noise += [edge_temp]
 
     return edges + edges_noise
+
+
+def _get_metadata_filename(filename: str) -> str:
+    return os.path.splitext(filename)[0] + '.json'
+
+
+def save_graph(filename: str, edges, metadata: dict = None) -> None:
+    """Save the edges of a graph as a .npy file holding an int64 array of
+    shape (n_edges, 2), and the metadata, if any, as JSON next to it.
+
+    :param filename: name of the graph file, ending in .npy
+    :param edges: edges of the graph, or DiGraph
+    :param metadata: parameters describing the graph, e.g. n_cycles
+
+    :return: None
+
+    """
+    np.save(filename, _get_edge_array(edges).astype(np.int64))
+    if metadata is not None:
+        with open(_get_metadata_filename(filename), 'w') as f:
+            json.dump(metadata, f)
+    return None
+
+
+def load_graph(filename: str, mmap: bool = True) -> np.ndarray:
+    """Load the edges of a graph saved with save_graph. The file is memory
+    mapped, so that only the edges actually read are loaded.
+
+    :param filename: name of the graph file
+    :param mmap: whether to memory map the file instead of reading it
+
+    :return: read-only array of edges of shape (n_edges, 2)
+
+    """
+    edges = np.load(filename, mmap_mode='r' if mmap else None)
+    if edges.ndim != 2 or edges.shape[1] != 2 \
+            or not np.issubdtype(edges.dtype, np.integer):
+        raise ValueError(
+            f'{filename} does not hold an integer array of shape (n, 2)'
+        )
+    return edges
+
+
+def load_graph_metadata(filename: str) -> dict:
+    """Load the metadata saved with save_graph.
+
+    :param filename: name of the graph file
+
+    :return: metadata, empty if none was saved
+
+    """
+    metadata_filename = _get_metadata_filename(filename)
+    if not os.path.exists(metadata_filename):
+        return {}
+    with open(metadata_filename) as f:
+        return json.load(f)
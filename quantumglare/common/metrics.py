@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# stages of a run, in the order in which they happen
+STAGES = [
+    'qubo',
+    'embedding',
+    'submit',
+    'wait',
+    'unembed',
+    'decode',
+    'validate',
+    'repair',
+    'write',
+]
+
+# extension of the metrics files written in the Prometheus text format, the
+# other files are written as JSON lines
+PROMETHEUS_EXTENSION = '.prom'
+
+
+class Metrics:
+    """Time spent in each stage of a run and, if trace_memory is set, peak
+    memory allocated by Python in each stage, traced with tracemalloc.
+
+    The time of a stage is measured with time.perf_counter around a span, or
+    added when it is measured elsewhere, e.g. by a backend. The times of the
+    spans of a stage are summed, so the stages run once per component or
+    pack add up. The memory is traced in the spans only; they should not be
+    nested or run in parallel when it is.
+
+    :param trace_memory: whether to trace the peak memory of the spans
+
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.times = {}
+        self.peak_memories = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str):
+        """Measure the code run in the context as part of a stage.
+
+        :param stage: name of the stage
+
+        """
+        is_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if is_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_start, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            peak_memory = None
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak_memory = peak - memory_start
+            if is_tracing:
+                tracemalloc.stop()
+            self.add(stage, elapsed, peak_memory)
+
+    def add(self, stage: str, seconds: float, peak_memory: int = None):
+        """Add time, and possibly peak memory, to a stage.
+
+        :param stage: name of the stage
+        :param seconds: time spent in the stage
+        :param peak_memory: peak memory allocated in the stage, in bytes
+
+        :return: None
+
+        """
+        with self._lock:
+            self.times[stage] = self.times.get(stage, 0.0) + seconds
+            if peak_memory is not None:
+                self.peak_memories[stage] = max(
+                    self.peak_memories.get(stage, 0), peak_memory
+                )
+        return None
+
+    def get_time(self, stage: str) -> float:
+        """Get the time spent in a stage, 0 if it was not run."""
+        return self.times.get(stage, 0.0)
+
+    def get_peak_memory(self) -> int:
+        """Get the largest peak memory of the stages, None if the memory was
+        not traced."""
+        return max(self.peak_memories.values(), default=None)
+
+    def get_record(self) -> dict:
+        """Get the times, in seconds, and the peak memories, in bytes, of the
+        stages run, keyed by time_<stage> and peak_memory_<stage>.
+
+        :return: dictionary of metrics
+
+        """
+        stages = sorted(
+            self.times,
+            key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES),
+        )
+        record = {f'time_{stage}': self.times[stage] for stage in stages}
+        record.update({
+            f'peak_memory_{stage}': self.peak_memories[stage]
+            for stage in stages if stage in self.peak_memories
+        })
+        return record
+
+
+def _escape_label(value) -> str:
+    if value is None:
+        return ''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def format_prometheus(labels: dict, record: dict) -> str:
+    """Format the metrics of a run in the Prometheus text format, one sample
+    per stage.
+
+    :param labels: labels of the run, e.g. tag and seeds
+    :param record: metrics given by Metrics.get_record
+
+    :return: text of the metrics
+
+    """
+    lines = []
+    for prefix, name, help_text in [
+        ('time_', 'quantumglare_stage_duration_seconds',
+         'Time spent in a stage of a run.'),
+        ('peak_memory_', 'quantumglare_stage_peak_memory_bytes',
+         'Peak memory allocated in a stage of a run.'),
+    ]:
+        samples = [
+            (key[len(prefix):], value) for key, value in record.items()
+            if key.startswith(prefix)
+        ]
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for stage, value in samples:
+            label_text = ','.join(
+                f'{key}="{_escape_label(label)}"'
+                for key, label in {**labels, 'stage': stage}.items()
+            )
+            lines.append(f'{name}{{{label_text}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(labels: dict, record: dict, filename: str) -> None:
+    """Write the metrics of a run to a file. If the file has the extension
+    PROMETHEUS_EXTENSION, it is replaced with the metrics of the run in the
+    Prometheus text format, to be read by the textfile collector of the node
+    exporter. Otherwise the labels and the metrics are appended to it as a
+    JSON line.
+
+    :param labels: labels of the run, e.g. tag and seeds
+    :param record: metrics given by Metrics.get_record
+    :param filename: name of the file
+
+    :return: None
+
+    """
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if filename.endswith(PROMETHEUS_EXTENSION):
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            f.write(format_prometheus(labels, record))
+        os.replace(tmp_filename, filename)
+    else:
+        with open(filename, 'a') as f:
+            f.write(json.dumps({**labels, **record}) + '\n')
+    return None
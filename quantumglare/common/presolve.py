@@ -0,0 +1,205 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from quantumglare.common.graph import DiGraph, to_digraph
+from quantumglare.common.qubo import get_Q
+
+
+class PresolvedGraph:
+    """Input graph whose edges are split by presolve into fixed edges, which
+    are in every valid solution, removed edges, which are in none, and the
+    edges of the reduced graph, which are left to the sampler.
+
+    A valid solution of the input graph is made of the fixed edges together
+    with a selection of edges of the reduced graph valid according to
+    is_valid_reduced_batch.
+
+    :param edges: edges of the input graph, or DiGraph
+    :param fixed_edges: indices of the fixed edges
+    :param reduced_edges: indices of the edges of the reduced graph, in
+    increasing order
+    :param is_feasible: False if the input graph has no valid solution
+
+    """
+
+    def __init__(
+            self,
+            edges,
+            fixed_edges: np.ndarray,
+            reduced_edges: np.ndarray,
+            is_feasible: bool = True,
+    ):
+        self.graph = to_digraph(edges)
+        self.fixed_edges = fixed_edges
+        self.reduced_edges = reduced_edges
+        self.is_feasible = is_feasible
+        self.reduced_graph = DiGraph(self.graph.edges[reduced_edges])
+
+    @property
+    def n_fixed_edges(self) -> int:
+        return len(self.fixed_edges)
+
+    @property
+    def n_removed_edges(self) -> int:
+        return self.graph.n_edges - self.n_fixed_edges \
+            - len(self.reduced_edges)
+
+    def get_Q(self) -> dict:
+        """Get the QUBO problem of the reduced graph, whose valid solutions
+        have energy minus the number of edges still to be selected.
+
+        :return: QUBO matrix
+
+        """
+        return get_Q(self.reduced_graph)
+
+    def get_fixed_edges(self) -> list:
+        """Get the fixed edges as a list of tuples.
+
+        :return: fixed edges
+
+        """
+        return self.graph.to_list(self.fixed_edges)
+
+    def lift(self, samples) -> np.ndarray:
+        """Lift samples of the reduced graph to samples of the input graph,
+        adding the fixed edges.
+
+        :param samples: boolean matrix of shape (n_samples, n_reduced_edges),
+        where the column j tells if the j-th edge of the reduced graph is
+        selected
+
+        :return: boolean matrix of shape (n_samples, n_edges), where the
+        column j tells if the j-th edge of the input graph is selected
+
+        """
+        samples = np.atleast_2d(np.asarray(samples, dtype=bool))
+        lifted = np.zeros((len(samples), self.graph.n_edges), dtype=bool)
+        lifted[:, self.fixed_edges] = True
+        lifted[:, self.reduced_edges] = samples
+        return lifted
+
+
+def _get_strong_components(
+        tails: np.ndarray, heads: np.ndarray, n_vertices: int
+) -> np.ndarray:
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(tails)), (tails, heads)), shape=(n_vertices, n_vertices)
+    )
+    _, components = csgraph.connected_components(
+        adjacency, directed=True, connection='strong'
+    )
+    return components
+
+
+def presolve(edges) -> PresolvedGraph:
+    """Decide the edges of the input graph that the graph structure alone
+    decides, repeating until nothing changes:
+        - an edge between different strongly connected components, or a
+          self-loop, lies on no cycle of length 3 or more and is removed
+        - the only edge out of a vertex, or into a vertex, is fixed
+        - the other edges out of the tail and into the head of a fixed edge,
+          and its reverse, are removed
+
+    The input graph has no valid solution if a vertex is left without edges
+    out or in, or if two fixed edges conflict. Nothing is decided in that
+    case, and the reduced graph is the input graph.
+
+    :param edges: edges of the input graph, or DiGraph
+
+    :return: PresolvedGraph
+
+    """
+    graph = to_digraph(edges)
+    n_vertices = graph.n_vertices
+    tails, heads = graph.tails, graph.heads
+    reverse_edges = graph.reverse_edges
+    has_reverse = reverse_edges >= 0
+
+    alive = tails != heads
+    fixed = np.zeros(graph.n_edges, dtype=bool)
+    is_feasible = True
+    while True:
+        components = _get_strong_components(
+            tails[alive], heads[alive], n_vertices
+        )
+        alive &= components[tails] == components[heads]
+        out_degrees = np.bincount(tails[alive], minlength=n_vertices)
+        in_degrees = np.bincount(heads[alive], minlength=n_vertices)
+        if np.any(out_degrees == 0) or np.any(in_degrees == 0):
+            is_feasible = False
+            break
+
+        forced = alive & ~fixed & (
+            (out_degrees[tails] == 1) | (in_degrees[heads] == 1)
+        )
+        if not np.any(forced):
+            break
+        fixed |= forced
+        n_fixed_out = np.bincount(tails[fixed], minlength=n_vertices)
+        n_fixed_in = np.bincount(heads[fixed], minlength=n_vertices)
+        is_reverse_fixed = np.zeros(graph.n_edges, dtype=bool)
+        is_reverse_fixed[reverse_edges[fixed & has_reverse]] = True
+        if np.any(n_fixed_out > 1) or np.any(n_fixed_in > 1) \
+                or np.any(fixed & is_reverse_fixed):
+            is_feasible = False
+            break
+        alive &= fixed | (
+            (n_fixed_out[tails] == 0)
+            & (n_fixed_in[heads] == 0)
+            & ~is_reverse_fixed
+        )
+
+    if not is_feasible:
+        return PresolvedGraph(
+            graph,
+            fixed_edges=np.array([], dtype=np.int64),
+            reduced_edges=np.arange(graph.n_edges),
+            is_feasible=False,
+        )
+    return PresolvedGraph(
+        graph,
+        fixed_edges=np.flatnonzero(fixed),
+        reduced_edges=np.flatnonzero(alive & ~fixed),
+    )
+
+
+def is_valid_reduced_batch(samples: np.ndarray, reduced_edges) -> np.ndarray:
+    """Check which samples of the reduced graph of a PresolvedGraph, lifted
+    with the fixed edges, are valid solutions of the input graph.
+
+    A sample is valid when it selects exactly one edge out of every vertex
+    with edges out and one edge into every vertex with edges in, and no two
+    edges forming a cycle of length 2. The reduced graph has no self-loops.
+
+    :param samples: boolean matrix of shape (n_samples, n_edges), where the
+    column j tells if the j-th edge of reduced_edges is selected
+    :param reduced_edges: edges of the reduced graph, or DiGraph
+
+    :return: boolean array telling which samples are valid
+
+    """
+    graph = to_digraph(reduced_edges)
+    samples = np.atleast_2d(np.asarray(samples, dtype=bool))
+    n_samples = len(samples)
+    n_vertices = graph.n_vertices
+    rows, cols = np.nonzero(samples)
+
+    shape = (n_samples, n_vertices)
+    n_out = np.bincount(
+        rows * n_vertices + graph.tails[cols], minlength=n_samples * n_vertices
+    ).reshape(shape)
+    n_in = np.bincount(
+        rows * n_vertices + graph.heads[cols], minlength=n_samples * n_vertices
+    ).reshape(shape)
+    valid = np.all(n_out[:, graph.out_degrees > 0] == 1, axis=1) \
+        & np.all(n_in[:, graph.in_degrees > 0] == 1, axis=1)
+
+    reverse_edges = graph.reverse_edges
+    has_reverse = reverse_edges >= 0
+    valid &= ~np.any(
+        samples[:, has_reverse] & samples[:, reverse_edges[has_reverse]],
+        axis=1,
+    )
+    return valid
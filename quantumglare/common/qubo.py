@@ -1,137 +1,636 @@
-from itertools import combinations, product
+from itertools import chain
 
-from pyqubo import Binary, Constraint
+import dimod
+import numpy as np
+from scipy import sparse
 
-from quantumglare.common.graph import (
-    get_vertices, get_edges_out_for_vertex, get_edges_in_for_vertex,
-    get_edges_for_vertex
-)
+from quantumglare.common.graph import DiGraph, to_digraph
 
 
-def _get_penalty_constants(edges: list, epsilon: float) -> dict:
+def _get_edge_list(edges) -> list:
+    """Get the input edges as a list of tuples of Python integers.
+
+    :param edges: edges of the graph, or DiGraph
+
+    :return: list of edges
+
+    """
+    if isinstance(edges, DiGraph):
+        return edges.to_list()
+    if isinstance(edges, np.ndarray):
+        edges = edges.tolist()
+    return [tuple(edge) for edge in edges]
+
+
+def get_labels(edges) -> list:
+    """Get the labels of the QUBO variables, one per input edge, in the
+    order of the input edges.
+
+    :param edges: edges of the input graph, or DiGraph
+
+    :return: list of labels of the form '(u, v)'
+
+    """
+    return [str(edge) for edge in _get_edge_list(edges)]
+
+
+def _get_pairs_within_groups(indices: np.ndarray, indptr: np.ndarray) -> tuple:
+    """Get all the pairs of indices within each group of a CSR-style
+    structure.
+
+    The pairs are ordered by group and, within a group, as
+    itertools.combinations would output them.
+
+    :param indices: indices grouped contiguously
+    :param indptr: index pointer delimiting the groups
+
+    :return: a tuple made of the first and second index of each pair
+
+    """
+    group_size = np.diff(indptr)
+    group_end = np.repeat(indptr[1:], group_size)
+
+    n_partners = group_end - np.arange(len(indices)) - 1
+    first = np.repeat(np.arange(len(indices)), n_partners)
+    offsets = np.arange(len(first)) - np.repeat(
+        np.cumsum(n_partners) - n_partners, n_partners
+    )
+    second = first + 1 + offsets
+    return indices[first], indices[second]
+
+
+def _get_penalty_arrays(
+        n_out: np.ndarray, n_in: np.ndarray, epsilon: float
+) -> tuple:
+    """Get the penalty constants for each vertex given its degrees.
+
+    :param n_out: number of edges out of each vertex
+    :param n_in: number of edges into each vertex
+    :param epsilon: small number used for the penalties
+
+    :return: a tuple made of the max one out, max one in and cycle length at
+    least three penalties of each vertex
+
+    """
+    a = np.where(n_out > 1, 1 + epsilon, 0)
+    b = np.where(n_in > 1, 1 + epsilon, 0)
+    c = np.full(len(n_out), 2 + epsilon)
+    return a, b, c
+
+
+def _get_penalty_constants(edges, epsilon: float) -> dict:
     """Get penalty constants for the configuration defined by the edges in the
     input graph.
 
-    :param edges: edges defining the input graph
+    :param edges: edges defining the input graph, or DiGraph
     :param epsilon: small number used for the penalties
 
     :return: penalty constant
 
     """
-    vertices = get_vertices(edges)
-    penalty_constants = {}
+    graph = to_digraph(edges)
+    a, b, c = _get_penalty_arrays(
+        graph.out_degrees, graph.in_degrees, epsilon
+    )
+    return {
+        v: [a_v, b_v, c_v]
+        for v, a_v, b_v, c_v in zip(
+            graph.vertices.tolist(), a.tolist(), b.tolist(), c.tolist()
+        )
+    }
+
+
+def get_Q_coo(edges, epsilon: float = 0.01) -> tuple:
+    """Get the QUBO problem for the input edges in coordinate format.
+
+    The variable of index i corresponds to the i-th input edge. Every edge
+    contributes a linear term -1. The quadratic terms, stored with row < col,
+    penalise two edges out of the same vertex, two edges into the same vertex
+    and cycles of length 2.
+
+    :param edges: edges of the input graph, or DiGraph
+    :param epsilon: small number used for the penalties
 
-    for v in vertices:
-        # max one out
-        edges_out = get_edges_out_for_vertex(edges, v)
-        n_out = len(edges_out)
-        a_v = (1 + epsilon) if n_out > 1 else 0
+    :return: a tuple made of the row, col and bias arrays
 
-        # max one in
-        edges_in = get_edges_in_for_vertex(edges, v)
-        n_in = len(edges_in)
-        b_v = (1 + epsilon) if n_in > 1 else 0
+    """
+    graph = to_digraph(edges)
+    a, b, c = _get_penalty_arrays(
+        graph.out_degrees, graph.in_degrees, epsilon
+    )
+
+    # max one out
+    out_first, out_second = _get_pairs_within_groups(
+        graph.out_edges, graph.out_indptr
+    )
+    # max one in
+    in_first, in_second = _get_pairs_within_groups(
+        graph.in_edges, graph.in_indptr
+    )
+    # cycle length at least three
+    reverse_edges = graph.reverse_edges
+    cycle_first = np.flatnonzero(reverse_edges > np.arange(graph.n_edges))
+    cycle_second = reverse_edges[cycle_first]
+
+    diagonal = np.arange(graph.n_edges)
+    row = np.concatenate([diagonal, out_first, in_first, cycle_first])
+    col = np.concatenate([diagonal, out_second, in_second, cycle_second])
+    bias = np.concatenate([
+        -np.ones(graph.n_edges),
+        a[graph.tails[out_first]],
+        b[graph.heads[in_first]],
+        c[graph.tails[cycle_first]],
+    ])
+    return np.minimum(row, col), np.maximum(row, col), bias
+
+
+def _get_variable_order(edges: np.ndarray, row, col) -> np.ndarray:
+    """Get the rank of each variable in the ordering that pyqubo used to
+    compile the cost, so that the keys of the QUBO dictionary keep the
+    orientation they always had.
+
+    pyqubo ranks the variables by first appearance walking the terms of the
+    cost backwards: the 2-cycle pairs (emitted once per vertex), then the
+    max one in pairs, the max one out pairs and finally the linear terms.
+
+    :param edges: array of vertex ranks of the edges
+    :param row: first variable of each quadratic term
+    :param col: second variable of each quadratic term
+
+    :return: rank of each variable
 
-        # cycle length at least three
-        c = (2 + epsilon)
+    """
+    n_edges = len(edges)
+    tails = edges[:, 0]
+    heads = edges[:, 1]
+    is_out = tails[row] == tails[col]
+    is_in = ~is_out & (heads[row] == heads[col])
+    is_cycle = ~is_out & ~is_in
+
+    terms = []
+    for mask, vertex in [(is_out, tails[row]), (is_in, heads[row])]:
+        order = np.lexsort((col[mask], row[mask], vertex[mask]))
+        terms.append((row[mask][order], col[mask][order]))
+    cycle_row = np.tile(row[is_cycle], 2)
+    cycle_col = np.tile(col[is_cycle], 2)
+    cycle_vertex = np.concatenate([tails[row[is_cycle]], heads[row[is_cycle]]])
+    order = np.lexsort((cycle_col, cycle_row, cycle_vertex))
+    terms.append((cycle_row[order], cycle_col[order]))
+
+    first = np.concatenate([np.arange(n_edges)] + [t[0] for t in terms])
+    second = np.concatenate([np.arange(n_edges)] + [t[1] for t in terms])
+    appearances = np.stack([first, second], axis=1)[::-1].ravel()
+    _, first_appearance = np.unique(appearances, return_index=True)
+    rank = np.empty(n_edges, dtype=np.int64)
+    rank[np.argsort(first_appearance)] = np.arange(n_edges)
+    return rank
+
+
+def _orient_coo(edges, row, col) -> tuple:
+    """Orient the terms of a QUBO problem in coordinate format as the keys
+    of the dictionary given by coo_to_qubo_dict.
+
+    :param edges: edges of the input graph, or DiGraph
+    :param row: row array
+    :param col: col array
+
+    :return: a tuple made of the first and second variable of each term
 
-        penalty_constants[v] = [a_v, b_v, c]
+    """
+    graph = to_digraph(edges)
+    edge_list = _get_edge_list(edges)
+    # pyqubo went through the vertices in the iteration order of a set
+    vertex_order = np.fromiter(
+        set(chain.from_iterable(edge_list)),
+        dtype=np.int64,
+        count=graph.n_vertices,
+    )
+    vertex_rank = np.empty(graph.n_vertices, dtype=np.int64)
+    vertex_rank[np.searchsorted(graph.vertices, vertex_order)] = np.arange(
+        graph.n_vertices
+    )
+    quadratic = row != col
+    rank = _get_variable_order(
+        np.stack([vertex_rank[graph.tails], vertex_rank[graph.heads]], axis=1),
+        row[quadratic],
+        col[quadratic],
+    )
+    swap = rank[row] > rank[col]
+    return np.where(swap, col, row), np.where(swap, row, col)
+
+
+def coo_to_qubo_dict(edges, row, col, bias) -> dict:
+    """Convert a QUBO problem in coordinate format into a dictionary with
+    keys of the form ('(u, v)', '(x, y)').
+
+    :param edges: edges of the input graph, or DiGraph
+    :param row: row array
+    :param col: col array
+    :param bias: bias array
 
-    return penalty_constants
+    :return: QUBO matrix
+
+    """
+    labels = get_labels(edges)
+    first, second = _orient_coo(edges, row, col)
+
+    Q = {}
+    for i, j, q in zip(first.tolist(), second.tolist(), bias.tolist()):
+        key = (labels[i], labels[j])
+        Q[key] = Q.get(key, 0) + q
+    return Q
 
 
-def _get_cost(edges: list, epsilon: float = 0.01):
-    """Get the cost associated to the input graph.
+class CooQubo:
+    """QUBO problem in coordinate format, as given by get_Q_coo, handed to
+    the backends as it is, so that the dictionary of get_Q is never built on
+    the way to the sampler.
 
-    :param edges:  edges defining the input graph
+    The variable of index i is labelled by the i-th edge, as in get_labels.
+
+    :param edges: edges of the input graph, or DiGraph
+    :param row: row array
+    :param col: col array
+    :param bias: bias array
+    :param labels: labels of the variables, given by get_labels if not set
+
+    """
+
+    def __init__(self, edges, row, col, bias, labels: list = None):
+        self.edges = edges
+        self.row = row
+        self.col = col
+        self.bias = bias
+        self._labels = labels
+
+    @property
+    def labels(self) -> list:
+        if self._labels is None:
+            self._labels = get_labels(self.edges)
+        return self._labels
+
+    def to_bqm(self) -> dimod.BinaryQuadraticModel:
+        """Get the binary quadratic model of the problem, the one that
+        dimod.BinaryQuadraticModel.from_qubo builds from to_dict, variables
+        included in the same order.
+
+        :return: binary quadratic model
+
+        """
+        is_linear = self.row == self.col
+        linear = np.zeros(len(self.labels))
+        np.add.at(linear, self.row[is_linear], self.bias[is_linear])
+        return dimod.BinaryQuadraticModel.from_numpy_vectors(
+            linear,
+            (
+                self.row[~is_linear],
+                self.col[~is_linear],
+                self.bias[~is_linear],
+            ),
+            0.0,
+            dimod.BINARY,
+            variable_order=self.labels,
+        )
+
+    def get_interactions(self) -> list:
+        """Get the pairs of variables with a quadratic term, oriented and
+        ordered as the keys of to_dict.
+
+        :return: list of pairs of labels
+
+        """
+        is_quadratic = self.row != self.col
+        first, second = _orient_coo(
+            self.edges, self.row[is_quadratic], self.col[is_quadratic]
+        )
+        labels = self.labels
+        return list(dict.fromkeys(
+            (labels[i], labels[j])
+            for i, j in zip(first.tolist(), second.tolist())
+        ))
+
+    def to_dict(self) -> dict:
+        """Get the problem as the dictionary given by get_Q."""
+        return coo_to_qubo_dict(self.edges, self.row, self.col, self.bias)
+
+
+def get_coo_qubo(edges) -> CooQubo:
+    """Transform the input edges into a QUBO problem in coordinate format.
+
+    :param edges: edges of the input graph, or DiGraph
+
+    :return: QUBO problem
+
+    """
+    graph = to_digraph(edges)
+    return CooQubo(graph, *get_Q_coo(graph))
+
+
+def get_Q(edges) -> dict:
+    """Transform the input edges into a QUBO problem defined by Q.
+
+    :param edges: edges of the input graph, or DiGraph
+
+    :return: QUBO matrix
+
+    """
+    graph = to_digraph(edges)
+    row, col, bias = get_Q_coo(graph)
+    Q = coo_to_qubo_dict(graph, row, col, bias)
+    return Q
+
+
+def get_Q_sparse(edges, epsilon: float = 0.01) -> sparse.csr_matrix:
+    """Transform the input edges into a QUBO problem defined by an upper
+    triangular sparse matrix, whose i-th row and column correspond to the
+    i-th input edge.
+
+    :param edges: edges of the input graph, or DiGraph
     :param epsilon: small number used for the penalties
 
-    :return: the corresponding cost
+    :return: QUBO matrix
 
     """
-    vertices = get_vertices(edges)
-    cost = 0
+    graph = to_digraph(edges)
+    row, col, bias = get_Q_coo(graph, epsilon)
+    return sparse.csr_matrix(
+        (bias, (row, col)), shape=(graph.n_edges, graph.n_edges)
+    )
+
+
+def _get_groups(indices: np.ndarray, indptr: np.ndarray, ids) -> np.ndarray:
+    """Get the indices of the given groups of a CSR-style structure,
+    concatenated.
 
-    for edge in edges:
-        cost += - Binary(str(tuple(edge))) ** 2
+    :param indices: indices grouped contiguously
+    :param indptr: index pointer delimiting the groups
+    :param ids: groups to be returned
 
-    penalty_constants = _get_penalty_constants(edges, epsilon)
+    :return: indices of the groups
 
-    constraint_one_out = 0
-    constraint_one_in = 0
-    constraint_min_three = 0
-    for v in vertices:
-        # max one out
-        edges_out_v = get_edges_out_for_vertex(edges, v)
-        edges_out_v_pairs = [tuple(c) for c in combinations(edges_out_v, 2)]
-        cross_products_out = sum([
-            Binary(str((e[0]))) * Binary(str((e[1])))
-            for e in edges_out_v_pairs
+    """
+    starts = indptr[ids]
+    lengths = indptr[ids + 1] - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return indices[np.repeat(starts, lengths) + offsets]
+
+
+class IncrementalQubo:
+    """QUBO problem of a base graph that gives the QUBO problem of the graph
+    obtained by removing and adding edges, recomputing only the max one out,
+    max one in and cycle length at least three terms of the vertices touched
+    by those edges.
+
+    The edges of the modified graph are the edges of the base graph that are
+    not removed, in their order, followed by the added edges, so that adding
+    the noise edges of graph.add_noise gives the same QUBO problem as get_Q
+    on its output.
+
+    :param edges: edges of the base graph, or DiGraph
+    :param epsilon: small number used for the penalties
+
+    """
+
+    def __init__(self, edges, epsilon: float = 0.01):
+        self.graph = to_digraph(edges)
+        self.epsilon = epsilon
+        graph = self.graph
+        self._out_pairs = _get_pairs_within_groups(
+            graph.out_edges, graph.out_indptr
+        )
+        self._in_pairs = _get_pairs_within_groups(
+            graph.in_edges, graph.in_indptr
+        )
+        reverse_edges = graph.reverse_edges
+        cycle_first = np.flatnonzero(reverse_edges > np.arange(graph.n_edges))
+        self._cycle_pairs = (cycle_first, reverse_edges[cycle_first])
+        self._labels = None
+
+    def _get_group_pairs(
+            self,
+            base_pairs: tuple,
+            base_indices: np.ndarray,
+            base_indptr: np.ndarray,
+            endpoint: int,
+            added: np.ndarray,
+            affected: np.ndarray,
+            keep: np.ndarray,
+            new_index: np.ndarray,
+    ) -> tuple:
+        """Get the pairs of edges sharing an endpoint in the modified graph,
+        ordered as get_Q_coo orders them.
+
+        :param base_pairs: pairs of the base graph
+        :param base_indices: edges of the base graph grouped by endpoint
+        :param base_indptr: index pointer delimiting the groups
+        :param endpoint: 0 to pair edges by tail, 1 by head
+        :param added: added edges
+        :param affected: vertices whose pairs have to be recomputed
+        :param keep: which edges of the base graph are kept
+        :param new_index: index in the modified graph of the kept edges
+
+        :return: a tuple made of the first and second index of each pair
+
+        """
+        graph = self.graph
+        base_first, base_second = base_pairs
+        base_vertex = graph.edges[base_first, endpoint]
+        is_kept = ~np.isin(base_vertex, affected)
+        kept_vertex = base_vertex[is_kept]
+
+        # edges out of (or into) the affected vertices in the modified graph
+        ids = np.searchsorted(graph.vertices, affected)
+        in_base = ids < graph.n_vertices
+        in_base[in_base] = graph.vertices[ids[in_base]] == affected[in_base]
+        edges = _get_groups(base_indices, base_indptr, ids[in_base])
+        edges = edges[keep[edges]]
+        vertex = np.concatenate(
+            [graph.edges[edges, endpoint], added[:, endpoint]]
+        )
+        index = np.concatenate([
+            new_index[edges],
+            np.count_nonzero(keep) + np.arange(len(added)),
+        ])
+        order = np.lexsort((index, vertex))
+        vertex, index = vertex[order], index[order]
+        group_vertices, group_start = np.unique(vertex, return_index=True)
+        indptr = np.append(group_start, len(index))
+        first, second = _get_pairs_within_groups(index, indptr)
+        group_size = np.diff(indptr)
+        pair_vertex = np.repeat(
+            group_vertices, group_size * (group_size - 1) // 2
+        )
+
+        # the pairs are grouped by vertex in increasing order of label
+        positions = np.searchsorted(kept_vertex, pair_vertex)
+        return (
+            np.insert(new_index[base_first[is_kept]], positions, first),
+            np.insert(new_index[base_second[is_kept]], positions, second),
+        )
+
+    def _get_cycle_pairs(
+            self, added: np.ndarray, keep: np.ndarray, new_index: np.ndarray
+    ) -> tuple:
+        """Get the pairs of edges forming a cycle of length 2 in the modified
+        graph, ordered as get_Q_coo orders them.
+
+        :param added: added edges
+        :param keep: which edges of the base graph are kept
+        :param new_index: index in the modified graph of the kept edges
+
+        :return: a tuple made of the first and second index of each pair
+
+        """
+        base_first, base_second = self._cycle_pairs
+        is_kept = keep[base_first] & keep[base_second]
+        kept_first = new_index[base_first[is_kept]]
+        kept_second = new_index[base_second[is_kept]]
+
+        added_index = np.count_nonzero(keep) + np.arange(len(added))
+        # added edges whose reverse is a kept edge of the base graph
+        reverse = self.graph.find_edges(added[:, ::-1])
+        with_base = reverse >= 0
+        with_base[with_base] = keep[reverse[with_base]]
+        # added edges whose reverse is a later added edge
+        reverse_added = to_digraph(added).find_edges(added[:, ::-1])
+        with_added = reverse_added > np.arange(len(added))
+
+        first = np.concatenate([
+            new_index[reverse[with_base]], added_index[with_added]
         ])
-        if cross_products_out:
-            constraint_one_out += penalty_constants[v][0] * Constraint(
-                cross_products_out, label=f'one out for vertex: {v}'
-            )
-
-        # max one in
-        edges_in_v = get_edges_in_for_vertex(edges, v)
-        edges_in_v_pairs = [tuple(c) for c in combinations(edges_in_v, 2)]
-        cross_products_in = sum([
-            Binary(str((e[0]))) * Binary(str((e[1])))
-            for e in edges_in_v_pairs
+        second = np.concatenate([
+            added_index[with_base], added_index[reverse_added[with_added]]
         ])
-        if cross_products_in:
-            constraint_one_in += penalty_constants[v][1] * Constraint(
-                cross_products_in, label=f'one in for vertex: {v}'
-            )
-
-        edges_v = get_edges_for_vertex(edges, v)
-        edges_v_pairs = [tuple(c) for c in combinations(edges_v, 2)]
-        # cycle length at least three
-        cross_products_length_2_cycles = sum([
-            Binary(str((e[0]))) * Binary(str((e[1])))
-            for e in edges_v_pairs
-            if e[0][0] == e[1][1] and e[0][1] == e[1][0]
+        order = np.argsort(first)
+        first, second = first[order], second[order]
+        positions = np.searchsorted(kept_first, first)
+        return (
+            np.insert(kept_first, positions, first),
+            np.insert(kept_second, positions, second),
+        )
+
+    def get_coo(self, added=None, removed=None) -> tuple:
+        """Get the QUBO problem of the modified graph in coordinate format,
+        as get_Q_coo would return it.
+
+        :param added: edges to be added, none if not set
+        :param removed: edges of the base graph to be removed, none if not set
+
+        :return: a tuple made of the edges of the modified graph and the row,
+        col and bias arrays
+
+        """
+        graph = self.graph
+        added = np.asarray(
+            [] if added is None else added, dtype=np.int64
+        ).reshape(-1, 2)
+        removed = np.asarray(
+            [] if removed is None else removed, dtype=np.int64
+        ).reshape(-1, 2)
+
+        removed_index = graph.find_edges(removed)
+        if np.any(removed_index < 0):
+            raise ValueError('removed edges must be in the base graph')
+        keep = np.ones(graph.n_edges, dtype=bool)
+        keep[removed_index] = False
+        existing = graph.find_edges(added)
+        existing = existing[existing >= 0]
+        if np.any(keep[existing]) \
+                or len(np.unique(added, axis=0)) != len(added):
+            raise ValueError('added edges must not be in the graph')
+        new_index = np.cumsum(keep) - 1
+        edges = np.concatenate([graph.edges[keep], added])
+
+        out_first, out_second = self._get_group_pairs(
+            self._out_pairs, graph.out_edges, graph.out_indptr, 0, added,
+            np.unique(np.concatenate([removed[:, 0], added[:, 0]])),
+            keep, new_index,
+        )
+        in_first, in_second = self._get_group_pairs(
+            self._in_pairs, graph.in_edges, graph.in_indptr, 1, added,
+            np.unique(np.concatenate([removed[:, 1], added[:, 1]])),
+            keep, new_index,
+        )
+        cycle_first, cycle_second = self._get_cycle_pairs(
+            added, keep, new_index
+        )
+
+        diagonal = np.arange(len(edges))
+        row = np.concatenate([diagonal, out_first, in_first, cycle_first])
+        col = np.concatenate([diagonal, out_second, in_second, cycle_second])
+        bias = np.concatenate([
+            -np.ones(len(edges)),
+            np.full(len(out_first) + len(in_first), 1 + self.epsilon),
+            np.full(len(cycle_first), 2 + self.epsilon),
         ])
-        if cross_products_length_2_cycles:
-            # the factor 0.5 is to avoid double counting as each pair will be
-            # present twice as we are looping through the vertices
-            constraint_min_three += 0.5 * penalty_constants[v][2] * Constraint(
-                cross_products_length_2_cycles,
-                label=f'min three cycle length for vertex: {v}'
-            )
+        return edges, row, col, bias
 
-    cost += constraint_one_out
-    cost += constraint_one_in
-    cost += constraint_min_three
+    def get_Q(self, added=None, removed=None) -> dict:
+        """Get the QUBO problem of the modified graph, as get_Q would return
+        it.
 
-    return cost
+        :param added: edges to be added, none if not set
+        :param removed: edges of the base graph to be removed, none if not set
 
+        :return: QUBO matrix
 
-def _cost_to_qubo(cost) -> dict:
-    """Get the the Q matrix corresponding to the given cost.
+        """
+        edges, row, col, bias = self.get_coo(added, removed)
+        return coo_to_qubo_dict(edges, row, col, bias)
 
-    :param cost: cost
+    def get_coo_qubo(self, added=None, removed=None) -> CooQubo:
+        """Get the QUBO problem of the modified graph, as get_coo_qubo would
+        return it, without building its dictionary.
 
-    :return: QUBO matrix
+        :param added: edges to be added, none if not set
+        :param removed: edges of the base graph to be removed, none if not set
 
-    """
-    model = cost.compile()
-    Q = model.to_qubo()[0]
-    return Q
+        :return: QUBO problem
 
+        """
+        edges, row, col, bias = self.get_coo(added, removed)
+        # the labels of the base graph are rendered once, the edges of the
+        # modified graph are the kept edges followed by the added ones
+        if self._labels is None:
+            self._labels = get_labels(self.graph)
+        keep = np.ones(self.graph.n_edges, dtype=bool)
+        if removed is not None and len(removed):
+            keep[self.graph.find_edges(removed)] = False
+        kept_labels = self._labels if keep.all() else [
+            self._labels[i] for i in np.flatnonzero(keep).tolist()
+        ]
+        labels = kept_labels + get_labels(edges[np.count_nonzero(keep):])
+        return CooQubo(edges, row, col, bias, labels)
 
-def get_Q(edges: list) -> dict:
-    """Transform the input edges into a QUBO problem defined by Q.
 
-    :param edges: edges of the input graph
+def calculate_energies(Q, samples) -> np.ndarray:
+    """Calculate the energy of many states at once for the QUBO problem
+    defined by the sparse matrix Q.
 
-    :return: QUBO matrix
+    :param Q: QUBO matrix, sparse or dense, of shape (n_variables,
+    n_variables)
+    :param samples: 0/1 matrix of shape (n_samples, n_variables), dense or
+    sparse
+
+    :return: energy of each sample
 
     """
-    cost = _get_cost(edges)
-    Q = _cost_to_qubo(cost)
-    return Q
+    Q = sparse.csr_matrix(Q)
+    linear = Q.diagonal()
+    quadratic = Q - sparse.diags(linear)
+    if sparse.issparse(samples):
+        samples = sparse.csr_matrix(samples, dtype=float)
+        energies = samples @ linear + np.asarray(
+            (samples @ quadratic).multiply(samples).sum(axis=1)
+        ).ravel()
+    else:
+        samples = np.atleast_2d(np.asarray(samples, dtype=float))
+        energies = samples @ linear + np.sum(
+            (quadratic.T @ samples.T).T * samples, axis=1
+        )
+    return energies
 
 
 def calculate_energy_for_state(Q: dict, state: list) -> float:
@@ -143,11 +642,16 @@ def calculate_energy_for_state(Q: dict, state: list) -> float:
     :return: energy
 
     """
-    energy = 0
+    labels = list(dict.fromkeys(chain.from_iterable(Q.keys())))
+    index = {label: i for i, label in enumerate(labels)}
+    row = [index[i] for i, _ in Q.keys()]
+    col = [index[j] for _, j in Q.keys()]
+    Q_sparse = sparse.coo_matrix(
+        (list(Q.values()), (row, col)), shape=(len(labels), len(labels))
+    )
+
+    sample = np.zeros(len(labels))
     state_str = [str(edge) for edge in state]
+    sample[[index[k] for k in state_str if k in index]] = 1
 
-    for k in product(state_str, state_str):
-        if k in Q.keys():
-            energy += Q[k]
-
-    return energy
+    return float(calculate_energies(Q_sparse, sample)[0])
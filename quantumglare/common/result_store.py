@@ -0,0 +1,331 @@
+import os
+import shutil
+import urllib.parse
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from quantumglare.common import utils
+
+# columns of the output produced by quantum_solver.solve that are stored
+# with a nested type, the states table is stored in the column 'states'
+NESTED_COLUMNS = ['input_graph', 'solutions', 'states']
+
+# parameters identifying a run of a sweep, see get_completed_keys
+RUN_KEY_COLUMNS = ['tag', 'seed_input_graph', 'seed_embedding']
+
+_STATE_FIELDS = [
+    'energy',
+    'absolute_frequency',
+    'relative_frequency',
+    'is_valid',
+    'component',
+    'is_valid_repaired',
+]
+
+
+def _get_schema():
+    """Get the schema of the result store. The edges are stored as pairs of
+    integers and the states as indices of the edges of the input graph.
+
+    :return: pyarrow schema
+
+    """
+    import pyarrow as pa
+
+    edges = pa.list_(pa.list_(pa.int64(), 2))
+    states = pa.list_(pa.struct([
+        ('state', pa.list_(pa.int32())),
+        ('energy', pa.float64()),
+        ('absolute_frequency', pa.int64()),
+        ('relative_frequency', pa.float64()),
+        ('is_valid', pa.bool_()),
+        ('component', pa.int64()),
+        ('is_valid_repaired', pa.bool_()),
+    ]))
+    types = {
+        'tag': pa.string(),
+        'n_cycles': pa.int64(),
+        'cycle_length': pa.int64(),
+        'n_vertices': pa.int64(),
+        'p_noise': pa.float64(),
+        'n_edges_noise': pa.int64(),
+        'seed_input_graph': pa.int64(),
+        'seed_embedding': pa.int64(),
+        'num_reads': pa.int64(),
+        'anneal_time': pa.float64(),
+        'pause_duration': pa.float64(),
+        'pause_start': pa.float64(),
+        'backend': pa.string(),
+        'n_components': pa.int64(),
+        'n_fixed_edges': pa.int64(),
+        'n_removed_edges': pa.int64(),
+        'embedding_cache_hit': pa.bool_(),
+        'chain_length_max': pa.int64(),
+        'peak_memory': pa.int64(),
+        'input_graph': edges,
+        'solutions': pa.list_(edges),
+        'states': states,
+        'embedding_context': pa.string(),
+    }
+    columns = [
+        'states' if column == 'dwave_solution_df' else column
+        for column in utils.OUTPUT_COLUMNS
+    ]
+    return pa.schema([(c, types.get(c, pa.float64())) for c in columns])
+
+
+def _get_states_array(states_dfs: list, states_type):
+    """Get the column of states of a table of the result store from the
+    states tables given by quantum_solver.solve, whose states are already
+    indices of the edges of the input graph. The arrays are built from the
+    columns of the tables, without going through Python objects.
+
+    :param states_dfs: states table of each run
+    :param states_type: pyarrow type of the column of states
+
+    :return: pyarrow array with the states of each run
+
+    """
+    import pyarrow as pa
+
+    states_df = pd.concat(states_dfs, ignore_index=True)
+    state_lengths = [len(state) for state in states_df['state']]
+    state_values = np.concatenate(
+        [np.zeros(0, dtype=np.int32)] + list(states_df['state'])
+    ).astype(np.int32)
+    arrays = []
+    for field in states_type.value_type:
+        if field.name == 'state':
+            arrays.append(pa.ListArray.from_arrays(
+                _get_offsets(state_lengths), state_values
+            ))
+        elif field.name in states_df.columns:
+            arrays.append(pa.array(
+                states_df[field.name].to_numpy(), type=field.type,
+                from_pandas=True,
+            ))
+        else:
+            arrays.append(pa.nulls(len(states_df), type=field.type))
+    return pa.ListArray.from_arrays(
+        _get_offsets([len(df) for df in states_dfs]),
+        pa.StructArray.from_arrays(
+            arrays, fields=list(states_type.value_type)
+        ),
+    )
+
+
+def _get_offsets(lengths: list):
+    import pyarrow as pa
+
+    return pa.array(
+        np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+        type=pa.int32(),
+    )
+
+
+def write_output(data: list, directory: str) -> None:
+    """Write the output of quantum_solver.solve to the result store in
+    directory, partitioned by tag. Every call writes new files, so that
+    several processes can write to the same store. Each file is written
+    under a hidden name, which the readers of the store skip, and renamed
+    once complete, so that an interrupted write leaves no partial run in the
+    store.
+
+    :param data: rows of the output, with the columns utils.OUTPUT_COLUMNS
+    :param directory: root directory of the result store
+
+    :return: None
+
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    records = [dict(zip(utils.OUTPUT_COLUMNS, row)) for row in data]
+    for record in records:
+        record['input_graph'] = np.asarray(
+            record['input_graph'], dtype=np.int64
+        ).reshape(-1, 2).tolist()
+        record['solutions'] = [
+            [list(e) for e in solution] for solution in record['solutions']
+        ]
+    schema = _get_schema()
+    schema = schema.remove(schema.get_field_index('tag'))
+    states_index = schema.get_field_index('states')
+    states_field = schema.field(states_index)
+    schema = schema.remove(states_index)
+    tags = list(dict.fromkeys(record['tag'] for record in records))
+    for tag in tags:
+        partition_directory = os.path.join(
+            directory, f"tag={urllib.parse.quote(str(tag), safe='')}"
+        )
+        os.makedirs(partition_directory, exist_ok=True)
+        tag_records = [record for record in records if record['tag'] == tag]
+        table = pa.Table.from_pylist(tag_records, schema=schema).add_column(
+            states_index,
+            states_field,
+            _get_states_array(
+                [record['dwave_solution_df'] for record in tag_records],
+                states_field.type,
+            ),
+        )
+        filename = f'{uuid.uuid4().hex}.parquet'
+        tmp_filename = os.path.join(partition_directory, f'.{filename}.tmp')
+        pq.write_table(table, tmp_filename)
+        os.replace(tmp_filename, os.path.join(partition_directory, filename))
+    return None
+
+
+def get_run_key(params: dict) -> tuple:
+    """Get the key identifying a run, made of its parameters
+    RUN_KEY_COLUMNS.
+
+    :param params: parameters of the run
+
+    :return: tuple of parameters
+
+    """
+    return tuple(params.get(column) for column in RUN_KEY_COLUMNS)
+
+
+def get_completed_keys(directory: str) -> set:
+    """Get the keys of the runs written to the result store in directory,
+    read from the columns RUN_KEY_COLUMNS of the store only. A run is in the
+    store once its file is complete, see write_output.
+
+    :param directory: root directory of the result store
+
+    :return: set of keys given by get_run_key, empty if there is no store
+
+    """
+    return set(get_completed_runs(directory))
+
+
+def get_completed_runs(directory: str) -> dict:
+    """Get the QPU access time of the runs written to the result store in
+    directory, read from the columns RUN_KEY_COLUMNS and qpu_access_time of
+    the store only.
+
+    :param directory: root directory of the result store
+
+    :return: dictionary of QPU access times, in microseconds, None for the
+    runs that do not report it, by key given by get_run_key, empty if there
+    is no store
+
+    """
+    if not os.path.isdir(directory):
+        return {}
+    table = get_dataset(directory).to_table(
+        columns=RUN_KEY_COLUMNS + ['qpu_access_time']
+    )
+    keys = zip(*(table[column].to_pylist() for column in RUN_KEY_COLUMNS))
+    return dict(zip(keys, table['qpu_access_time'].to_pylist()))
+
+
+def read_results(
+        directory: str,
+        columns: list = None,
+        tags: list = None,
+) -> pd.DataFrame:
+    """Read the result store in directory, with the schema of the store, see
+    get_dataset. Only the requested columns are read from disk, so reading
+    the scalar columns does not decode the graphs and the states.
+
+    The input graph and the solutions are returned as lists of tuples, the
+    states as they are stored, to be decoded with get_states_df.
+
+    :param directory: root directory of the result store
+    :param columns: columns to be read, all of them if not set
+    :param tags: tags to be read, all of them if not set
+
+    :return: dataframe with one row per run
+
+    """
+    import pyarrow.dataset as ds
+
+    table = get_dataset(directory).to_table(
+        columns=columns,
+        filter=ds.field('tag').isin(list(tags)) if tags is not None
+        else None,
+    )
+    scalar_columns = [c for c in table.column_names if c not in NESTED_COLUMNS]
+    df = table.select(scalar_columns).to_pandas()
+    if 'tag' in df.columns:
+        df['tag'] = df['tag'].astype(str)
+    if 'input_graph' in table.column_names:
+        df['input_graph'] = [
+            [tuple(edge) for edge in edges]
+            for edges in table['input_graph'].to_pylist()
+        ]
+    if 'solutions' in table.column_names:
+        df['solutions'] = [
+            [[tuple(edge) for edge in solution] for solution in solutions]
+            for solutions in table['solutions'].to_pylist()
+        ]
+    if 'states' in table.column_names:
+        df['states'] = table['states'].to_pylist()
+    return df[table.column_names]
+
+
+def get_dataset(directory: str, files: list = None):
+    """Get the result store in directory as a pyarrow dataset with the schema
+    of the store, so that the columns missing from the files written before
+    they were added are read as nulls.
+
+    :param directory: root directory of the result store
+    :param files: files of the store in the dataset, all of them if not set
+
+    :return: pyarrow dataset
+
+    """
+    import pyarrow.dataset as ds
+
+    return ds.dataset(
+        files if files is not None else directory,
+        schema=_get_schema(),
+        format='parquet',
+        partitioning='hive',
+        partition_base_dir=directory if files is not None else None,
+    )
+
+
+def get_states_df(states: list, input_graph: list) -> pd.DataFrame:
+    """Decode the states of a run read with read_results into a dataframe
+    sorted by energy, with each state given as a list of edges.
+
+    :param states: states of the run
+    :param input_graph: edges of the input graph of the run
+
+    :return: dataframe with states, energy and frequency
+
+    """
+    edges = np.array(input_graph, dtype=np.int64).reshape(-1, 2)
+    states_df = pd.DataFrame(
+        {
+            'state': [
+                [tuple(edge) for edge in edges[state['state']].tolist()]
+                for state in states
+            ],
+            **{
+                field: [state[field] for state in states]
+                for field in _STATE_FIELDS
+            },
+        }
+    )
+    return states_df.sort_values(by='energy', kind='stable')
+
+
+def merge_stores(directories: list, directory: str) -> None:
+    """Merge result stores into the store in directory. The files of a store
+    have unique names, so they are copied without being read.
+
+    :param directories: root directories of the stores to be merged
+    :param directory: root directory of the merged store
+
+    :return: None
+
+    """
+    for source in directories:
+        shutil.copytree(source, directory, dirs_exist_ok=True)
+    return None
@@ -3,6 +3,56 @@ import os
 import numpy as np
 import pandas as pd
 
+# columns of the output produced by quantum_solver.solve
+OUTPUT_COLUMNS = [
+    'tag',
+    'n_cycles',
+    'cycle_length',
+    'n_vertices',
+    'p_noise',
+    'n_edges_noise',
+    'seed_input_graph',
+    'seed_embedding',
+    'num_reads',
+    'anneal_time',
+    'pause_duration',
+    'pause_start',
+    'backend',
+    'n_components',
+    'n_fixed_edges',
+    'n_removed_edges',
+    'time_qubo',
+    'time_dwave_response',
+    'time_embedding',
+    'embedding_cache_hit',
+    'time_embedding_saved',
+    'chain_strength',
+    'chain_length_max',
+    'chain_length_mean',
+    'chain_break_fraction',
+    'qpu_access_time',
+    'qpu_programming_time',
+    'qpu_sampling_time',
+    'qpu_anneal_time_per_sample',
+    'qpu_readout_time_per_sample',
+    'qpu_delay_time_per_sample',
+    'time_submit',
+    'time_wait',
+    'time_unembed',
+    'time_decode',
+    'time_validate',
+    'time_repair',
+    'peak_memory',
+    'time_overall_computation',
+    'solution_frequency',
+    'solution_frequency_repaired',
+    'runs_to_solution',
+    'input_graph',
+    'solutions',
+    'dwave_solution_df',
+    'embedding_context',
+]
+
 
 def convert_list_of_strings_to_list_of_tuples(x: list) -> list:
     """Convert  e.g. ['(12, 5)', '(5, 12)'] to [(12, 5), (5, 12)]
@@ -27,44 +77,47 @@ def comb(n, k):
     return np.math.factorial(n)/(np.math.factorial(k)*np.math.factorial(n-k))
 
 
+def render_states_df(states_df: pd.DataFrame, input_graph: list) -> str:
+    """Render the states table given by quantum_solver.solve in the JSON
+    records format, with each state as a string of the form
+    "['(u, v)', ...]".
+
+    :param states_df: states table, with each state as the indices of its
+    edges in the input graph
+    :param input_graph: edges of the input graph
+
+    :return: states table in JSON records format
+
+    """
+    labels = [
+        str(tuple(edge))
+        for edge in np.asarray(input_graph, dtype=np.int64).reshape(-1, 2)
+        .tolist()
+    ]
+    return states_df.assign(state=[
+        str([labels[i] for i in state]) for state in states_df['state']
+    ]).to_json(orient='records')
+
+
 def write_output_to_csv(
         data: dict,
         filename: str,
 ) -> None:
     """
-    :param data: data to be written to CSV
+    :param data: data to be written to CSV, the states tables are rendered
+    with render_states_df
     :param filename: filename for the output CSV file
 
     :return:
 
     """
-    enriched_data = data
-    output_df = pd.DataFrame(
-        data=enriched_data,
-        columns=[
-            'tag',
-            'n_cycles',
-            'cycle_length',
-            'n_vertices',
-            'p_noise',
-            'n_edges_noise',
-            'seed_input_graph',
-            'seed_embedding',
-            'num_reads',
-            'anneal_time',
-            'pause_duration',
-            'pause_start',
-            'time_qubo',
-            'time_dwave_response',
-            'time_overall_computation',
-            'solution_frequency',
-            'runs_to_solution',
-            'input_graph',
-            'solutions',
-            'dwave_solution_df',
-            'embedding_context',
-        ]
-    )
+    output_df = pd.DataFrame(data=data, columns=OUTPUT_COLUMNS)
+    output_df['dwave_solution_df'] = [
+        render_states_df(states_df, input_graph)
+        for states_df, input_graph in zip(
+            output_df['dwave_solution_df'], output_df['input_graph']
+        )
+    ]
     output_df.to_csv(
         filename,
         mode='a',
@@ -1,6 +1,4 @@
-import pandas as pd
-
-from quantumglare.common import utils
+from quantumglare.common import result_store
 
 
 def inspect_single_run(raw_df, tag):
@@ -26,16 +24,14 @@ def inspect_single_run(raw_df, tag):
 
     for j in range(len(df)):
         print(f'======{j}=========')
-        solution_df = pd.read_json(df['dwave_solution_df'].values[j])
+        solution_df = result_store.get_states_df(
+            df['states'].values[j], df['input_graph'].values[j]
+        )
         print(solution_df)
         print(solution_df[['energy']].iloc[0].values)
-        sol1 = utils.convert_list_of_strings_to_list_of_tuples(
-            eval(solution_df[['state']].iloc[0].values[0])
-        )
+        sol1 = solution_df['state'].iloc[0]
         # print(solution_df[['energy']].iloc[1].values)
-        sol2 = utils.convert_list_of_strings_to_list_of_tuples(
-            eval(solution_df[['state']].iloc[1].values[0])
-        )
+        sol2 = solution_df['state'].iloc[1]
 
         print(sol1)
         print(sol2)
@@ -44,11 +40,9 @@ def inspect_single_run(raw_df, tag):
 
 
 def main():
-    raw_df = pd.read_csv("data/raw_data.csv")
-    inspect_single_run(
-        raw_df,
-        'deafult_minorminer_n_cycles_45_cycle_length_4_n_edges_noise_96'
-    )
+    tag = 'deafult_minorminer_n_cycles_45_cycle_length_4_n_edges_noise_96'
+    raw_df = result_store.read_results("data/raw_data", tags=[tag])
+    inspect_single_run(raw_df, tag)
 
 
 if __name__ == '__main__':
@@ -1,11 +1,55 @@
+import argparse
+import json
+import logging
 import os
+from itertools import product
+
 import numpy as np
 
-from quantumglare.solvers import quantum_solver
-from quantumglare.common import graph, utils
+from quantumglare.solvers import backends, quantum_solver
+from quantumglare.common import graph, metrics, qubo, result_store, utils
 
+RAW_DATA_DIR = os.path.join('data', 'raw_data')
 
-def generate_raw_data(
+# sweep of the runs needed for the figures of the article, see read_sweep
+ARTICLE_SWEEP_FILENAME = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'sweeps', 'article.json'
+)
+
+# keys of the specification of a sweep and of its grids, see read_sweep
+SWEEP_KEYS = {
+    'description',
+    'grids',
+    'seeds_embedding',
+    'solver_params',
+    'backend',
+    'budget',
+}
+GRID_KEYS = {
+    'description',
+    'cycle_length',
+    'n_cycles',
+    'p_noise',
+    'n_edges_noise',
+    'seed_input_graph',
+    'tag_prefix',
+}
+
+# parameters of the solver of the runs, when the sweep does not set them
+DEFAULT_SOLVER_PARAMS = {
+    'anneal_time': 200,
+    'num_reads': 100,
+    'pause_duration': 100,
+    'pause_start': 0.4,
+}
+
+# parameters of a run used as labels of its metrics, with the backend
+METRICS_LABELS = ['tag', 'seed_input_graph', 'seed_embedding']
+
+logger = logging.getLogger(__name__)
+
+
+def get_jobs(
         n_cycles: int,
         cycle_length: int,
         p_noise: float = None,
@@ -13,10 +57,10 @@ def generate_raw_data(
         seeds_embedding=list(range(0, 50)),
         seed_input_graph: int = None,
         tag_prefix='',
-):
-    """Generate raw output data obtained from the quantum annealer for the
-    input problem and parameters specified. The data are written in the
-    specified file.
+        solver_params: dict = None,
+) -> list:
+    """Get the parameters of every run needed to generate the raw data for
+    the input problem and parameters specified.
 
     :param n_cycles: number of cycles
     :param cycle_length: cycle length of each cycle
@@ -26,8 +70,10 @@ def generate_raw_data(
     generation of the embedding
     :param seed_input_graph: seed for the input graph
     :param tag_prefix: prefix for the tag
+    :param solver_params: parameters of the solver, such as the number of
+    reads and the anneal schedule, DEFAULT_SOLVER_PARAMS if not set
 
-    :return: None
+    :return: list of parameters, one per run
 
     """
     if p_noise is None and n_edges_noise is None:
@@ -46,17 +92,14 @@ def generate_raw_data(
     tag = tag_prefix + f"n_cycles_{n_cycles}_cycle_length_{cycle_length}" \
                        f"_n_edges_noise_{n_edges_noise}"
 
-    graph_hamiltonian_cycles = graph.create_graph_hamiltonian_cycles(
-        n_cycles=n_cycles, cycle_length=cycle_length
-    )
-
     if seed_input_graph is not None:
         seeds_input_graph = [seed_input_graph] * len(seeds_embedding)
     else:
         seeds_input_graph = seeds_embedding
 
+    jobs = []
     for seed_e, seed_ig in zip(seeds_embedding, seeds_input_graph):
-        params = {
+        jobs.append({
             'tag': tag,
             'seed_input_graph': seed_ig,
             'seed_embedding': seed_e,
@@ -65,98 +108,516 @@ def generate_raw_data(
             'n_vertices': n_vertices,
             'p_noise': p_noise,
             'n_edges_noise': n_edges_noise,
-            'anneal_time': 200,
-            'num_reads': 100,
-            'pause_duration': 100,
-            'pause_start': 0.4,
-        }
-        print(f"\n====== n_cycles: {n_cycles}, cycle_length: {cycle_length}, "
-              f"n_edges_noise: {n_edges_noise}, seed_embedding: {seed_e}, "
-              f"seed_input_graph: {seed_ig} ======")
-        input_graph = graph.add_noise(
-            graph_hamiltonian_cycles, n_edges_noise, seed_ig
-        )
-        output = quantum_solver.solve(
-            input_graph=input_graph,
-            params=params,
+            **(solver_params or DEFAULT_SOLVER_PARAMS),
+        })
+    return jobs
+
+
+def write_run(
+        output: list,
+        params: dict,
+        run_metrics: metrics.Metrics,
+        directory: str,
+        metrics_filename: str = None,
+) -> None:
+    """Write the output of a run to the result store, and the metrics of the
+    run, including the time to write it, to a metrics file if set.
+
+    :param output: output of quantum_solver.solve
+    :param params: parameters of the run
+    :param run_metrics: metrics of the run
+    :param directory: root directory of the result store
+    :param metrics_filename: file the metrics are written to with
+    metrics.write_metrics, they are not written if not set
+
+    :return: None
+
+    """
+    with run_metrics.span('write'):
+        result_store.write_output(data=output, directory=directory)
+    if metrics_filename:
+        labels = {label: params.get(label) for label in METRICS_LABELS}
+        labels['backend'] = output[0][utils.OUTPUT_COLUMNS.index('backend')]
+        metrics.write_metrics(
+            labels, run_metrics.get_record(), metrics_filename
         )
-        filename = os.path.join('data', 'raw_data.csv')
-        utils.write_output_to_csv(data=output, filename=filename)
     return None
 
 
-def main():
-    seeds_embedding = list(range(0, 2))
-
-    # Note that for a Dwave Advantage processor with 5436 qubits,
-    # the theoretical maximum for zero noise is 1359 (using cycles of length 4)
-    # generate data for Fig 3a - different p_noise
-    n_cycles_list = [15, 150, 300, 450, 600, 750, 900, 1050, 1200, 1350]
-    for n_cycles in n_cycles_list:
-        generate_raw_data(
-            n_cycles=n_cycles,
-            cycle_length=4,
-            p_noise=0,
-            seeds_embedding=seeds_embedding,
-        )
+def run_jobs(
+        jobs: list,
+        directory: str = RAW_DATA_DIR,
+        metrics_filename: str = None,
+        trace_memory: bool = False,
+        resume: bool = True,
+        budget: float = None,
+) -> None:
+    """Run the quantum solver for every job and write the output data to the
+    result store in the specified directory, one run at a time, so that an
+    interrupted sweep keeps the runs already done.
 
-    n_cycles_list = [150, 300, 450, 600, 750, 900, 1050]
-    for n_cycles in n_cycles_list:
-        generate_raw_data(
-            n_cycles=n_cycles,
-            cycle_length=4,
-            p_noise=5e-5,
-            seeds_embedding=seeds_embedding,
-        )
+    With resume, the jobs whose run is already in the result store, by
+    result_store.get_run_key, are skipped, so that restarting a sweep only
+    runs the missing jobs and does not write duplicates. The jobs left are
+    then run in order as long as their estimated QPU access time fits in
+    what is left of the budget once the runs already in the result store are
+    deducted, see plan_jobs.
 
-    n_cycles_list = [150, 300, 450, 600, 750, 900]
-    for n_cycles in n_cycles_list:
-        generate_raw_data(
-            n_cycles=n_cycles,
-            cycle_length=4,
-            p_noise=1e-4,
-            seeds_embedding=seeds_embedding,
-        )
+    :param jobs: list of parameters, one per run
+    :param directory: root directory of the result store
+    :param metrics_filename: file the metrics of the runs are written to,
+    they are not written if not set
+    :param trace_memory: whether to trace the peak memory of the stages of
+    the runs
+    :param resume: whether to skip the jobs already in the result store
+    :param budget: largest estimated QPU access time of the jobs run, in
+    seconds, not limited if not set
 
-    # generate additional data for Fig 3b - different cycle_length
-    n_cycles_list = [20, 200, 400, 600, 800, 1000, 1200, 1400]
-    for n_cycles in n_cycles_list:
-        generate_raw_data(
-            n_cycles=n_cycles,
-            cycle_length=3,
-            p_noise=5e-5,
-            seeds_embedding=seeds_embedding,
+    :return: None
+
+    """
+    completed_runs = (
+        result_store.get_completed_runs(directory) if resume else {}
+    )
+    plan = plan_jobs(jobs, budget, completed_runs)
+    log_plan(*plan)
+    jobs = plan[0]
+    base_qubos = {}
+    with backends.SolverSession() as session:
+        for params in jobs:
+            _run_job(
+                params,
+                base_qubos,
+                session,
+                directory,
+                metrics_filename,
+                metrics.Metrics(trace_memory),
+            )
+    return None
+
+
+def _run_job(
+        params: dict,
+        base_qubos: dict,
+        session: backends.SolverSession,
+        directory: str,
+        metrics_filename: str = None,
+        run_metrics: metrics.Metrics = None,
+) -> None:
+    """Run the quantum solver for one job and write the output data to the
+    result store in the specified directory.
+
+    :param params: parameters of the run
+    :param base_qubos: QUBO problems of the graphs made of Hamiltonian
+    cycles already built, by (n_cycles, cycle_length)
+    :param session: session providing the backend
+    :param directory: root directory of the result store
+    :param metrics_filename: file the metrics of the run are written to,
+    they are not written if not set
+    :param run_metrics: metrics of the run, new metrics are created if not
+    set
+
+    :return: None
+
+    """
+    run_metrics = run_metrics or metrics.Metrics()
+    n_cycles = params['n_cycles']
+    cycle_length = params['cycle_length']
+    n_edges_noise = params['n_edges_noise']
+    seed_e = params['seed_embedding']
+    seed_ig = params['seed_input_graph']
+    key = (n_cycles, cycle_length)
+    if key not in base_qubos:
+        base_qubos[key] = qubo.IncrementalQubo(
+            graph.create_graph_hamiltonian_cycles(
+                n_cycles=n_cycles, cycle_length=cycle_length
+            )
         )
+    base_qubo = base_qubos[key]
+
+    logger.info('====== n_cycles: %d, cycle_length: %d, n_edges_noise: %d, '
+                'seed_embedding: %d, seed_input_graph: %d ======',
+                n_cycles, cycle_length, n_edges_noise, seed_e, seed_ig)
+    input_graph = graph.add_noise(
+        base_qubo.graph.to_list(), n_edges_noise, seed_ig
+    )
+    output = quantum_solver.solve(
+        input_graph=input_graph,
+        params=params,
+        session=session,
+        base_qubo=base_qubo,
+        run_metrics=run_metrics,
+    )
+    write_run(output, params, run_metrics, directory, metrics_filename)
+    return None
+
+
+def generate_raw_data(
+        n_cycles: int,
+        cycle_length: int,
+        p_noise: float = None,
+        n_edges_noise: int = None,
+        seeds_embedding=list(range(0, 50)),
+        seed_input_graph: int = None,
+        tag_prefix='',
+):
+    """Generate raw output data obtained from the quantum annealer for the
+    input problem and parameters specified. The data are written in the
+    result store.
 
-    n_cycles_list = [12, 120, 240, 360, 480, 600, 720, 840]
-    for n_cycles in n_cycles_list:
-        generate_raw_data(
+    :param n_cycles: number of cycles
+    :param cycle_length: cycle length of each cycle
+    :param p_noise: fraction of noise edges added
+    :param n_edges_noise: number of noise edges added
+    :param seeds_embedding: start values for the random seeds used for
+    generation of the embedding
+    :param seed_input_graph: seed for the input graph
+    :param tag_prefix: prefix for the tag
+
+    :return: None
+
+    """
+    run_jobs(
+        get_jobs(
             n_cycles=n_cycles,
-            cycle_length=5,
-            p_noise=5e-5,
+            cycle_length=cycle_length,
+            p_noise=p_noise,
+            n_edges_noise=n_edges_noise,
             seeds_embedding=seeds_embedding,
+            seed_input_graph=seed_input_graph,
+            tag_prefix=tag_prefix,
         )
+    )
+    return None
 
-    # generate data for Fig 4 - different Nv
-    n_edges_noise_list = [0, 100, 200, 300, 400, 500, 600]
-    for n_edges_noise in n_edges_noise_list:
-        generate_raw_data(
-            n_cycles=250,
-            cycle_length=4,
-            n_edges_noise=n_edges_noise,
-            seeds_embedding=seeds_embedding,
+
+def get_shard(jobs: list, shard_index: int, n_shards: int) -> list:
+    """Get the jobs assigned to a shard. The jobs are dealt round-robin, so
+    that every shard gets a similar mix of small and large problems.
+
+    :param jobs: list of parameters, one per run
+    :param shard_index: index of the shard, from 0 to n_shards - 1
+    :param n_shards: total number of shards
+
+    :return: the jobs of the shard
+
+    """
+    if not 0 <= shard_index < n_shards:
+        raise ValueError(
+            f'shard_index must be between 0 and {n_shards - 1}, '
+            f'got {shard_index}'
         )
+    return jobs[shard_index::n_shards]
+
+
+def get_shard_directory(shard_index: int, n_shards: int) -> str:
+    """Get the root directory of the result store written by a shard.
 
-    n_edges_noise_list = [
-        0, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1100, 1200
+    :param shard_index: index of the shard
+    :param n_shards: total number of shards
+
+    :return: directory
+
+    """
+    return os.path.join('data', f'raw_data_shard_{shard_index}_of_{n_shards}')
+
+
+def merge_shards(n_shards: int, directory: str = RAW_DATA_DIR) -> None:
+    """Merge the result stores of all the shards into a single store.
+
+    :param n_shards: total number of shards
+    :param directory: root directory of the merged result store
+
+    :return: None
+
+    """
+    shard_directories = [
+        get_shard_directory(k, n_shards) for k in range(n_shards)
     ]
-    for n_edges_noise in n_edges_noise_list:
-        generate_raw_data(
-            n_cycles=1000,
-            cycle_length=4,
-            n_edges_noise=n_edges_noise,
-            seeds_embedding=seeds_embedding,
+    missing = [d for d in shard_directories if not os.path.isdir(d)]
+    if missing:
+        raise FileNotFoundError(f'missing shard outputs: {missing}')
+
+    result_store.merge_stores(shard_directories, directory)
+    return None
+
+
+def read_sweep(filename: str) -> dict:
+    """Read the specification of a sweep from a JSON file, with the keys:
+        - grids: list of grids, each with cycle_length, a list of n_cycles
+          and a list of either p_noise or n_edges_noise, and optionally
+          seed_input_graph and tag_prefix as in get_jobs
+        - seeds_embedding: random seeds of the embedding of every point
+        - solver_params: parameters of the solver, such as the number of
+          reads and the anneal schedule, DEFAULT_SOLVER_PARAMS if not set
+        - backend: backend of the solver, settings.BACKEND if not set
+        - budget: largest estimated QPU access time of the sweep, in
+          seconds, not limited if not set
+    and an optional description, of the sweep and of each grid.
+
+    :param filename: name of the JSON file
+
+    :return: specification of the sweep
+
+    """
+    with open(filename) as f:
+        sweep = json.load(f)
+    if not sweep.get('grids'):
+        raise ValueError(f'the sweep in {filename} has no grids')
+    unknown = set(sweep) - SWEEP_KEYS
+    for grid in sweep['grids']:
+        unknown |= set(grid) - GRID_KEYS
+    if unknown:
+        raise ValueError(
+            f'unknown keys in the sweep in {filename}: {sorted(unknown)}'
         )
+    return sweep
+
+
+def get_sweep_jobs(sweep: dict, seeds_embedding: list = None) -> list:
+    """Get the parameters of every run of a sweep, grid by grid, in the
+    order of the grids.
+
+    :param sweep: specification of the sweep, see read_sweep
+    :param seeds_embedding: random seeds of the embedding, those of the
+    sweep if not set
+
+    :return: list of parameters, one per run
+
+    """
+    if seeds_embedding is None:
+        seeds_embedding = sweep['seeds_embedding']
+    solver_params = dict(sweep.get('solver_params') or DEFAULT_SOLVER_PARAMS)
+    if sweep.get('backend') is not None:
+        solver_params['backend'] = sweep['backend']
+    jobs = []
+    for grid in sweep['grids']:
+        noise_parameter = 'p_noise' if 'p_noise' in grid else 'n_edges_noise'
+        for n_cycles, noise in product(
+                grid['n_cycles'], grid.get(noise_parameter) or [None]
+        ):
+            jobs += get_jobs(
+                n_cycles=n_cycles,
+                cycle_length=grid['cycle_length'],
+                seeds_embedding=seeds_embedding,
+                seed_input_graph=grid.get('seed_input_graph'),
+                tag_prefix=grid.get('tag_prefix', ''),
+                solver_params=solver_params,
+                **{noise_parameter: noise},
+            )
+    return jobs
+
+
+def get_article_jobs(seeds_embedding: list) -> list:
+    """Get the parameters of every run needed for the figures of the
+    article, in a deterministic order. The runs are those of the sweep in
+    ARTICLE_SWEEP_FILENAME.
+
+    :param seeds_embedding: start values for the random seeds used for
+    generation of the embedding
+
+    :return: list of parameters, one per run
+
+    """
+    return get_sweep_jobs(read_sweep(ARTICLE_SWEEP_FILENAME), seeds_embedding)
+
+
+def get_estimated_time(params: dict) -> float:
+    """Get the QPU access time of a run estimated with
+    backends.estimate_qpu_access_time, in seconds."""
+    return 1e-6 * backends.estimate_qpu_access_time(params)
+
+
+def order_jobs(jobs: list) -> list:
+    """Order the jobs so that the most informative and the cheapest runs
+    come first: every point of the sweep, i.e. every tag, gets its first run
+    before any gets its second one, and so on. Within a round the runs go by
+    increasing estimated QPU access time, then by increasing size of the
+    problem.
+
+    :param jobs: list of parameters, one per run
+
+    :return: ordered list of parameters
+
+    """
+    rounds = []
+    n_runs = {}
+    for params in jobs:
+        rounds.append(n_runs.get(params['tag'], 0))
+        n_runs[params['tag']] = rounds[-1] + 1
+    keys = [
+        (
+            round_,
+            get_estimated_time(params),
+            params['n_vertices'],
+            params['n_edges_noise'],
+        )
+        for round_, params in zip(rounds, jobs)
+    ]
+    order = sorted(range(len(jobs)), key=keys.__getitem__)
+    return [jobs[i] for i in order]
+
+
+def plan_jobs(
+        jobs: list,
+        budget: float = None,
+        completed_runs: dict = None,
+) -> tuple:
+    """Select, in order, the jobs whose estimated QPU access time fits in
+    the budget. A job that would exceed the budget is left out, and the
+    following ones are still considered.
+
+    The jobs already run, in completed_runs, are not selected again, and
+    their QPU access time is spent from the budget first: the one recorded
+    in the result store, or the estimated one for the runs that do not
+    report it. The plan therefore covers the whole sweep, before it is split
+    into shards, and a restarted sweep does not get a fresh budget.
+
+    :param jobs: list of parameters, one per run
+    :param budget: largest QPU access time of the sweep, in seconds, not
+    limited if not set
+    :param completed_runs: QPU access times of the runs already in the
+    result store, given by result_store.get_completed_runs
+
+    :return: a tuple made of the jobs selected, the jobs left out, the
+    estimated QPU access time of the jobs selected and the QPU access time
+    of the jobs already run, in seconds
+
+    """
+    completed_runs = completed_runs or {}
+    pending = []
+    spent_time = 0.0
+    for params in jobs:
+        key = result_store.get_run_key(params)
+        if key not in completed_runs:
+            pending.append(params)
+        elif completed_runs[key] is None:
+            spent_time += get_estimated_time(params)
+        else:
+            spent_time += 1e-6 * completed_runs[key]
+    if len(pending) < len(jobs):
+        logger.info('%d of %d runs already done, %d to run',
+                    len(jobs) - len(pending), len(jobs), len(pending))
+    planned = []
+    left_out = []
+    estimated_time = 0.0
+    for params in pending:
+        time_ = get_estimated_time(params)
+        if budget is not None and \
+                spent_time + estimated_time + time_ > budget:
+            left_out.append(params)
+            continue
+        planned.append(params)
+        estimated_time += time_
+    return planned, left_out, estimated_time, spent_time
+
+
+def log_plan(
+        planned: list,
+        left_out: list,
+        estimated_time: float,
+        spent_time: float = 0.0,
+) -> None:
+    """Log the runs planned for each tag with their estimated QPU access
+    time, and the total.
+
+    :param planned: jobs selected by plan_jobs
+    :param left_out: jobs left out by plan_jobs
+    :param estimated_time: estimated QPU access time of the jobs selected,
+    in seconds
+    :param spent_time: QPU access time of the jobs already run, in seconds
+
+    :return: None
+
+    """
+    tags = {}
+    for params in planned:
+        n_runs, time_ = tags.get(params['tag'], (0, 0.0))
+        tags[params['tag']] = n_runs + 1, time_ + get_estimated_time(params)
+    for tag, (n_runs, time_) in tags.items():
+        logger.info('%s: %d runs, %.3f s of QPU access time', tag, n_runs,
+                    time_)
+    logger.info('%d runs planned, %.3f s of QPU access time estimated, '
+                '%.3f s already spent, %d runs over the budget',
+                len(planned), estimated_time, spent_time, len(left_out))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate the raw data of the article, or of the sweep '
+                    'specified in a JSON file. The runs can be split into '
+                    'shards to be run on different machines, and the '
+                    'outputs of the shards merged afterwards.'
+    )
+    parser.add_argument('--sweep', default=ARTICLE_SWEEP_FILENAME,
+                        help='JSON file specifying the sweep, see '
+                             'read_sweep, the sweep of the article by '
+                             'default')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='largest QPU access time of the whole sweep, '
+                             'runs already done included, in seconds, the '
+                             'budget of the sweep if not set')
+    parser.add_argument('--plan', action='store_true',
+                        help='show the runs that would be run and their '
+                             'estimated QPU access time, without running '
+                             'them')
+    parser.add_argument('--shard', type=int, default=0,
+                        help='index of the shard to run')
+    parser.add_argument('--n-shards', type=int, default=1,
+                        help='total number of shards')
+    parser.add_argument('--merge', action='store_true',
+                        help='merge the outputs of all the shards')
+    parser.add_argument('--metrics', default=None,
+                        help='file the time of each stage of the runs is '
+                             'written to, in the Prometheus text format if '
+                             'its extension is .prom and as JSON lines '
+                             'otherwise')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='trace the peak memory of each stage')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='run the jobs already in the result store '
+                             'again')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.merge:
+        merge_shards(args.n_shards)
+        return
+
+    sweep = read_sweep(args.sweep)
+    budget = args.budget if args.budget is not None else sweep.get('budget')
+    # the budget is planned over the whole sweep, with the runs of every
+    # shard already done, and the shards run their planned jobs only; the
+    # shards are dealt from the whole sweep, so that a job stays in the same
+    # shard whatever the other shards have run
+    jobs = order_jobs(get_sweep_jobs(sweep))
+    completed_runs = {}
+    if args.resume:
+        completed_runs.update(result_store.get_completed_runs(RAW_DATA_DIR))
+        for shard in range(args.n_shards):
+            completed_runs.update(result_store.get_completed_runs(
+                get_shard_directory(shard, args.n_shards)
+            ))
+    plan = plan_jobs(jobs, budget, completed_runs)
+    log_plan(*plan)
+    planned_keys = {result_store.get_run_key(params) for params in plan[0]}
+    if args.plan:
+        return
+    if args.n_shards == 1:
+        directory = RAW_DATA_DIR
+    else:
+        directory = get_shard_directory(args.shard, args.n_shards)
+    run_jobs(
+        [
+            params for params in get_shard(jobs, args.shard, args.n_shards)
+            if result_store.get_run_key(params) in planned_keys
+        ],
+        directory,
+        metrics_filename=args.metrics,
+        trace_memory=args.trace_memory,
+        resume=args.resume,
+    )
 
 
 if __name__ == '__main__':
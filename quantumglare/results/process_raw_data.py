@@ -1,76 +1,334 @@
+import logging
+
 import pandas as pd
 import numpy as np
 import os
 
+from quantumglare.common import result_store
+
+logger = logging.getLogger(__name__)
+
+# columns of the raw data needed to process it
+RAW_DATA_COLUMNS = [
+    'tag',
+    'n_cycles',
+    'cycle_length',
+    'n_vertices',
+    'p_noise',
+    'n_edges_noise',
+    'seed_input_graph',
+    'seed_embedding',
+    'anneal_time',
+    'pause_duration',
+    'num_reads',
+    'qpu_anneal_time_per_sample',
+    'qpu_access_time',
+    'time_overall_computation',
+    'solution_frequency',
+]
+
+# columns identifying a run, no two runs of the raw data can share them; the
+# tag tells apart runs of graphs with the same parameters, e.g. graph files
+# without metadata
+DUPLICATE_KEY_COLUMNS = [
+    'tag',
+    'n_vertices',
+    'cycle_length',
+    'n_edges_noise',
+    'seed_input_graph',
+    'seed_embedding',
+]
+
+# parameters of the runs, the same for every run with a given tag
+TAG_COLUMNS = [
+    'n_cycles',
+    'cycle_length',
+    'n_vertices',
+    'p_noise',
+    'n_edges_noise',
+    't_quantum_schedule',
+]
+
+PROCESSED_DATA_COLUMNS = [
+    'tag',
+    'n_observations',
+    'n_cycles',
+    'cycle_length',
+    'n_vertices',
+    'p_noise',
+    'n_edges_noise',
+    'p_sol_avg',
+    'p_sol_err',
+    'tts_avg',
+    'tts_err',
+    'tts_anneal_avg',
+    'tts_anneal_err',
+    'tts_qpu_avg',
+    'tts_qpu_err',
+    'tts_wall_avg',
+    'tts_wall_err',
+    # sufficient statistics, to update the processed data with new runs
+    't_quantum_schedule',
+    'p_sol_sum',
+    'p_sol_sum_sq',
+    'n_qpu_observations',
+    't_anneal_sum',
+    't_qpu_sum',
+    't_wall_sum',
+]
+
+# sufficient statistics summed over the runs of a tag, the times per read
+# are in microseconds:
+#     - t_anneal: anneal time reported by the QPU
+#     - t_qpu: QPU access time, including programming and readout
+#     - t_wall: wall-clock time of the run, including the embedding and the
+#       classical processing
+# the QPU times are summed over the n_qpu_observations runs that report both
+# of them, so that their averages are taken over the same runs
+STATISTICS_COLUMNS = [
+    'n_observations',
+    'p_sol_sum',
+    'p_sol_sum_sq',
+    'n_qpu_observations',
+    't_anneal_sum',
+    't_qpu_sum',
+    't_wall_sum',
+]
+
+
+def get_statistics(df: pd.DataFrame) -> pd.DataFrame:
+    """Get the sufficient statistics of the solution frequency for each tag.
+
+    :param df: raw data, with at least the columns RAW_DATA_COLUMNS
+
+    :return: dataframe with one row per tag, in order of first appearance
 
-def process_raw_data(df: pd.DataFrame, csv_name: str):
     """
-    :param df:
-    :param csv_name:
+    is_qpu_timed = df['qpu_anneal_time_per_sample'].notna() \
+        & df['qpu_access_time'].notna()
+    df = df.assign(
+        t_quantum_schedule=df['anneal_time'] + df['pause_duration'],
+        p_sol_sq=df['solution_frequency'] ** 2,
+        t_anneal=df['qpu_anneal_time_per_sample'].where(is_qpu_timed),
+        t_qpu=(df['qpu_access_time'] / df['num_reads']).where(is_qpu_timed),
+        t_wall=1e6 * df['time_overall_computation'] / df['num_reads'],
+    )
+    grouped = df.groupby('tag', sort=False)
+    statistics_df = grouped[TAG_COLUMNS].first()
+    statistics_df['n_observations'] = grouped.size()
+    statistics_df['p_sol_sum'] = grouped['solution_frequency'].sum()
+    statistics_df['p_sol_sum_sq'] = grouped['p_sol_sq'].sum()
+    statistics_df['n_qpu_observations'] = grouped['t_qpu'].count()
+    for time_ in ['t_anneal', 't_qpu', 't_wall']:
+        statistics_df[f'{time_}_sum'] = grouped[time_].sum()
+    return statistics_df.reset_index()
 
-    :return: None
+
+def combine_statistics(statistics_dfs: list) -> pd.DataFrame:
+    """Combine the sufficient statistics computed on different sets of runs.
+
+    :param statistics_dfs: dataframes obtained with get_statistics
+
+    :return: dataframe with one row per tag, in order of first appearance
 
     """
-    tags = df.tag.unique()
+    statistics_df = pd.concat(statistics_dfs, ignore_index=True)
+    grouped = statistics_df.groupby('tag', sort=False)
+    combined_df = grouped[TAG_COLUMNS].first()
+    for column in STATISTICS_COLUMNS:
+        combined_df[column] = grouped[column].sum()
+    return combined_df.reset_index()
 
-    processed_df = pd.DataFrame()
 
-    # check no duplicates are present in raw data
-    cols = [
-        'n_vertices',
-        'cycle_length',
-        'n_edges_noise',
-        'seed_input_graph',
-        'seed_embedding',
-    ]
-    assert len(df[cols]) == len(df[cols].drop_duplicates()), \
-        'duplicates present'
+def get_tts(
+        t_read: pd.Series, p_sol_avg: pd.Series, p_sol_err: pd.Series
+) -> tuple:
+    """Get the time to solution with 99% probability, and its error from
+    the error of the solution frequency.
+
+    :param t_read: time per read, in microseconds
+    :param p_sol_avg: average solution frequency
+    :param p_sol_err: error of the average solution frequency
 
-    for tag in tags:
-        tmp_df = df[df.tag == tag].copy()
-        # check that we have 50 seeds for each tag
-        # assert len(tmp_df['seed'].unique()) == 50,\
-        #     f'{tag} does not have 50 seeds'
-        t_quantum_schedule = tmp_df.anneal_time.values[0] \
-            + tmp_df.pause_duration.values[0]
-
-        freqs = tmp_df.solution_frequency.sort_values()
-        n_observations = len(freqs)
-        p_sol_avg = freqs.mean()
-        p_sol_err = freqs.std() / np.sqrt(n_observations)
-
-        tts_avg = 1e-3 * t_quantum_schedule * np.log(1 - 0.99) \
-            / np.log(1 - p_sol_avg)
-        tts_err = 1e-3 * t_quantum_schedule * p_sol_err * np.abs(
+    :return: a tuple made of the time to solution and its error, in
+    milliseconds
+
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tts_avg = 1e-3 * t_read * np.log(1 - 0.99) / np.log(1 - p_sol_avg)
+        tts_err = 1e-3 * t_read * p_sol_err * np.abs(
             np.log(1 - 0.99) / ((1 - p_sol_avg) * np.log(1 - p_sol_avg) ** 2)
         )
+    return tts_avg, tts_err
+
+
+def get_processed_df(statistics_df: pd.DataFrame) -> pd.DataFrame:
+    """Get the average solution frequency and time to solution, with their
+    errors, from the sufficient statistics of each tag.
 
-        row_df = pd.DataFrame(
-            {"tag": tag,
-             "n_observations": n_observations,
-             "n_cycles":  tmp_df.n_cycles.values[0],
-             "cycle_length": tmp_df.cycle_length.values[0],
-             "n_vertices": tmp_df.n_vertices.values[0],
-             "p_noise": tmp_df.p_noise.values[0],
-             "n_edges_noise": tmp_df.n_edges_noise.values[0],
-             "p_sol_avg": p_sol_avg,
-             "p_sol_err": p_sol_err,
-             "tts_avg": tts_avg,
-             "tts_err": tts_err,
-             },
-            index=[0],
+    The time to solution is given for several times per read:
+        - tts: the nominal length of the anneal schedule
+        - tts_anneal: the anneal time reported by the QPU
+        - tts_qpu: the QPU access time, including programming and readout
+        - tts_wall: the wall-clock time of the run, including the embedding
+          and the classical processing
+    The time of a run is spread evenly over its reads. The QPU times are
+    averaged over the runs that report them, they are not set if there is
+    none. The nominal one is not set for the runs without a schedule, such as
+    those of the classical backend.
+
+    :param statistics_df: dataframe obtained with get_statistics
+
+    :return: processed data, with the columns PROCESSED_DATA_COLUMNS
+
+    """
+    n = statistics_df['n_observations']
+    p_sol_avg = statistics_df['p_sol_sum'] / n
+    # sample variance, as pandas.Series.std
+    p_sol_var = (
+        statistics_df['p_sol_sum_sq'] - n * p_sol_avg ** 2
+    ).clip(lower=0) / (n - 1)
+    p_sol_err = np.sqrt(p_sol_var) / np.sqrt(n)
+
+    n_qpu = statistics_df['n_qpu_observations'].where(
+        statistics_df['n_qpu_observations'] > 0
+    )
+    t_reads = {
+        'tts': statistics_df['t_quantum_schedule'],
+        'tts_anneal': statistics_df['t_anneal_sum'] / n_qpu,
+        'tts_qpu': statistics_df['t_qpu_sum'] / n_qpu,
+        'tts_wall': statistics_df['t_wall_sum'] / n,
+    }
+    processed_df = statistics_df.assign(
+        p_sol_avg=p_sol_avg,
+        p_sol_err=p_sol_err,
+    )
+    for name, t_read in t_reads.items():
+        processed_df[f'{name}_avg'], processed_df[f'{name}_err'] = get_tts(
+            t_read, p_sol_avg, p_sol_err
         )
+    return processed_df[PROCESSED_DATA_COLUMNS]
+
+
+def check_duplicates(df: pd.DataFrame) -> None:
+    """Check that no two runs share the columns DUPLICATE_KEY_COLUMNS.
 
-        processed_df = processed_df.append(row_df)
+    :param df: raw data, with at least the columns DUPLICATE_KEY_COLUMNS
 
+    :return: None
+
+    """
+    assert not df.duplicated(subset=DUPLICATE_KEY_COLUMNS).any(), \
+        'duplicates present'
+    return None
+
+
+def process_raw_data(df: pd.DataFrame, csv_name: str):
+    """Process the raw data and write the processed data to data/csv_name.
+
+    :param df: raw data, with at least the columns RAW_DATA_COLUMNS
+    :param csv_name: filename of the processed data
+
+    :return: None
+
+    """
+    # check no duplicates are present in raw data
+    check_duplicates(df)
+    processed_df = get_processed_df(get_statistics(df))
     processed_df.to_csv(os.path.join('data', f'{csv_name}'), index=False)
 
 
+# prefix of the line of the list of processed files giving the store they
+# belong to, the other lines are files relative to the root of the store
+_STORE_ROOT_PREFIX = '# store: '
+
+
+def _get_processed_files_filename(csv_name: str) -> str:
+    return os.path.join(
+        'data', f'{os.path.splitext(csv_name)[0]}_processed_files.txt'
+    )
+
+
+def update_processed_data(
+        directory: str,
+        csv_name: str,
+        batch_size: int = 100000,
+) -> int:
+    """Update the processed data in data/csv_name with the runs of the result
+    store in directory that have not been processed yet. The store is read in
+    batches, and only the columns RAW_DATA_COLUMNS are read.
+
+    The files of the store already processed are listed next to the
+    processed data, relative to the root of the store, with the resolved
+    root of the store. The processed data are computed from scratch if the
+    list does not exist or belongs to another store, or if the processed
+    data lack some of the sufficient statistics.
+
+    :param directory: root directory of the result store
+    :param csv_name: filename of the processed data
+    :param batch_size: maximum number of runs read at a time
+
+    :return: number of runs processed
+
+    """
+    dataset = result_store.get_dataset(directory)
+    # check no duplicates are present in raw data
+    check_duplicates(
+        dataset.to_table(columns=DUPLICATE_KEY_COLUMNS).to_pandas()
+    )
+
+    processed_filename = os.path.join('data', f'{csv_name}')
+    processed_files_filename = _get_processed_files_filename(csv_name)
+    statistics_dfs = []
+    processed_files = []
+    store_root = os.path.realpath(directory)
+    if os.path.exists(processed_files_filename) \
+            and os.path.exists(processed_filename):
+        processed_df = pd.read_csv(processed_filename)
+        with open(processed_files_filename) as f:
+            lines = f.read().splitlines()
+        if set(STATISTICS_COLUMNS) <= set(processed_df.columns) \
+                and lines[:1] == [_STORE_ROOT_PREFIX + store_root]:
+            statistics_dfs.append(processed_df)
+            processed_files = lines[1:]
+        else:
+            logger.info('%s was not processed from the store %s, it is '
+                        'processed from scratch', csv_name, store_root)
+
+    files = [os.path.relpath(f, directory) for f in dataset.files]
+    new_files = sorted(set(files) - set(processed_files))
+    n_runs = 0
+    if new_files:
+        new_dataset = result_store.get_dataset(
+            directory, [os.path.join(directory, f) for f in new_files]
+        )
+        for batch in new_dataset.to_batches(
+                columns=RAW_DATA_COLUMNS, batch_size=batch_size
+        ):
+            batch_df = batch.to_pandas()
+            batch_df['tag'] = batch_df['tag'].astype(str)
+            statistics_dfs.append(get_statistics(batch_df))
+            n_runs += len(batch_df)
+
+    if statistics_dfs:
+        processed_df = get_processed_df(combine_statistics(statistics_dfs))
+    else:
+        processed_df = pd.DataFrame(columns=PROCESSED_DATA_COLUMNS)
+    processed_df.to_csv(processed_filename, index=False)
+    with open(processed_files_filename, 'w') as f:
+        f.write(f'{_STORE_ROOT_PREFIX}{store_root}\n')
+        f.write(''.join(f'{filename}\n' for filename in processed_files))
+        f.write(''.join(f'{filename}\n' for filename in new_files))
+    return n_runs
+
+
 def main():
-    print('start reading raw data')
-    raw_df = pd.read_csv(os.path.join('data', 'raw_data.csv'))
-    print('end reading raw data')
-    process_raw_data(raw_df, 'processed_data.csv')
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logger.info('start processing raw data')
+    n_runs = update_processed_data(
+        os.path.join('data', 'raw_data'), 'processed_data.csv'
+    )
+    logger.info('end processing raw data: %d new runs', n_runs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+import argparse
+import glob
+import logging
+import os
+
+import numpy as np
+
+from quantumglare.common import graph, metrics, result_store
+from quantumglare.results.generate_raw_data import write_run
+from quantumglare.solvers import backends, quantum_solver
+
+# parameters of a run read from the metadata of the graph file, if present
+GRAPH_PARAMETERS = [
+    'tag',
+    'n_cycles',
+    'cycle_length',
+    'p_noise',
+    'n_edges_noise',
+    'seed_input_graph',
+]
+
+# root directory of the result store of the graph files, kept apart from the
+# raw data of the article
+GRAPH_RUNS_DIR = os.path.join('data', 'graph_runs')
+
+logger = logging.getLogger(__name__)
+
+
+def get_graph_filenames(directory: str) -> list:
+    """Get the graph files in a directory, in alphabetical order.
+
+    :param directory: directory containing the graph files
+
+    :return: list of filenames
+
+    """
+    return sorted(glob.glob(
+        os.path.join(directory, f'*{graph.GRAPH_FILE_EXTENSION}')
+    ))
+
+
+def get_params(filename: str, edges: np.ndarray, solver_params: dict) -> dict:
+    """Get the parameters of the run solving a graph file. The tag defaults
+    to the name of the file.
+
+    :param filename: name of the graph file
+    :param edges: edges of the graph
+    :param solver_params: parameters of the solver, e.g. num_reads
+
+    :return: parameters of the run
+
+    """
+    metadata = graph.load_graph_metadata(filename)
+    params = {parameter: metadata.get(parameter)
+              for parameter in GRAPH_PARAMETERS}
+    if params['tag'] is None:
+        params['tag'] = os.path.splitext(os.path.basename(filename))[0]
+    params['n_vertices'] = len(np.unique(edges))
+    params.update(solver_params)
+    return params
+
+
+def solve_graph_files(
+        filenames: list,
+        solver_params: dict,
+        seeds_embedding: list,
+        directory: str = GRAPH_RUNS_DIR,
+        metrics_filename: str = None,
+        trace_memory: bool = False,
+        resume: bool = True,
+) -> None:
+    """Solve the graphs of the given files, one run per seed, and write the
+    output of each run to the result store as soon as it is available. The
+    graph files are memory mapped and read one at a time.
+
+    :param filenames: names of the graph files
+    :param solver_params: parameters of the solver, e.g. num_reads
+    :param seeds_embedding: random seeds used for the embedding
+    :param directory: root directory of the result store
+    :param metrics_filename: file the metrics of the runs are written to,
+    they are not written if not set
+    :param trace_memory: whether to trace the peak memory of the stages of
+    the runs
+    :param resume: whether to skip the runs already in the result store, by
+    result_store.get_run_key
+
+    :return: None
+
+    """
+    completed_keys = result_store.get_completed_keys(directory) \
+        if resume else set()
+    with backends.SolverSession() as session:
+        for filename in filenames:
+            edges = graph.load_graph(filename)
+            for seed_embedding in seeds_embedding:
+                params = get_params(filename, edges, solver_params)
+                params['seed_embedding'] = seed_embedding
+                if result_store.get_run_key(params) in completed_keys:
+                    logger.info('%s, seed_embedding: %d already done',
+                                filename, seed_embedding)
+                    continue
+                logger.info('====== %s, seed_embedding: %d ======',
+                            filename, seed_embedding)
+                run_metrics = metrics.Metrics(trace_memory)
+                output = quantum_solver.solve(
+                    input_graph=edges,
+                    params=params,
+                    session=session,
+                    run_metrics=run_metrics,
+                )
+                write_run(
+                    output, params, run_metrics, directory, metrics_filename
+                )
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Solve the graphs saved with graph.save_graph in a '
+                    'directory and write the results to the result store.'
+    )
+    parser.add_argument('graph_directory',
+                        help='directory containing the graph files')
+    parser.add_argument('--output', default=GRAPH_RUNS_DIR,
+                        help='root directory of the result store, '
+                             f'{GRAPH_RUNS_DIR} by default')
+    parser.add_argument('--backend', default=None,
+                        help='backend of the solver')
+    parser.add_argument('--seeds-embedding', type=int, nargs='+',
+                        default=[0], help='random seeds of the embedding')
+    parser.add_argument('--num-reads', type=int, default=100)
+    parser.add_argument('--anneal-time', type=float, default=200)
+    parser.add_argument('--pause-duration', type=float, default=100)
+    parser.add_argument('--pause-start', type=float, default=0.4)
+    parser.add_argument('--chain-strength', type=float, default=None,
+                        help='chain strength of the embedded problem, '
+                             'derived from its biases if not set')
+    parser.add_argument('--presolve', action='store_true',
+                        help='fix and remove the edges decided by the '
+                             'structure of the graph before sampling')
+    parser.add_argument('--repair', action='store_true',
+                        help='repair the states by local search and report '
+                             'the frequency of solution after repair')
+    parser.add_argument('--decompose', action='store_true',
+                        help='solve the connected components separately')
+    parser.add_argument('--pack-edges', type=int, default=None,
+                        help='maximum number of edges of the components '
+                             'sampled together')
+    parser.add_argument('--metrics', default=None,
+                        help='file the time of each stage of the runs is '
+                             'written to, in the Prometheus text format if '
+                             'its extension is .prom and as JSON lines '
+                             'otherwise')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='trace the peak memory of each stage')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='solve the graphs already in the result store '
+                             'again')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    solve_graph_files(
+        get_graph_filenames(args.graph_directory),
+        solver_params={
+            'backend': args.backend,
+            'num_reads': args.num_reads,
+            'anneal_time': args.anneal_time,
+            'pause_duration': args.pause_duration,
+            'pause_start': args.pause_start,
+            'chain_strength': args.chain_strength,
+            'presolve': args.presolve,
+            'repair': args.repair,
+            'decompose': args.decompose,
+            'pack_edges': args.pack_edges,
+        },
+        seeds_embedding=args.seeds_embedding,
+        directory=args.output,
+        metrics_filename=args.metrics,
+        trace_memory=args.trace_memory,
+        resume=args.resume,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -6,3 +6,15 @@ from dotenv import load_dotenv
 dotenv = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env'))
 if os.path.exists(dotenv):
     load_dotenv(dotenv)
+
+# Directory where the embeddings found by minorminer are cached, the cache is
+# disabled if set to an empty string
+#
+EMBEDDING_CACHE_DIR = os.environ.get(
+    'QUANTUMGLARE_EMBEDDING_CACHE_DIR', os.path.join('data', 'embeddings')
+)
+
+# Sampler used by quantum_solver.solve when the parameters do not specify one:
+# qpu, mock, simulated_annealing, tabu, exact or classical
+#
+BACKEND = os.environ.get('QUANTUMGLARE_BACKEND', 'qpu')
@@ -0,0 +1,510 @@
+import threading
+import time
+
+import dimod
+import numpy as np
+from dwave.embedding import embed_bqm
+from dwave.system.samplers import DWaveSampler
+from dwave.system.testing import MockDWaveSampler
+
+from quantumglare.common import embedding, utils
+from quantumglare.common.qubo import CooQubo
+from quantumglare.solvers import classical_solver
+from quantumglare import settings
+
+# embedding information reported by the backends that do not embed
+_NO_EMBEDDING_INFO = {
+    'time_embedding': 0.0,
+    'embedding_cache_hit': None,
+    'time_embedding_saved': 0.0,
+    'chain_strength': None,
+    'chain_length_max': None,
+    'chain_length_mean': None,
+    'chain_break_fraction': None,
+    'time_unembed': 0.0,
+}
+
+# largest problem for which the exact solver enumerates all the states
+_EXACT_SOLVER_MAX_VARIABLES = 24
+
+# nominal times, in microseconds, of an Advantage system, as reported by
+# MockDWaveSampler, used to emulate and to estimate the QPU timing
+QPU_PROGRAMMING_TIME = 8468.2
+QPU_READOUT_TIME_PER_SAMPLE = 41.54
+QPU_DELAY_TIME_PER_SAMPLE = 20.54
+
+
+def get_bqm(Q) -> dimod.BinaryQuadraticModel:
+    """Get the binary quadratic model of a QUBO problem.
+
+    :param Q: QUBO problem, as a qubo.CooQubo or as a dictionary
+
+    :return: binary quadratic model
+
+    """
+    if isinstance(Q, CooQubo):
+        return Q.to_bqm()
+    return dimod.BinaryQuadraticModel.from_qubo(Q)
+
+
+def get_interactions(Q) -> list:
+    """Get the pairs of variables with a quadratic term of a QUBO problem,
+    in the order of the keys of its dictionary.
+
+    :param Q: QUBO problem, as a qubo.CooQubo or as a dictionary
+
+    :return: list of pairs of labels
+
+    """
+    if isinstance(Q, CooQubo):
+        return Q.get_interactions()
+    return [(u, v) for (u, v) in Q.keys() if u != v]
+
+
+def get_anneal_schedule(
+        anneal_time: int,
+        pause_duration: int,
+        pause_start: float,
+) -> list:
+    """Get the anneal schedule as a list of [time, s] points.
+
+    :param anneal_time: time for the annealing part of the schedule
+    :param pause_duration: time for the pause part of the schedule
+    :param pause_start: value for the s parameter at which the pause starts
+
+    :return: anneal schedule
+
+    """
+    if pause_duration > 0:
+        schedule = [
+            [0.0, 0.0],
+            [pause_start * anneal_time, pause_start],
+            [pause_start * anneal_time + pause_duration, pause_start],
+            [anneal_time + pause_duration, 1.0]
+        ]
+    else:
+        schedule = [[0.0, 0.0], [anneal_time, 1.0]]
+    return schedule
+
+
+def get_beta_schedule(bqm: dimod.BinaryQuadraticModel, schedule: list):
+    """Translate an anneal schedule into a simulated annealing schedule with
+    one sweep per microsecond. The inverse temperature goes geometrically
+    from the hot to the cold end of the default range as s goes from 0 to 1,
+    so that a pause in s is a pause in temperature.
+
+    :param bqm: problem to be sampled
+    :param schedule: anneal schedule as a list of [time, s] points
+
+    :return: inverse temperature of each sweep
+
+    """
+    from dwave.samplers.sa.sampler import default_beta_range
+
+    beta_min, beta_max = default_beta_range(bqm)
+    times, s = np.array(schedule, dtype=float).T
+    n_sweeps = max(int(round(times[-1])), 1)
+    s_sweeps = np.interp(np.arange(n_sweeps) + 0.5, times, s)
+    return beta_min * (beta_max / beta_min) ** s_sweeps
+
+
+def _get_schedule(params: dict) -> list:
+    return get_anneal_schedule(
+        params['anneal_time'], params['pause_duration'], params['pause_start']
+    )
+
+
+def get_nominal_qpu_timing(num_reads: int, anneal_time: float) -> dict:
+    """Get the QPU timing of a problem, as reported by the QPU, from the
+    number of reads and the length of the anneal schedule, with the nominal
+    programming, readout and delay times.
+
+    :param num_reads: number of reads
+    :param anneal_time: length of the anneal schedule, in microseconds
+
+    :return: dictionary of times, in microseconds
+
+    """
+    sampling_time = num_reads * (
+        anneal_time + QPU_READOUT_TIME_PER_SAMPLE + QPU_DELAY_TIME_PER_SAMPLE
+    )
+    return {
+        'qpu_sampling_time': sampling_time,
+        'qpu_anneal_time_per_sample': anneal_time,
+        'qpu_readout_time_per_sample': QPU_READOUT_TIME_PER_SAMPLE,
+        'qpu_access_time': QPU_PROGRAMMING_TIME + sampling_time,
+        'qpu_programming_time': QPU_PROGRAMMING_TIME,
+        'qpu_delay_time_per_sample': QPU_DELAY_TIME_PER_SAMPLE,
+    }
+
+
+def estimate_qpu_access_time(params: dict) -> float:
+    """Estimate the QPU access time of a run from its number of reads and
+    the length of its anneal schedule, for a problem sampled at once.
+
+    :param params: parameters of the run
+
+    :return: QPU access time, in microseconds
+
+    """
+    return get_nominal_qpu_timing(
+        params['num_reads'], _get_schedule(params)[-1][0]
+    )['qpu_access_time']
+
+
+def unembed_response(target_response, embedding_: dict, bqm) -> tuple:
+    """Unembed the response of the target with embedding.unembed_samples and
+    get the statistics of the chains.
+
+    :param target_response: response of the sampler of the target
+    :param embedding_: embedding of the variables of bqm into the target
+    :param bqm: binary problem of the source
+
+    :return: a tuple made of the response for bqm, with the fraction of
+    broken chains of each sample, and a dictionary with the length of the
+    longest chain, the mean length of the chains and the fraction of broken
+    chains over all the reads
+
+    """
+    labels = list(bqm.variables)
+    record = target_response.record
+    columns, indptr = embedding.get_chains(
+        embedding_, labels, list(target_response.variables)
+    )
+    samples, is_broken = embedding.unembed_samples(
+        record.sample, columns, indptr, bqm, labels
+    )
+    chain_break_fraction = is_broken.mean(axis=1)
+    response = dimod.SampleSet.from_samples_bqm(
+        (samples, labels),
+        bqm,
+        num_occurrences=record.num_occurrences,
+        chain_break_fraction=chain_break_fraction,
+        info=dict(target_response.info),
+    )
+    lengths = np.diff(indptr)
+    return response, {
+        'chain_length_max': int(lengths.max()),
+        'chain_length_mean': float(lengths.mean()),
+        'chain_break_fraction': float(np.average(
+            chain_break_fraction, weights=record.num_occurrences
+        )),
+    }
+
+
+class QPUBackend:
+    """D-Wave quantum annealer. The problem is embedded with
+    embedding.find_embedding_cached, sampled with the anneal schedule
+    defined by the parameters and unembedded with unembed_response. The
+    chain strength is params['chain_strength'] if set, and is derived from
+    the biases of the problem with embedding.get_chain_strength otherwise.
+
+    The sampler, together with its client, the solver properties and the
+    target graph, is created on the first call and reused afterwards. It can
+    be shared between threads.
+
+    :param config: keyword arguments passed to DWaveSampler
+
+    """
+    name = 'qpu'
+
+    def __init__(self, **config):
+        self._config = config
+        self._lock = threading.Lock()
+        self._child_sampler = None
+        self._target_edges = None
+        self._target_digest = None
+
+    def _create_child_sampler(self):
+        return DWaveSampler(**self._config)
+
+    def _get_child_sampler(self):
+        with self._lock:
+            if self._child_sampler is None:
+                child_sampler = self._create_child_sampler()
+                self._target_edges = child_sampler.edgelist
+                self._target_digest = embedding.get_edges_digest(
+                    self._target_edges
+                )
+                self._child_sampler = child_sampler
+        return self._child_sampler
+
+    def close(self) -> None:
+        """Close the client of the sampler, if any."""
+        with self._lock:
+            client = getattr(self._child_sampler, 'client', None)
+            if client is not None:
+                client.close()
+            self._child_sampler = None
+        return None
+
+    def sample_qubo(self, Q, params: dict) -> tuple:
+        """Sample the QUBO problem defined by Q.
+
+        :param Q: QUBO problem, as a qubo.CooQubo or as a dictionary
+        :param params: parameters of the run
+
+        :return: a tuple made of the response and the information on how the
+        embedding was obtained, with the time to submit the problem, to wait
+        for the response and to unembed it
+
+        """
+        solver = self._get_child_sampler()
+        # the self-loops make sure that variables without interactions are
+        # embedded as well
+        bqm = get_bqm(Q)
+        variables = set(bqm.variables)
+        source_edges = get_interactions(Q) + [(v, v) for v in variables]
+        embedding_, embedding_info = embedding.find_embedding_cached(
+            source_edges,
+            self._target_edges,
+            cache_dir=settings.EMBEDDING_CACHE_DIR,
+            target_digest=self._target_digest,
+            random_seed=params['seed_embedding'],
+            verbose=2,
+            interactive=True,
+        )
+        if not embedding_:
+            raise ValueError("no embedding found")
+        chain_strength = params.get('chain_strength') \
+            or embedding.get_chain_strength(bqm)
+        t0 = time.perf_counter()
+        target_response = solver.sample(
+            embed_bqm(
+                bqm,
+                embedding_,
+                solver.adjacency,
+                chain_strength=chain_strength,
+            ),
+            num_reads=params['num_reads'],
+            max_answers=params['num_reads'],
+            anneal_schedule=_get_schedule(params),
+            answer_mode='histogram',
+        )
+        t1 = time.perf_counter()
+        # the response of the QPU is resolved when the problem is done
+        target_response.resolve()
+        t2 = time.perf_counter()
+        response, chain_info = unembed_response(
+            target_response, embedding_, bqm
+        )
+        t3 = time.perf_counter()
+        response.info['embedding_context'] = {
+            'embedding': embedding_,
+            'chain_break_method': 'majority_vote',
+            'chain_strength': chain_strength,
+        }
+        return response, {
+            **embedding_info,
+            'chain_strength': chain_strength,
+            **chain_info,
+            'time_submit': t1 - t0,
+            'time_wait': t2 - t1,
+            'time_unembed': t3 - t2,
+        }
+
+
+class _EmulatedDWaveSampler(MockDWaveSampler):
+    """MockDWaveSampler with the topology of an Advantage system that anneals
+    the embedded problem with simulated annealing, following the anneal
+    schedule through get_beta_schedule. The QPU timing is reported as the
+    QPU would, from the length of the schedule and nominal programming,
+    readout and delay times.
+
+    """
+
+    def __init__(self):
+        super().__init__(topology_type='pegasus', topology_shape=[16])
+
+    @dimod.bqm_structured
+    def sample(self, bqm, **kwargs):
+        from dwave.samplers import SimulatedAnnealingSampler
+
+        schedule = kwargs.get('anneal_schedule', [[0.0, 0.0], [20.0, 1.0]])
+        response = SimulatedAnnealingSampler().sample(
+            bqm,
+            num_reads=kwargs.get('num_reads', 1),
+            beta_schedule_type='custom',
+            beta_schedule=get_beta_schedule(bqm, schedule),
+        )
+        if kwargs.get('answer_mode', 'histogram') == 'histogram':
+            response = response.aggregate()
+        response.info['timing'] = get_nominal_qpu_timing(
+            kwargs.get('num_reads', 1), schedule[-1][0]
+        )
+        return response
+
+
+class MockQPUBackend(QPUBackend):
+    """Local stand-in for the quantum annealer: same embedding path as the
+    QPU, on an emulated Advantage topology sampled with simulated annealing.
+
+    """
+    name = 'mock'
+
+    def _create_child_sampler(self):
+        return _EmulatedDWaveSampler()
+
+
+class SimulatedAnnealingBackend:
+    """Simulated annealing on the QUBO problem, with one sweep per
+    microsecond of the anneal schedule.
+
+    """
+    name = 'simulated_annealing'
+
+    def sample_qubo(self, Q, params: dict) -> tuple:
+        from dwave.samplers import SimulatedAnnealingSampler
+
+        bqm = get_bqm(Q)
+        response = SimulatedAnnealingSampler().sample(
+            bqm,
+            num_reads=params['num_reads'],
+            beta_schedule_type='custom',
+            beta_schedule=get_beta_schedule(bqm, _get_schedule(params)),
+            seed=params['seed_embedding'],
+        )
+        return response.aggregate(), dict(_NO_EMBEDDING_INFO)
+
+
+class TabuBackend:
+    """Tabu search on the QUBO problem, one restart per read."""
+    name = 'tabu'
+
+    def sample_qubo(self, Q, params: dict) -> tuple:
+        from dwave.samplers import TabuSampler
+
+        response = TabuSampler().sample(
+            get_bqm(Q),
+            num_reads=params['num_reads'],
+            seed=params['seed_embedding'],
+        )
+        return response.aggregate(), dict(_NO_EMBEDDING_INFO)
+
+
+class ExactBackend:
+    """Ideal sampler: the ground states are found by enumeration and the
+    reads are split evenly among them. Only for small problems.
+
+    """
+    name = 'exact'
+
+    def sample_qubo(self, Q, params: dict) -> tuple:
+        bqm = get_bqm(Q)
+        if len(bqm) > _EXACT_SOLVER_MAX_VARIABLES:
+            raise ValueError(
+                f"the exact backend supports at most "
+                f"{_EXACT_SOLVER_MAX_VARIABLES} variables, got {len(bqm)}"
+            )
+        response = dimod.ExactSolver().sample(bqm).lowest()
+        n_states = len(response)
+        num_occurrences = np.full(n_states, params['num_reads'] // n_states)
+        num_occurrences[:params['num_reads'] % n_states] += 1
+        response.record.num_occurrences = num_occurrences
+        return response, dict(_NO_EMBEDDING_INFO)
+
+
+class ClassicalBackend:
+    """Classical reference: a valid solution is found from the edges that
+    label the variables with classical_solver.find_cycle_cover, and every
+    read returns it. The reads return the empty selection if there is no
+    valid solution. With params['reduced'], the edges are those of the
+    reduced graph of a presolve.
+
+    """
+    name = 'classical'
+
+    def sample_qubo(self, Q, params: dict) -> tuple:
+        bqm = get_bqm(Q)
+        labels = list(bqm.variables)
+        selection = classical_solver.find_cycle_cover(
+            utils.convert_list_of_strings_to_list_of_tuples(labels),
+            reduced=bool(params.get('reduced')),
+        )
+        sample = np.zeros((1, len(labels)), dtype=np.int8)
+        if selection is not None:
+            sample[0, selection] = 1
+        response = dimod.SampleSet.from_samples_bqm(
+            (sample, labels), bqm, num_occurrences=[params['num_reads']]
+        )
+        return response, dict(_NO_EMBEDDING_INFO)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in [
+        QPUBackend,
+        MockQPUBackend,
+        SimulatedAnnealingBackend,
+        TabuBackend,
+        ExactBackend,
+        ClassicalBackend,
+    ]
+}
+
+
+def get_backend(name: str = None, **config):
+    """Get a new instance of the backend with the given name.
+
+    :param name: name of the backend, settings.BACKEND if not set
+    :param config: keyword arguments passed to DWaveSampler by the QPU
+    backend
+
+    :return: backend
+
+    """
+    name = name or settings.BACKEND
+    if name not in BACKENDS:
+        raise ValueError(
+            f"unknown backend {name!r}, available backends: "
+            f"{', '.join(BACKENDS)}"
+        )
+    if issubclass(BACKENDS[name], QPUBackend):
+        return BACKENDS[name](**config)
+    return BACKENDS[name]()
+
+
+class SolverSession:
+    """Backends kept alive across calls to quantum_solver.solve, so that the
+    client, the solver properties and the target graph are fetched once per
+    session instead of once per solve. A session can be shared between
+    threads and can be used as a context manager, which closes it on exit.
+
+    :param config: keyword arguments passed to DWaveSampler by the QPU
+    backend
+
+    """
+
+    def __init__(self, **config):
+        self._config = config
+        self._lock = threading.Lock()
+        self._backends = {}
+
+    def get_backend(self, name: str = None):
+        """Get the backend with the given name, creating it on first use.
+
+        :param name: name of the backend, settings.BACKEND if not set
+
+        :return: backend
+
+        """
+        name = name or settings.BACKEND
+        with self._lock:
+            if name not in self._backends:
+                self._backends[name] = get_backend(name, **self._config)
+            return self._backends[name]
+
+    def close(self) -> None:
+        """Close all the backends of the session."""
+        with self._lock:
+            for backend in self._backends.values():
+                if hasattr(backend, 'close'):
+                    backend.close()
+            self._backends = {}
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,87 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import maximum_bipartite_matching
+
+from quantumglare.common import graph
+
+# largest number of matchings computed by find_cycle_cover before giving up
+MAX_NODES = 10000
+
+
+def _get_matching(graph_: graph.DiGraph, allowed: np.ndarray) -> np.ndarray:
+    """Get a maximum matching between the tails and the heads of the allowed
+    edges, computed with the Hopcroft-Karp algorithm.
+
+    :param graph_: graph
+    :param allowed: which edges can be matched
+
+    :return: indices of the matched edges
+
+    """
+    n_vertices = graph_.n_vertices
+    biadjacency = sparse.csr_matrix(
+        (
+            np.ones(np.count_nonzero(allowed)),
+            (graph_.tails[allowed], graph_.heads[allowed]),
+        ),
+        shape=(n_vertices, n_vertices),
+    )
+    heads = maximum_bipartite_matching(biadjacency, perm_type='column')
+    tails = np.flatnonzero(heads >= 0)
+    return graph_.find_edges(np.stack(
+        [graph_.vertices[tails], graph_.vertices[heads[tails]]], axis=1
+    ))
+
+
+def find_cycle_cover(
+        edges, reduced: bool = False, max_nodes: int = MAX_NODES
+) -> np.ndarray:
+    """Find a partition of the graph into cycles of length 3 or more, or, for
+    the reduced graph of a presolve.PresolvedGraph, a selection with one edge
+    out of each vertex with edges out, one edge into each vertex with edges
+    in and no cycles of length 2.
+
+    Without the rule on the length of the cycles, such a selection is a
+    perfect matching between the tails and the heads of the edges. A maximum
+    matching is computed; if it has cycles of length 2, the search branches
+    on which edge of the first of them is left out, depth first, until a
+    matching without them is found or no perfect matching is left.
+
+    :param edges: edges of the graph, or DiGraph
+    :param reduced: whether the graph is the reduced graph of a
+    presolve.PresolvedGraph
+    :param max_nodes: largest number of matchings computed
+
+    :return: indices of the selected edges, in increasing order, None if
+    there is no valid selection or none was found within max_nodes matchings
+
+    """
+    graph_ = graph.to_digraph(edges)
+    n_tails = np.count_nonzero(graph_.out_degrees)
+    if n_tails != np.count_nonzero(graph_.in_degrees):
+        return None
+    if not reduced and n_tails < graph_.n_vertices:
+        return None
+    reverse_edges = graph_.reverse_edges
+
+    stack = [graph_.tails != graph_.heads]
+    n_nodes = 0
+    while stack and n_nodes < max_nodes:
+        allowed = stack.pop()
+        n_nodes += 1
+        selection = _get_matching(graph_, allowed)
+        if len(selection) < n_tails:
+            continue
+        is_selected = np.zeros(graph_.n_edges, dtype=bool)
+        is_selected[selection] = True
+        reverse = reverse_edges[selection]
+        in_short_cycle = reverse >= 0
+        in_short_cycle[in_short_cycle] = is_selected[reverse[in_short_cycle]]
+        if not np.any(in_short_cycle):
+            return np.sort(selection)
+        first = selection[np.argmax(in_short_cycle)]
+        for edge in [reverse_edges[first], first]:
+            child = allowed.copy()
+            child[edge] = False
+            stack.append(child)
+    return None
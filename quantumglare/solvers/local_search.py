@@ -0,0 +1,139 @@
+import numpy as np
+from scipy import sparse
+
+from quantumglare.common import graph
+from quantumglare.common.qubo import get_Q_sparse
+
+# smallest decrease of the energy accepted as an improvement
+_TOLERANCE = 1e-9
+
+
+def _get_pairs(S: sparse.coo_matrix, endpoints: np.ndarray) -> tuple:
+    """Get the ordered pairs of variables with an interaction whose edges
+    share the given endpoint, grouped by first variable.
+
+    :param S: symmetric interactions, with an empty diagonal
+    :param endpoints: endpoint of each edge, tail or head
+
+    :return: a tuple made of the first and second variable and the
+    interaction of each pair
+
+    """
+    mask = endpoints[S.row] == endpoints[S.col]
+    first, second, bias = S.row[mask], S.col[mask], S.data[mask]
+    order = np.argsort(first, kind='stable')
+    return first[order], second[order], bias[order]
+
+
+def _get_best_refill(
+        deltas: np.ndarray, x: np.ndarray, pairs: tuple, n_edges: int
+) -> np.ndarray:
+    """Get, for each selected edge a, the lowest change of energy obtained by
+    selecting an edge c paired with it, once a is left out.
+
+    :param deltas: change of energy of flipping each variable
+    :param x: samples
+    :param pairs: pairs (a, c) with their interaction, grouped by a
+    :param n_edges: number of edges
+
+    :return: matrix of shape (n_samples, n_edges), inf where there is no
+    such edge c
+
+    """
+    first, second, bias = pairs
+    refill = np.full((len(x), n_edges), np.inf)
+    if len(first) == 0:
+        return refill
+    values = np.where(x[:, second] == 0, deltas[:, second] - bias, np.inf)
+    groups, starts = np.unique(first, return_index=True)
+    refill[:, groups] = np.minimum.reduceat(values, starts, axis=1)
+    return refill
+
+
+def repair(samples: np.ndarray, edges, max_steps: int = None) -> np.ndarray:
+    """Repair samples by steepest descent on the QUBO problem of the graph,
+    all of them at once. At every step each sample takes the move that
+    lowers its energy the most, among:
+        - flipping one variable
+        - swapping two edges with the same tail or head, which frees an
+          endpoint of the edge left out, followed by the best flip once the
+          swap is done; the swap is scored together with the best edge that
+          can take the freed endpoint, so that the move is taken when the
+          two together lower the energy
+
+    A sample stops when no move lowers its energy, valid solutions never
+    move.
+
+    :param samples: 0/1 matrix of shape (n_samples, n_edges), where the
+    column j tells if the j-th edge is selected
+    :param edges: edges of the graph, or DiGraph
+    :param max_steps: largest number of moves of a sample, the number of
+    edges if not set
+
+    :return: repaired samples, as a boolean matrix of the same shape
+
+    """
+    graph_ = graph.to_digraph(edges)
+    n_edges = graph_.n_edges
+    Q = get_Q_sparse(graph_)
+    linear = Q.diagonal()
+    upper = sparse.triu(Q, k=1)
+    S = (upper + upper.T).tocsr()
+
+    coo = S.tocoo()
+    is_swap = coo.col != graph_.reverse_edges[coo.row]
+    removed, added = coo.row[is_swap], coo.col[is_swap]
+    swap_bias = coo.data[is_swap]
+    shares_head = graph_.heads[removed] == graph_.heads[added]
+    tail_pairs = _get_pairs(coo, graph_.tails)
+    head_pairs = _get_pairs(coo, graph_.heads)
+
+    x = np.array(samples, dtype=float).reshape(-1, n_edges)
+    active = np.ones(len(x), dtype=bool)
+    max_steps = n_edges if max_steps is None else max_steps
+    for _ in range(max_steps):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
+        x_active = x[rows]
+        deltas = (1 - 2 * x_active) * (linear + (S @ x_active.T).T)
+        can_swap = (x_active[:, removed] == 1) & (x_active[:, added] == 0)
+        swaps = np.where(
+            can_swap,
+            deltas[:, removed] + deltas[:, added] - swap_bias,
+            np.inf,
+        )
+        # the swap frees the tail of the edge left out when the two edges
+        # share the head, and its head when they share the tail
+        refill = np.where(
+            shares_head,
+            _get_best_refill(deltas, x_active, tail_pairs, n_edges)[
+                :, removed
+            ],
+            _get_best_refill(deltas, x_active, head_pairs, n_edges)[
+                :, removed
+            ],
+        )
+        moves = np.concatenate(
+            [deltas, swaps + np.minimum(refill, 0)], axis=1
+        )
+        best = np.argmin(moves, axis=1)
+        improves = moves[np.arange(len(rows)), best] < -_TOLERANCE
+        active[rows[~improves]] = False
+        rows, best = rows[improves], best[improves]
+
+        is_flip = best < n_edges
+        flips = rows[is_flip]
+        x[flips, best[is_flip]] = 1 - x[flips, best[is_flip]]
+        swapped = rows[~is_flip]
+        swap = best[~is_flip] - n_edges
+        x[swapped, removed[swap]] = 0
+        x[swapped, added[swap]] = 1
+        if len(swapped):
+            x_swapped = x[swapped]
+            deltas = (1 - 2 * x_swapped) * (linear + (S @ x_swapped.T).T)
+            flip = np.argmin(deltas, axis=1)
+            improves = deltas[np.arange(len(swapped)), flip] < -_TOLERANCE
+            swapped, flip = swapped[improves], flip[improves]
+            x[swapped, flip] = 1 - x[swapped, flip]
+    return x.astype(bool)
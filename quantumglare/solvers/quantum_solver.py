@@ -1,102 +1,227 @@
+import ast
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice, product
+import logging
 import time
-from collections import defaultdict
 import json
 
 import pandas as pd
 import numpy as np
-from dwave.system.samplers import DWaveSampler
-from dwave.system.composites import AutoEmbeddingComposite
 
-from quantumglare.common.qubo import get_Q
-from quantumglare.common import embedding, graph, utils
+from quantumglare.common.qubo import (
+    IncrementalQubo,
+    calculate_energies,
+    get_coo_qubo,
+    get_Q_sparse,
+    get_labels,
+)
+from quantumglare.common import graph, metrics, presolve, utils
+from quantumglare.solvers import backends, local_search
 
-from quantumglare import settings  # NOQA
+# tolerance on the energy of a valid solution, which is exactly minus the
+# number of vertices with the penalties of qubo.get_Q
+_ENERGY_TOLERANCE = 1e-6
 
+# maximum number of packs of components sampled at the same time
+_MAX_WORKERS = 8
 
-def _get_dwave_response(
-        Q: dict,
-        num_reads: int,
-        anneal_time: int,
-        pause_duration: int,
-        pause_start: float,
-        seed_embedding: int,
-) -> pd.DataFrame:
-    """Get the response from D-Wave for the problem specified by Q.
+# fields of the QPU timing of a response, in microseconds, that are summed
+# over the packs of a run, the others are times per sample
+_QPU_TIMES = [
+    'qpu_access_time',
+    'qpu_programming_time',
+    'qpu_sampling_time',
+]
+_QPU_TIMES_PER_SAMPLE = [
+    'qpu_anneal_time_per_sample',
+    'qpu_readout_time_per_sample',
+    'qpu_delay_time_per_sample',
+]
+
+logger = logging.getLogger(__name__)
 
-    :param Q: QUBO matrix
-    :param num_reads: number of times the schedule is run on the quantum
-    annealer
-    :param anneal_time: time for the annealing part of the schedule
-    :param pause_duration: time for the pause part of the schedule
-    :param pause_start: value for the s parameter at which the pause starts
-    :param seed_embedding: start random seed for the embedding generation
 
-    :return: D-Wave response
+def decode_response(response, labels: list) -> tuple:
+    """Decode the samples of a response into bit-packed rows, whose i-th bit
+    is the variable labels[i], and aggregate the identical ones.
+
+    :param response: response given by D-Wave
+    :param labels: labels of the variables, in the order of the bits
+
+    :return: a tuple made of:
+        - distinct states packed with np.packbits, sorted by energy
+        - mean energy of each state
+        - number of occurrences of each state
 
     """
-    if pause_duration > 0:
-        schedule = [
-            [0.0, 0.0],
-            [pause_start * anneal_time, pause_start],
-            [pause_start * anneal_time + pause_duration, pause_start],
-            [anneal_time + pause_duration, 1.0]
-        ]
-    else:
-        schedule = [[0.0, 0.0], [anneal_time, 1.0]]
-
-    solver = DWaveSampler()
-    sampler = AutoEmbeddingComposite(
-        solver,
-        find_embedding=embedding.find_embedding,
-        embedding_parameters={
-            "random_seed": seed_embedding,
-            "verbose": 2,
-            "interactive": True,
-        },
-    )
-    response = sampler.sample_qubo(
-        Q,
-        num_reads=num_reads,
-        max_answers=num_reads,
-        anneal_schedule=schedule,
-        answer_mode='histogram',
-        return_embedding=True,
+    record = response.record
+    columns = [response.variables.index(label) for label in labels]
+    packed = np.packbits(record.sample[:, columns] > 0, axis=1)
+    states, inverse = np.unique(packed, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    n_records = np.bincount(inverse, minlength=len(states))
+    energies = np.bincount(
+        inverse, weights=record.energy, minlength=len(states)
+    ) / n_records
+    counts = np.bincount(
+        inverse, weights=record.num_occurrences, minlength=len(states)
+    ).astype(np.int64)
+    order = np.argsort(energies, kind='stable')
+    return states[order], energies[order], counts[order]
+
+
+def render_states(states: np.ndarray, labels: list) -> list:
+    """Render bit-packed states as strings of the form "['(u, v)', ...]".
+
+    :param states: states packed with np.packbits
+    :param labels: labels of the variables, in the order of the bits
+
+    :return: list of strings
+
+    """
+    labels = np.array(labels, dtype=object)
+    bits = np.unpackbits(states, axis=1, count=len(labels)).astype(bool)
+    return [str(labels[row].tolist()) for row in bits]
+
+
+def get_state_edges(states: np.ndarray, edge_indices: np.ndarray) -> list:
+    """Get the edges selected in bit-packed states, without rendering them.
+
+    :param states: states packed with np.packbits
+    :param edge_indices: index of the edge held by each bit, e.g. in the
+    input graph
+
+    :return: list of arrays of edge indices, one per state
+
+    """
+    if len(states) == 0:
+        return []
+    bits = np.unpackbits(
+        states, axis=1, count=len(edge_indices)
+    ).astype(bool)
+    _, columns = np.nonzero(bits)
+    return np.split(
+        np.asarray(edge_indices, dtype=np.int32)[columns],
+        np.cumsum(bits.sum(axis=1))[:-1],
     )
 
-    return response
+
+def _get_states_df(
+        states: np.ndarray,
+        energies: np.ndarray,
+        counts: np.ndarray,
+        labels: list,
+) -> pd.DataFrame:
+    return pd.DataFrame({
+        'state': render_states(states, labels),
+        'energy': energies,
+        'absolute_frequency': counts,
+    })
 
 
-def _extract_states_and_counts(response) -> pd.DataFrame:
+def _extract_states_and_counts(response, labels: list) -> pd.DataFrame:
     """Convert the response obtained from D-Wave into a DataFrame with energy
     and frequency for the different states.
 
     :param response: response given by D-Wave
+    :param labels: labels of the variables, in the order of the input edges
 
     :return: dataframe with states and frequency
 
     """
-    d = defaultdict(list)
-    for (s, e, n, _) in response.data():
-        key = str([k for k, v in s.items() if v])
-        d[key].append((e, n))
-    absfreq = {}
-    ens = {}
-    for key in d.keys():
-        absfreq[key] = np.sum([t[1] for t in d[key]])
-        ens[key] = np.mean([t[0] for t in d[key]])
-    energy_df = pd.DataFrame.from_dict(ens, orient='index', columns=['energy'])
-    freq_df = pd.DataFrame.from_dict(
-        absfreq, orient='index', columns=['absolute_frequency']
+    return _get_states_df(*decode_response(response, labels), labels)
+
+
+def _get_candidates(energies: np.ndarray, n_edges: int) -> np.ndarray:
+    """Get the indices of the states with the energy of a valid solution.
+
+    :param energies: energy of each state
+    :param n_edges: number of edges of a valid solution, which is the number
+    of vertices of the input graph
+
+    :return: indices of the candidate states
+
+    """
+    return np.flatnonzero(np.isclose(
+        energies, -n_edges, rtol=0, atol=_ENERGY_TOLERANCE
+    ))
+
+
+def get_valid_states(
+        states: np.ndarray,
+        energies: np.ndarray,
+        input_graph,
+        reduced: bool = False,
+) -> np.ndarray:
+    """Check which states are valid solutions. Only the states with the
+    energy of a valid solution, minus the number of vertices, are checked,
+    all of them in one batch.
+
+    :param states: states packed with np.packbits, whose i-th bit is the
+    i-th edge of input_graph
+    :param energies: energy of each state
+    :param input_graph: graph defining the problem to be solved, or DiGraph
+    :param reduced: whether input_graph is the reduced graph of a
+    presolve.PresolvedGraph, whose valid solutions select one edge out of
+    each vertex with edges out
+
+    :return: boolean array telling which states are valid
+
+    """
+    graph_ = graph.to_digraph(input_graph)
+    if reduced:
+        n_edges_solution = np.count_nonzero(graph_.out_degrees)
+        is_valid_batch = presolve.is_valid_reduced_batch
+    else:
+        n_edges_solution = graph_.n_vertices
+        is_valid_batch = graph.is_valid_batch
+    candidates = _get_candidates(energies, n_edges_solution)
+    samples = np.unpackbits(
+        states[candidates], axis=1, count=graph_.n_edges
+    ).astype(bool)
+    is_valid = np.zeros(len(states), dtype=bool)
+    is_valid[candidates] = is_valid_batch(samples, graph_)
+    return is_valid
+
+
+def get_repaired_valid_states(
+        states: np.ndarray, input_graph, reduced: bool = False
+) -> tuple:
+    """Repair the states with local_search.repair and check which of them are
+    valid solutions once repaired.
+
+    :param states: states packed with np.packbits, whose i-th bit is the
+    i-th edge of input_graph
+    :param input_graph: graph defining the problem to be solved, or DiGraph
+    :param reduced: whether input_graph is the reduced graph of a
+    presolve.PresolvedGraph
+
+    :return: a tuple made of:
+        - boolean array telling which states are valid once repaired
+        - distinct valid repaired states, packed with np.packbits
+
+    """
+    graph_ = graph.to_digraph(input_graph)
+    repaired = np.packbits(local_search.repair(
+        np.unpackbits(states, axis=1, count=graph_.n_edges), graph_
+    ), axis=1)
+    repaired_states, inverse = np.unique(
+        repaired, axis=0, return_inverse=True
+    )
+    energies = calculate_energies(
+        get_Q_sparse(graph_),
+        np.unpackbits(repaired_states, axis=1, count=graph_.n_edges),
     )
-    results_df_temp = pd.concat([energy_df, freq_df], axis=1)
-    results_df_temp.index.name = 'state'
-    return results_df_temp.reset_index().sort_values(by='energy')
+    is_valid = get_valid_states(repaired_states, energies, graph_, reduced)
+    return is_valid[inverse.ravel()], repaired_states[is_valid]
 
 
 def get_valid_solutions(states_df: pd.DataFrame, input_graph: list) -> tuple:
-    """Get the frequency of valid solution, by summing frequencies of lowest
-    energy states in the degenrate case, and outputs all valid solutions
-    found.
+    """Get the frequency of valid solution, by summing frequencies of all the
+    valid states, and outputs all valid solutions found.
+
+    Only the states with the energy of a valid solution, minus the number of
+    vertices, are parsed and checked, all of them in one batch.
 
     :param states_df: dataframe containing the states and energy
     :param input_graph: graph defining the problem to be solved
@@ -107,99 +232,507 @@ def get_valid_solutions(states_df: pd.DataFrame, input_graph: list) -> tuple:
         - all valid solutions
 
     """
-    enriched_states_df = states_df.copy()
-    enriched_states_df['is_valid'] = False
-    states_df.groupby(by='state')
-    lowest_energy = states_df['energy'].min()
-    lowest_energy_states_df = states_df[states_df['energy'] == lowest_energy]
-    solutions = []
-    solution_frequency = 0
-    for index, row in lowest_energy_states_df.iterrows():
-        edges_solution = utils.convert_list_of_strings_to_list_of_tuples(
-            eval(row['state'])
+    graph_ = graph.to_digraph(input_graph)
+    candidates = _get_candidates(
+        states_df['energy'].to_numpy(dtype=float), graph_.n_vertices
+    )
+    edges_candidates = [
+        utils.convert_list_of_strings_to_list_of_tuples(
+            ast.literal_eval(state)
         )
-        frequency_temp = row['relative_frequency']
-        is_valid = graph.is_valid(edges_solution, input_graph)
-        enriched_states_df.loc[
-            enriched_states_df['state'] == row['state'], 'is_valid'
-        ] = is_valid
-        if is_valid:
-            solution_frequency += frequency_temp
-            solutions.append(edges_solution)
-    print(f'number of different solutions: {len(solutions)}')
+        for state in states_df['state'].to_numpy()[candidates]
+    ]
+    samples = np.zeros((len(candidates), graph_.n_edges), dtype=bool)
+    is_well_formed = np.ones(len(candidates), dtype=bool)
+    for row, edges in enumerate(edges_candidates):
+        edge_indices = graph_.find_edges(edges)
+        # edges not in the input graph or repeated
+        if np.any(edge_indices < 0) \
+                or len(np.unique(edge_indices)) != len(edge_indices):
+            is_well_formed[row] = False
+        samples[row, edge_indices[edge_indices >= 0]] = True
+    is_valid_candidate = is_well_formed & graph.is_valid_batch(
+        samples, graph_
+    )
+
+    is_valid = np.zeros(len(states_df), dtype=bool)
+    is_valid[candidates] = is_valid_candidate
+    enriched_states_df = states_df.copy()
+    enriched_states_df['is_valid'] = is_valid
+    solution_frequency = float(
+        states_df['relative_frequency'].to_numpy()[is_valid].sum()
+    )
+    solutions = [
+        edges for edges, is_valid_edges
+        in zip(edges_candidates, is_valid_candidate) if is_valid_edges
+    ]
+    logger.info('number of different solutions: %d', len(solutions))
     return enriched_states_df, solution_frequency, solutions
 
 
-def solve(input_graph: list, params: dict) -> pd.DataFrame:
+def get_packs(
+        edge_components: np.ndarray, n_components: int, pack_edges: int = None
+) -> list:
+    """Group the components of a graph into packs sampled together, filling
+    each pack in order of component up to the given number of edges. A
+    component larger than that is sampled alone.
+
+    :param edge_components: component of each edge
+    :param n_components: number of components
+    :param pack_edges: maximum number of edges of a pack, one component per
+    pack if not set
+
+    :return: list of arrays of the components of each pack
+
+    """
+    if pack_edges is None:
+        return [np.array([c]) for c in range(n_components)]
+    sizes = np.bincount(edge_components, minlength=n_components)
+    packs = []
+    pack = []
+    pack_size = 0
+    for component, size in enumerate(sizes.tolist()):
+        if pack and pack_size + size > pack_edges:
+            packs.append(np.array(pack))
+            pack = []
+            pack_size = 0
+        pack.append(component)
+        pack_size += size
+    if pack:
+        packs.append(np.array(pack))
+    return packs
+
+
+def _get_component_states(
+        states: np.ndarray,
+        counts: np.ndarray,
+        columns: np.ndarray,
+        component_graph: graph.DiGraph,
+) -> tuple:
+    """Get the states of a component from the states of the pack it was
+    sampled in, with their energy for the QUBO problem of the component.
+
+    :param states: states of the pack, packed with np.packbits
+    :param counts: number of occurrences of each state of the pack
+    :param columns: bits of the pack holding the edges of the component
+    :param component_graph: edges of the component
+
+    :return: a tuple made of the distinct states of the component, sorted by
+    energy, their energy, their number of occurrences and the index of the
+    state of the component of each state of the pack
+
+    """
+    n_bits = int(columns.max()) + 1
+    bits = np.unpackbits(states, axis=1, count=n_bits)[:, columns]
+    component_states, inverse = np.unique(
+        np.packbits(bits, axis=1), axis=0, return_inverse=True
+    )
+    inverse = inverse.ravel()
+    component_counts = np.bincount(
+        inverse, weights=counts, minlength=len(component_states)
+    ).astype(np.int64)
+    energies = calculate_energies(
+        get_Q_sparse(component_graph),
+        np.unpackbits(
+            component_states, axis=1, count=component_graph.n_edges
+        ),
+    )
+    order = np.argsort(energies, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return (
+        component_states[order],
+        energies[order],
+        component_counts[order],
+        rank[inverse],
+    )
+
+
+def _sample_pack(backend, Q: dict, params: dict) -> tuple:
+    t0 = time.perf_counter()
+    response, info = backend.sample_qubo(Q, params)
+    if 'time_submit' not in info:
+        # the backends that do not report it sample synchronously, the time
+        # to submit is the time to get the response
+        info = {
+            **info,
+            'time_submit': time.perf_counter() - t0
+            - info.get('time_embedding', 0.0),
+            'time_wait': 0.0,
+        }
+    return response, info
+
+
+def _combine_embedding_info(embedding_infos: list, n_variables: list) -> dict:
+    """Combine the embedding information of the packs of a run. The chain
+    statistics are given if every pack was embedded, with the mean length
+    and the fraction of broken chains weighted by the number of chains.
+
+    :param embedding_infos: embedding information of each pack
+    :param n_variables: number of variables, i.e. of chains, of each pack
+
+    :return: embedding information of the run
+
+    """
+    cache_hits = [info['embedding_cache_hit'] for info in embedding_infos]
+    combined = {
+        'time_embedding': sum(
+            info['time_embedding'] for info in embedding_infos
+        ),
+        'embedding_cache_hit': None if not cache_hits or None in cache_hits
+        else all(cache_hits),
+        'time_embedding_saved': sum(
+            info['time_embedding_saved'] for info in embedding_infos
+        ),
+        'chain_strength': None,
+        'chain_length_max': None,
+        'chain_length_mean': None,
+        'chain_break_fraction': None,
+    }
+    if not embedding_infos or any(
+            info.get('chain_length_max') is None for info in embedding_infos
+    ):
+        return combined
+    combined['chain_strength'] = max(
+        info['chain_strength'] for info in embedding_infos
+    )
+    combined['chain_length_max'] = max(
+        info['chain_length_max'] for info in embedding_infos
+    )
+    for key in ['chain_length_mean', 'chain_break_fraction']:
+        combined[key] = float(np.average(
+            [info[key] for info in embedding_infos], weights=n_variables
+        ))
+    return combined
+
+
+def get_qpu_timing(responses: list) -> dict:
+    """Get the QPU timing of a run from the timing reported by the QPU in
+    the info of the response of each pack. The packs are separate problems,
+    so their access, programming and sampling times add up; the times per
+    sample are the largest ones.
+
+    Only the timings with the QPU access time come from a QPU, the
+    classical samplers report timings of their own, e.g. in nanoseconds.
+
+    :param responses: responses of the packs
+
+    :return: dictionary of times, in microseconds, all None if a response
+    does not report a QPU timing, and a time None if a response does not
+    report it
+
+    """
+    timings = [response.info.get('timing') or {} for response in responses]
+    qpu_timing = {field: None for field in _QPU_TIMES + _QPU_TIMES_PER_SAMPLE}
+    if not timings or any(
+            'qpu_access_time' not in timing for timing in timings
+    ):
+        return qpu_timing
+    for fields, combine in [(_QPU_TIMES, sum), (_QPU_TIMES_PER_SAMPLE, max)]:
+        for field in fields:
+            if all(field in timing for timing in timings):
+                qpu_timing[field] = float(
+                    combine(timing[field] for timing in timings)
+                )
+    return qpu_timing
+
+
+def solve(
+        input_graph: list,
+        params: dict,
+        session: backends.SolverSession = None,
+        base_qubo: IncrementalQubo = None,
+        run_metrics: metrics.Metrics = None,
+) -> pd.DataFrame:
     """Find the frequency of valid solutions for a given input graph with
     specified parameters for the solver algorithm.
     When the a solution is present, also outputs the edges defining the
     solution(s).
 
+    With params['presolve'], the edges decided by the structure of the graph
+    are fixed or removed first, see presolve.presolve, and only the reduced
+    graph is sampled. The solutions include the fixed edges, the states do
+    not. The backend is told whether it samples the reduced graph by
+    params['reduced'].
+
+    The states of the components are given in the column dwave_solution_df
+    as a dataframe, with each state as the indices of its edges in
+    input_graph, so that they are stored without being rendered, see
+    result_store.write_output.
+
+    With the QPU backends, params['chain_strength'] sets the chain strength,
+    which is derived from the biases of the problem if not set, and the
+    statistics of the chains are reported.
+
+    The timing reported by the QPU is stored with get_qpu_timing. The runs of
+    the classical backend, which does not anneal, are stored without the
+    anneal schedule, so that no time to solution is derived from it.
+
+    With params['repair'], the states are also repaired with
+    local_search.repair. The frequency of the states valid once repaired is
+    reported separately, and the solutions are the repaired ones.
+
+    The time spent in each stage is measured in run_metrics, see
+    metrics.STAGES, and reported in the output. With params['trace_memory'],
+    the peak memory of each stage is traced as well, if run_metrics is not
+    set.
+
     :param input_graph: graph defining the problem to be solved
-    :param params: parameters to be used by the quantum solver
+    :param params: parameters to be used by the quantum solver, the sampler
+    is chosen by params['backend'] and defaults to settings.BACKEND
+    :param session: session providing the backend, a new backend is created
+    for this call only if not set
+    :param base_qubo: QUBO problem of a base graph whose edges are the first
+    edges of input_graph, the QUBO problem is built from scratch if not set
+    :param run_metrics: metrics of the run, new metrics are created if not
+    set
 
     :return: dataframe containing the frequency of solution, and the edges
     defining the solution (when a solution is present)
 
     """
-    t0 = time.time()
-    Q = get_Q(input_graph)
-    t1 = time.time()
-    time_qubo = t1-t0
-    print(f"Time to get Q: {time_qubo:.2f} s")
-
-    t2 = time.time()
-    response = _get_dwave_response(
-        Q,
-        params['num_reads'],
-        params['anneal_time'],
-        params['pause_duration'],
-        params['pause_start'],
-        params['seed_embedding'],
+    if run_metrics is None:
+        run_metrics = metrics.Metrics(bool(params.get('trace_memory')))
+    t0 = time.perf_counter()
+    with run_metrics.span('qubo'):
+        input_digraph = graph.to_digraph(input_graph)
+        presolved = None
+        if params.get('presolve'):
+            presolved = presolve.presolve(input_digraph)
+            if not presolved.is_feasible:
+                logger.info('presolve: the input graph has no valid '
+                            'solution, it is sampled as it is')
+                presolved = None
+        if presolved is not None:
+            logger.info('presolve: %d edges fixed, %d edges removed',
+                        presolved.n_fixed_edges, presolved.n_removed_edges)
+            problem_digraph = presolved.reduced_graph
+            fixed_edges = presolved.get_fixed_edges()
+        else:
+            problem_digraph = input_digraph
+            fixed_edges = []
+
+        if problem_digraph.n_edges == 0:
+            n_components = 0
+            edge_components = np.zeros(0, dtype=np.int64)
+        elif params.get('decompose'):
+            n_components, edge_components = graph.get_components(
+                problem_digraph
+            )
+        else:
+            n_components = 1
+            edge_components = np.zeros(
+                problem_digraph.n_edges, dtype=np.int64
+            )
+        packs = get_packs(
+            edge_components, n_components, params.get('pack_edges')
+        )
+        component_packs = np.empty(n_components, dtype=np.int64)
+        for i, pack in enumerate(packs):
+            component_packs[pack] = i
+        edge_packs = component_packs[edge_components]
+        pack_edges = np.split(
+            np.argsort(edge_packs, kind='stable'),
+            np.cumsum(np.bincount(edge_packs, minlength=len(packs)))[:-1],
+        ) if packs else []
+        if presolved is None and n_components == 1 and base_qubo is not None:
+            Qs = [base_qubo.get_coo_qubo(
+                added=input_graph[base_qubo.graph.n_edges:]
+            )]
+        elif presolved is None and n_components == 1:
+            Qs = [get_coo_qubo(input_graph)]
+        else:
+            Qs = [
+                get_coo_qubo(problem_digraph.edges[edges])
+                for edges in pack_edges
+            ]
+    time_qubo = run_metrics.get_time('qubo')
+    logger.info('time to get Q: %.2f s', time_qubo)
+
+    t2 = time.perf_counter()
+    if session is not None:
+        backend = session.get_backend(params.get('backend'))
+    else:
+        backend = backends.get_backend(params.get('backend'))
+    sample_params = {**params, 'reduced': presolved is not None}
+    if len(Qs) <= 1:
+        samples = [_sample_pack(backend, Q, sample_params) for Q in Qs]
+    else:
+        with ThreadPoolExecutor(min(len(Qs), _MAX_WORKERS)) as executor:
+            samples = list(executor.map(
+                lambda Q: _sample_pack(backend, Q, sample_params), Qs
+            ))
+    responses = [response for response, _ in samples]
+    qpu_timing = get_qpu_timing(responses)
+    embedding_info = _combine_embedding_info(
+        [info for _, info in samples],
+        [len(edges) for edges in pack_edges],
     )
-    t3 = time.time()
-    time_dwave_response = t3 - t2
-    print(f"D-Wave time (including finding embedding): "
-          f"{time_dwave_response:.2f} s")
-    states_df = _extract_states_and_counts(response)
-    states_df['relative_frequency'] = states_df['absolute_frequency'] \
-        / params['num_reads']
-
-    enriched_states_df, solution_frequency, edges_solution = \
-        get_valid_solutions(states_df, input_graph)
-    print(f'the frequency is {solution_frequency:.2%}')
+    time_dwave_response = time.perf_counter() - t2
+    # summed over the packs, which are sampled in parallel
+    for stage in ['embedding', 'submit', 'wait', 'unembed']:
+        run_metrics.add(stage, sum(
+            info.get(f'time_{stage}', 0.0) for _, info in samples
+        ))
+    logger.info('%s time (including finding embedding): %.2f s',
+                backend.name, time_dwave_response)
+
+    repair = bool(params.get('repair'))
+    solution_frequency = 1.0
+    solution_frequency_repaired = 1.0
+    component_solutions = []
+    states_dfs = []
+    for pack, edges, response in zip(packs, pack_edges, responses):
+        with run_metrics.span('decode'):
+            pack_graph = graph.DiGraph(problem_digraph.edges[edges])
+            # the states are stored as indices of the edges of input_graph
+            input_edges = presolved.reduced_edges[edges] \
+                if presolved is not None else edges
+            states, energies, counts = decode_response(
+                response, get_labels(pack_graph)
+            )
+        # a read of the pack is a solution if the states of all its
+        # components are, so the components of a pack are not independent
+        is_valid_pack = np.ones(len(states), dtype=bool)
+        is_valid_repaired_pack = np.ones(len(states), dtype=bool)
+        for component in pack.tolist():
+            with run_metrics.span('decode'):
+                if len(pack) == 1:
+                    component_graph = pack_graph
+                    component_edges = input_edges
+                    component_states = states, energies, counts
+                    pack_inverse = np.arange(len(states))
+                else:
+                    columns = np.flatnonzero(
+                        edge_components[edges] == component
+                    )
+                    component_graph = graph.DiGraph(
+                        pack_graph.edges[columns]
+                    )
+                    component_edges = input_edges[columns]
+                    *component_states, pack_inverse = _get_component_states(
+                        states, counts, columns, component_graph
+                    )
+            with run_metrics.span('validate'):
+                is_valid = get_valid_states(
+                    component_states[0],
+                    component_states[1],
+                    component_graph,
+                    reduced=presolved is not None,
+                )
+                relative_frequencies = \
+                    component_states[2] / params['num_reads']
+                is_valid_pack &= is_valid[pack_inverse]
+            with run_metrics.span('decode'):
+                states_df = pd.DataFrame({
+                    'state': get_state_edges(
+                        component_states[0], component_edges
+                    ),
+                    'energy': component_states[1],
+                    'absolute_frequency': component_states[2],
+                    'relative_frequency': relative_frequencies,
+                    'is_valid': is_valid,
+                    'component': component,
+                })
+            valid_states = component_states[0][is_valid]
+            if repair:
+                with run_metrics.span('repair'):
+                    is_valid_repaired, valid_states = \
+                        get_repaired_valid_states(
+                            component_states[0],
+                            component_graph,
+                            reduced=presolved is not None,
+                        )
+                is_valid_repaired_pack &= is_valid_repaired[pack_inverse]
+                states_df['is_valid_repaired'] = is_valid_repaired
+            with run_metrics.span('decode'):
+                component_solutions.append([
+                    component_graph.to_list(np.flatnonzero(sample))
+                    for sample in np.unpackbits(
+                        valid_states, axis=1, count=component_graph.n_edges
+                    )
+                ])
+            states_dfs.append(states_df)
+        # the packs are sampled independently
+        solution_frequency *= float(
+            counts[is_valid_pack].sum() / params['num_reads']
+        )
+        solution_frequency_repaired *= float(
+            counts[is_valid_repaired_pack].sum() / params['num_reads']
+        )
+    # the solutions of the components combined, as many as the reads, with
+    # the edges fixed by the presolve
+    edges_solution = [
+        fixed_edges + list(chain.from_iterable(solutions))
+        for solutions in islice(
+            product(*component_solutions), params['num_reads']
+        )
+    ]
+    logger.info('number of different solutions: %d', len(edges_solution))
+    logger.info('the frequency is %.2f%%', 100 * solution_frequency)
+    if repair:
+        logger.info('the frequency after repair is %.2f%%',
+                    100 * solution_frequency_repaired)
     if 0 < solution_frequency < 1:
         runs_to_solution = np.log(1 - 0.99) / np.log(1 - solution_frequency)
     elif solution_frequency == 1:
         runs_to_solution = 0
     else:
         runs_to_solution = None
-    t4 = time.time()
-    time_overall_computation = t4 - t0
-    print(f"Time to solve overall: {time_overall_computation:.2f} s")
-    data = [[
-        params['tag'],
-        params['n_cycles'],
-        params['cycle_length'],
-        params['n_vertices'],
-        params['p_noise'],
-        params['n_edges_noise'],
-        params['seed_input_graph'],
-        params['seed_embedding'],
-        params['num_reads'],
-        params['anneal_time'],
-        params['pause_duration'],
-        params['pause_start'],
-        time_qubo,
-        time_dwave_response,
-        time_overall_computation,
-        solution_frequency,
-        runs_to_solution,
-        input_graph,
-        edges_solution,
-        enriched_states_df.to_json(orient='records'),
-        json.dumps(response.info['embedding_context'])
-    ]]
+    time_overall_computation = time.perf_counter() - t0
+    logger.info('time to solve overall: %.2f s', time_overall_computation)
+    # the classical backend does not anneal, its runs have no schedule
+    schedule = {
+        column: params[column] if backend.name != 'classical' else None
+        for column in ['anneal_time', 'pause_duration', 'pause_start']
+    }
+    record = {
+        'tag': params['tag'],
+        'n_cycles': params['n_cycles'],
+        'cycle_length': params['cycle_length'],
+        'n_vertices': params['n_vertices'],
+        'p_noise': params['p_noise'],
+        'n_edges_noise': params['n_edges_noise'],
+        'seed_input_graph': params['seed_input_graph'],
+        'seed_embedding': params['seed_embedding'],
+        'num_reads': params['num_reads'],
+        **schedule,
+        'backend': backend.name,
+        'n_components': n_components,
+        'n_fixed_edges': len(fixed_edges),
+        'n_removed_edges': presolved.n_removed_edges
+        if presolved is not None else 0,
+        'time_qubo': time_qubo,
+        'time_dwave_response': time_dwave_response,
+        'time_embedding': embedding_info['time_embedding'],
+        'embedding_cache_hit': embedding_info['embedding_cache_hit'],
+        'time_embedding_saved': embedding_info['time_embedding_saved'],
+        'chain_strength': embedding_info['chain_strength'],
+        'chain_length_max': embedding_info['chain_length_max'],
+        'chain_length_mean': embedding_info['chain_length_mean'],
+        'chain_break_fraction': embedding_info['chain_break_fraction'],
+        **qpu_timing,
+        'time_submit': run_metrics.get_time('submit'),
+        'time_wait': run_metrics.get_time('wait'),
+        'time_unembed': run_metrics.get_time('unembed'),
+        'time_decode': run_metrics.get_time('decode'),
+        'time_validate': run_metrics.get_time('validate'),
+        'time_repair': run_metrics.get_time('repair'),
+        'peak_memory': run_metrics.get_peak_memory(),
+        'time_overall_computation': time_overall_computation,
+        'solution_frequency': solution_frequency,
+        'solution_frequency_repaired': solution_frequency_repaired
+        if repair else None,
+        'runs_to_solution': runs_to_solution,
+        'input_graph': input_graph,
+        'solutions': edges_solution,
+        'dwave_solution_df': pd.concat(states_dfs, ignore_index=True)
+        if states_dfs else pd.DataFrame({'state': []}),
+        'embedding_context': json.dumps(
+            responses[0].info.get('embedding_context') if len(responses) == 1
+            else [r.info.get('embedding_context') for r in responses]
+        ),
+    }
+    data = [[record[column] for column in utils.OUTPUT_COLUMNS]]
 
     return data
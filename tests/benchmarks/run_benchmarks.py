@@ -0,0 +1,261 @@
+"""Micro-benchmarks of the hot paths of the graph, QUBO and solver modules at
+the instance sizes of results/generate_raw_data.py, on synthetic D-Wave-like
+sample sets, so that no QPU is needed.
+
+The time and the peak memory of every benchmark are appended to a JSON
+history. The run fails if a benchmark is slower than the baseline stored in
+the history by more than the threshold. Run from the root of the repository
+with
+
+    python -m tests.benchmarks.run_benchmarks
+
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import dimod
+import numpy as np
+
+from quantumglare.common import graph, qubo
+from quantumglare.solvers import quantum_solver
+
+HISTORY_FILENAME = os.path.join('data', 'benchmark_history.json')
+
+# (cycle_length, n_cycles, n_edges_noise), sizes of runs of
+# generate_raw_data.get_article_jobs, from the smallest one to the largest
+# one of each figure: 5400 vertices, 1200 noise edges and, with p_noise=5e-5,
+# 882 noise edges on cycles of length 5
+INSTANCES = [
+    (3, 20, 0),
+    (4, 600, 0),
+    (4, 1000, 1200),
+    (4, 1350, 0),
+    (5, 840, 882),
+]
+
+# number of reads of the synthetic sample sets, as in generate_raw_data
+NUM_READS = 100
+
+# slowdowns smaller than this, in seconds, are never reported
+_MIN_SLOWDOWN = 1e-3
+
+
+def get_synthetic_response(edges: list, n_vertices: int, seed: int = 0):
+    """Get a sample set like the ones returned by D-Wave: the valid solution
+    given by the first n_vertices edges with up to three variables flipped,
+    aggregated.
+
+    :param edges: edges of the input graph
+    :param n_vertices: number of vertices of the input graph
+    :param seed: random seed
+
+    :return: sample set
+
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros((NUM_READS, len(edges)), dtype=np.int8)
+    samples[:, :n_vertices] = 1
+    for sample in samples:
+        flipped = rng.choice(len(edges), rng.integers(0, 4), replace=False)
+        sample[flipped] = 1 - sample[flipped]
+    bqm = dimod.BinaryQuadraticModel.from_qubo(qubo.get_Q(edges))
+    return dimod.SampleSet.from_samples_bqm(
+        (samples, qubo.get_labels(edges)), bqm
+    ).aggregate()
+
+
+def get_instance(cycle_length: int, n_cycles: int, n_edges_noise: int):
+    """Get the inputs of the benchmarks for an instance size.
+
+    :param cycle_length: length of the cycles
+    :param n_cycles: number of cycles
+    :param n_edges_noise: number of noise edges
+
+    :return: dictionary of inputs
+
+    """
+    n_vertices = n_cycles * cycle_length
+    base = graph.create_graph_hamiltonian_cycles(n_cycles, cycle_length)
+    edges = graph.add_noise(base, n_edges_noise, seed=0)
+    labels = qubo.get_labels(edges)
+    response = get_synthetic_response(edges, n_vertices)
+    states_df = quantum_solver._extract_states_and_counts(response, labels)
+    states_df['relative_frequency'] = \
+        states_df['absolute_frequency'] / NUM_READS
+    return {
+        'base': base,
+        'edges': edges,
+        'n_edges_noise': n_edges_noise,
+        'solution': edges[:n_vertices],
+        'labels': labels,
+        'response': response,
+        'states_df': states_df,
+    }
+
+
+# name: (function, arguments taken from the inputs of get_instance)
+BENCHMARKS = {
+    'get_Q': (qubo.get_Q, lambda i: (i['edges'],)),
+    'is_valid': (graph.is_valid, lambda i: (i['solution'], i['edges'])),
+    'add_noise': (
+        graph.add_noise, lambda i: (i['base'], i['n_edges_noise'], 0)
+    ),
+    '_extract_states_and_counts': (
+        quantum_solver._extract_states_and_counts,
+        lambda i: (i['response'], i['labels']),
+    ),
+    'get_valid_solutions': (
+        quantum_solver.get_valid_solutions,
+        lambda i: (i['states_df'], i['edges']),
+    ),
+}
+
+
+def measure(function, args: tuple, repeat: int) -> dict:
+    """Measure the best time of a function over several calls, and its peak
+    memory traced with tracemalloc in a separate call.
+
+    :param function: function to be measured
+    :param args: arguments of the function
+    :param repeat: number of timed calls
+
+    :return: dictionary with the time in seconds and the peak memory in bytes
+
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'time': min(times), 'peak_memory': peak_memory}
+
+
+def run_benchmarks(names: list = None, repeat: int = 3) -> dict:
+    """Run the benchmarks on every instance size.
+
+    :param names: benchmarks to be run, all of them if not set
+    :param repeat: number of timed calls of each benchmark
+
+    :return: dictionary of measures, keyed by benchmark and instance size
+
+    """
+    results = {}
+    for cycle_length, n_cycles, n_edges_noise in INSTANCES:
+        instance = get_instance(cycle_length, n_cycles, n_edges_noise)
+        for name, (function, get_args) in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            key = f'{name}[cycle_length={cycle_length},n_cycles={n_cycles},' \
+                  f'n_edges_noise={n_edges_noise}]'
+            results[key] = measure(function, get_args(instance), repeat)
+            print(f"{key}: {results[key]['time'] * 1e3:.2f} ms, "
+                  f"{results[key]['peak_memory'] / 2 ** 20:.1f} MiB")
+    return results
+
+
+def get_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """Get the benchmarks slower than the baseline by more than the
+    threshold.
+
+    :param results: measures of the current run
+    :param baseline: measures of the baseline
+    :param threshold: largest accepted ratio between the time of the current
+    run and the time of the baseline
+
+    :return: list of (key, time, baseline time) tuples
+
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        baseline_time = baseline[key]['time']
+        if result['time'] > threshold * baseline_time \
+                and result['time'] - baseline_time > _MIN_SLOWDOWN:
+            regressions.append((key, result['time'], baseline_time))
+    return regressions
+
+
+def _get_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(filename: str) -> dict:
+    if not os.path.exists(filename):
+        return {'baseline': None, 'runs': []}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def write_history(history: dict, filename: str) -> None:
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_filename, filename)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the micro-benchmarks and compare them to the '
+                    'baseline stored in the history.'
+    )
+    parser.add_argument('--history', default=HISTORY_FILENAME,
+                        help='JSON file with the baseline and the runs')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='largest accepted ratio to the baseline time')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed calls of each benchmark')
+    parser.add_argument('--benchmarks', nargs='+', default=None,
+                        choices=list(BENCHMARKS),
+                        help='benchmarks to be run, all of them if not set')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store this run as the baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.repeat)
+    run = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _get_commit(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'results': results,
+    }
+    history = read_history(args.history)
+    if history['baseline'] is None or args.update_baseline:
+        history['baseline'] = run
+        print('baseline stored')
+    regressions = get_regressions(
+        results, history['baseline']['results'], args.threshold
+    )
+    history['runs'].append(run)
+    write_history(history, args.history)
+
+    for key, time_, baseline_time in regressions:
+        print(f'REGRESSION {key}: {time_ * 1e3:.2f} ms, baseline '
+              f'{baseline_time * 1e3:.2f} ms')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
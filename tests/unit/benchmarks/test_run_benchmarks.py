@@ -0,0 +1,55 @@
+from quantumglare.results import generate_raw_data
+from tests.benchmarks import run_benchmarks
+
+
+def _get_results(times):
+    return {key: {'time': time_, 'peak_memory': 0}
+            for key, time_ in times.items()}
+
+
+class TestInstances:
+    def test_sizes_of_the_article(self):
+        sizes = {
+            (params['cycle_length'], params['n_cycles'],
+             params['n_edges_noise'])
+            for params in generate_raw_data.get_article_jobs([0])
+        }
+
+        for instance in run_benchmarks.INSTANCES:
+            assert instance in sizes
+
+
+class TestGetRegressions:
+    BASELINE = _get_results({'a': 0.1, 'b': 0.1, 'c': 1e-4})
+
+    def test_above_threshold(self):
+        results = _get_results({'a': 0.2, 'b': 0.1})
+
+        regressions = run_benchmarks.get_regressions(
+            results, self.BASELINE, 1.5
+        )
+
+        assert regressions == [('a', 0.2, 0.1)]
+
+    def test_below_threshold(self):
+        results = _get_results({'a': 0.14, 'b': 0.05})
+
+        assert run_benchmarks.get_regressions(
+            results, self.BASELINE, 1.5
+        ) == []
+
+    def test_small_slowdown(self):
+        # slower than the threshold, but by less than a millisecond
+        results = _get_results({'c': 5e-4})
+
+        assert run_benchmarks.get_regressions(
+            results, self.BASELINE, 1.5
+        ) == []
+
+    def test_missing_baseline(self):
+        results = _get_results({'a': 0.1, 'd': 10.0})
+
+        assert run_benchmarks.get_regressions(
+            results, self.BASELINE, 1.5
+        ) == []
+        assert run_benchmarks.get_regressions(results, {}, 1.5) == []
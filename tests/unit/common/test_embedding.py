@@ -0,0 +1,111 @@
+import os
+
+import dimod
+import numpy as np
+
+from quantumglare.common import embedding
+
+
+SOURCE = [('a', 'b'), ('b', 'c'), ('c', 'a'), ('a', 'a'), ('b', 'b'), ('c', 'c')]
+TARGET = [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2), (1, 3)]
+
+
+class TestGetEmbeddingKey:
+    def test_does_not_depend_on_edge_order(self):
+        key = embedding.get_embedding_key(SOURCE, TARGET, random_seed=0)
+        key_reordered = embedding.get_embedding_key(
+            [(v, u) for (u, v) in reversed(SOURCE)], TARGET[::-1], random_seed=0
+        )
+        assert key == key_reordered
+
+    def test_ignores_verbosity(self):
+        key = embedding.get_embedding_key(SOURCE, TARGET, random_seed=0)
+        key_verbose = embedding.get_embedding_key(
+            SOURCE, TARGET, random_seed=0, verbose=2, interactive=True
+        )
+        assert key == key_verbose
+
+    def test_depends_on_seed_and_graphs(self):
+        key = embedding.get_embedding_key(SOURCE, TARGET, random_seed=0)
+        assert key != embedding.get_embedding_key(SOURCE, TARGET, random_seed=1)
+        assert key != embedding.get_embedding_key(SOURCE[1:], TARGET, random_seed=0)
+        assert key != embedding.get_embedding_key(SOURCE, TARGET[1:], random_seed=0)
+
+    def test_target_digest(self):
+        key = embedding.get_embedding_key(SOURCE, TARGET, random_seed=0)
+        key_digest = embedding.get_embedding_key(
+            SOURCE, None, embedding.get_edges_digest(TARGET), random_seed=0
+        )
+        assert key == key_digest
+
+
+class TestFindEmbeddingCached:
+    def test_miss_then_hit(self, tmp_path):
+        embedding_miss, info_miss = embedding.find_embedding_cached(
+            SOURCE, TARGET, cache_dir=str(tmp_path), random_seed=0
+        )
+        embedding_hit, info_hit = embedding.find_embedding_cached(
+            SOURCE, TARGET, cache_dir=str(tmp_path), random_seed=0
+        )
+
+        assert info_miss['embedding_cache_hit'] is False
+        assert info_hit['embedding_cache_hit'] is True
+        assert embedding_hit == {k: list(v) for k, v in embedding_miss.items()}
+        assert len(os.listdir(str(tmp_path))) == 1
+
+    def test_no_cache_dir(self):
+        for _ in range(2):
+            embedding_, info = embedding.find_embedding_cached(
+                SOURCE, TARGET, random_seed=0
+            )
+            assert info['embedding_cache_hit'] is False
+            assert set(embedding_) == {'a', 'b', 'c'}
+
+
+class TestUnembedSamples:
+    # a and b want to be different, c has no interactions
+    BQM = dimod.BinaryQuadraticModel.from_qubo(
+        {('a', 'a'): -1, ('b', 'b'): -1, ('a', 'b'): 2, ('c', 'c'): 1}
+    )
+    LABELS = ['a', 'b', 'c']
+    EMBEDDING = {'a': [0, 1, 2], 'b': [3, 4], 'c': [5]}
+
+    def test_majority_vote(self):
+        columns, indptr = embedding.get_chains(
+            self.EMBEDDING, self.LABELS, [5, 4, 3, 2, 1, 0]
+        )
+        target_samples = np.array([
+            [0, 0, 0, 1, 1, 1],
+            [1, 0, 0, 1, 0, 1],
+        ])
+
+        samples, is_broken = embedding.unembed_samples(
+            target_samples, columns, indptr, self.BQM, self.LABELS
+        )
+
+        assert samples.tolist() == [[1, 0, 0], [1, 0, 1]]
+        assert is_broken.tolist() == [
+            [False, False, False], [True, False, False]
+        ]
+
+    def test_tie_takes_lowest_energy(self):
+        columns, indptr = embedding.get_chains(
+            self.EMBEDDING, self.LABELS, list(range(6))
+        )
+        # the chain of b is broken with one qubit up and one down
+        target_samples = np.array([[1, 1, 1, 1, 0, 0], [0, 0, 0, 1, 0, 0]])
+
+        samples, is_broken = embedding.unembed_samples(
+            target_samples, columns, indptr, self.BQM, self.LABELS
+        )
+
+        assert samples.tolist() == [[1, 0, 0], [0, 1, 0]]
+        assert is_broken[:, 1].tolist() == [True, True]
+
+
+class TestGetChainStrength:
+    def test_largest_ising_bias(self):
+        bqm = dimod.BinaryQuadraticModel.from_ising(
+            {'a': 0.5, 'b': -3}, {('a', 'b'): 2}
+        )
+        assert embedding.get_chain_strength(bqm) == 3
@@ -0,0 +1,59 @@
+import json
+
+from quantumglare.common import metrics
+
+
+class TestMetrics:
+    def test_spans_of_a_stage_add_up(self):
+        run_metrics = metrics.Metrics()
+        with run_metrics.span('decode'):
+            pass
+        run_metrics.add('decode', 1.0)
+        run_metrics.add('submit', 2.0)
+
+        assert 1.0 < run_metrics.get_time('decode') < 1.1
+        assert run_metrics.get_time('submit') == 2.0
+        assert run_metrics.get_time('wait') == 0.0
+        assert run_metrics.get_peak_memory() is None
+        assert list(run_metrics.get_record()) == ['time_submit', 'time_decode']
+
+    def test_trace_memory(self):
+        run_metrics = metrics.Metrics(trace_memory=True)
+        with run_metrics.span('qubo'):
+            data = bytearray(10 ** 6)
+        del data
+        with run_metrics.span('decode'):
+            pass
+
+        record = run_metrics.get_record()
+        assert record['peak_memory_qubo'] >= 10 ** 6
+        assert record['peak_memory_decode'] < 10 ** 6
+        assert run_metrics.get_peak_memory() == record['peak_memory_qubo']
+
+
+class TestWriteMetrics:
+    LABELS = {'tag': 'a"b', 'seed_embedding': 0}
+    RECORD = {'time_qubo': 0.5, 'time_write': 0.25}
+
+    def test_json_lines(self, tmp_path):
+        filename = str(tmp_path / 'metrics.jsonl')
+        metrics.write_metrics(self.LABELS, self.RECORD, filename)
+        metrics.write_metrics(self.LABELS, self.RECORD, filename)
+
+        with open(filename) as f:
+            lines = [json.loads(line) for line in f]
+        assert lines == [{**self.LABELS, **self.RECORD}] * 2
+
+    def test_prometheus(self, tmp_path):
+        filename = str(tmp_path / 'metrics.prom')
+        metrics.write_metrics(self.LABELS, {'time_qubo': 1.0}, filename)
+        metrics.write_metrics(self.LABELS, self.RECORD, filename)
+
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        assert lines[2:] == [
+            'quantumglare_stage_duration_seconds{tag="a\\"b",'
+            'seed_embedding="0",stage="qubo"} 0.5',
+            'quantumglare_stage_duration_seconds{tag="a\\"b",'
+            'seed_embedding="0",stage="write"} 0.25',
+        ]
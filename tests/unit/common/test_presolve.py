@@ -0,0 +1,100 @@
+from itertools import product
+
+import numpy as np
+
+from quantumglare.common import graph, presolve, qubo
+
+
+def _get_all_samples(n_edges: int) -> np.ndarray:
+    return np.array(
+        list(product([False, True], repeat=n_edges)), dtype=bool
+    ).reshape(2 ** n_edges, n_edges)
+
+
+class TestPresolve:
+    def test_cycles_are_fixed(self):
+        edges = graph.create_graph_hamiltonian_cycles(2, 3)
+
+        presolved = presolve.presolve(edges)
+
+        assert presolved.is_feasible
+        assert presolved.n_fixed_edges == 6
+        assert presolved.reduced_graph.n_edges == 0
+        assert presolved.get_Q() == {}
+
+    def test_edge_between_components_is_removed(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 5), (5, 3)]
+
+        presolved = presolve.presolve(edges)
+
+        assert presolved.n_removed_edges == 1
+        assert presolved.n_fixed_edges == 6
+        assert (3, 4) in presolved.get_fixed_edges()
+
+    def test_forced_edges_propagate(self):
+        # (3, 0) is the only edge into 0, so (1, 0) and then (0, 1) go
+        edges = [(0, 1), (1, 2), (2, 3), (3, 0), (1, 0), (0, 2), (2, 0)]
+
+        presolved = presolve.presolve(edges)
+
+        assert presolved.is_feasible
+        assert presolved.get_fixed_edges() == [(0, 1), (1, 2), (2, 3), (3, 0)]
+
+    def test_infeasible(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3)]
+
+        presolved = presolve.presolve(edges)
+
+        assert not presolved.is_feasible
+        assert presolved.n_fixed_edges == 0
+        assert presolved.reduced_graph.n_edges == 4
+
+    def test_same_valid_solutions(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            n_vertices = rng.integers(3, 7)
+            all_edges = [
+                (u, v) for u in range(n_vertices) for v in range(n_vertices)
+                if u != v
+            ]
+            choice = rng.choice(
+                len(all_edges), min(len(all_edges), 12), replace=False
+            )
+            edges = [all_edges[i] for i in sorted(choice)]
+            samples = _get_all_samples(len(edges))
+            expected = samples[graph.is_valid_batch(samples, edges)]
+
+            presolved = presolve.presolve(edges)
+
+            if not presolved.is_feasible:
+                assert len(expected) == 0
+                continue
+            reduced_samples = _get_all_samples(
+                presolved.reduced_graph.n_edges
+            )
+            is_valid = presolve.is_valid_reduced_batch(
+                reduced_samples, presolved.reduced_graph
+            )
+            lifted = presolved.lift(reduced_samples[is_valid])
+            assert sorted(map(tuple, lifted.tolist())) \
+                == sorted(map(tuple, expected.tolist()))
+
+    def test_valid_solutions_of_reduced_qubo_have_lowest_energy(self):
+        # two triangles or one hexagon
+        edges = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (5, 0),
+        ]
+        presolved = presolve.presolve(edges)
+        reduced_graph = presolved.reduced_graph
+        samples = _get_all_samples(reduced_graph.n_edges)
+
+        energies = qubo.calculate_energies(
+            qubo.get_Q_sparse(reduced_graph), samples
+        )
+        is_valid = presolve.is_valid_reduced_batch(samples, reduced_graph)
+
+        n_edges_solution = np.count_nonzero(reduced_graph.out_degrees)
+        assert reduced_graph.n_edges == 4
+        assert np.count_nonzero(is_valid) == 2
+        assert np.allclose(energies[is_valid], -n_edges_solution)
+        assert np.all(energies[~is_valid] > -n_edges_solution + 1e-6)
@@ -1,7 +1,9 @@
+import dimod
 import pytest
 import numpy as np
+from scipy import sparse
 
-from quantumglare.common import qubo
+from quantumglare.common import graph, qubo
 
 
 class TestGetQ:
@@ -79,6 +81,128 @@ class TestGetQ:
         }
         assert q == expected_q
 
+    def test_digraph_input(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 1)]
+        assert qubo.get_Q(graph.DiGraph(edges)) == qubo.get_Q(edges)
+
+
+class TestGetQCoo:
+    def test_edges_are_indexed_by_position(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 1)]
+        row, col, bias = qubo.get_Q_coo(edges)
+        q = {(r, c): b for r, c, b in zip(row.tolist(), col.tolist(), bias)}
+        expected_q = {
+            (0, 0): -1,
+            (1, 1): -1,
+            (2, 2): -1,
+            (3, 3): -1,
+            # due to max one out constraint
+            (2, 3): 1.01,
+            # due to max one in constraint
+            (0, 3): 1.01,
+            # due to no pairs constraint
+            (1, 3): 2.01,
+        }
+        assert q == expected_q
+
+    def test_epsilon(self):
+        edges = [(0, 1), (1, 0), (0, 2)]
+        row, col, bias = qubo.get_Q_coo(edges, epsilon=0.1)
+        q = {(r, c): b for r, c, b in zip(row.tolist(), col.tolist(), bias)}
+        assert np.isclose(q[(0, 2)], 1.1)
+        assert np.isclose(q[(0, 1)], 2.1)
+
+    def test_dict_adapter_with_non_contiguous_vertices(self):
+        edges = [(8, 5), (11, 5), (5, 8), (5, 11), (8, 11), (11, 8)]
+        q = qubo.get_Q(edges)
+        expected_q = {
+            ('(8, 5)', '(8, 5)'): -1,
+            ('(11, 5)', '(11, 5)'): -1,
+            ('(5, 8)', '(5, 8)'): -1,
+            ('(5, 11)', '(5, 11)'): -1,
+            ('(8, 11)', '(8, 11)'): -1,
+            ('(11, 8)', '(11, 8)'): -1,
+            ('(11, 5)', '(11, 8)'): 1.01,
+            ('(5, 11)', '(8, 11)'): 1.01,
+            ('(11, 5)', '(8, 5)'): 1.01,
+            ('(5, 8)', '(11, 8)'): 1.01,
+            ('(5, 11)', '(5, 8)'): 1.01,
+            ('(8, 5)', '(8, 11)'): 1.01,
+            ('(11, 5)', '(5, 11)'): 2.01,
+            ('(8, 11)', '(11, 8)'): 2.01,
+            ('(8, 5)', '(5, 8)'): 2.01,
+        }
+        assert q == expected_q
+
+
+class TestCooQubo:
+    EDGES = [(3, 1), (1, 2), (2, 3), (2, 1), (1, 3), (3, 2), (2, 0), (0, 1)]
+
+    def test_same_as_dictionary(self):
+        coo_qubo = qubo.get_coo_qubo(self.EDGES)
+        q = qubo.get_Q(self.EDGES)
+
+        assert list(coo_qubo.to_dict().items()) == list(q.items())
+        assert coo_qubo.get_interactions() == [
+            (u, v) for (u, v) in q if u != v
+        ]
+        bqm = coo_qubo.to_bqm()
+        bqm_expected = dimod.BinaryQuadraticModel.from_qubo(q)
+        assert bqm == bqm_expected
+        assert list(bqm.variables) == list(bqm_expected.variables)
+
+    def test_incremental(self):
+        edges_base = graph.create_graph_hamiltonian_cycles(5, 4)
+        added = [(0, 5), (6, 2)]
+        removed = [(1, 2)]
+        edges_problem = [e for e in edges_base if e not in removed] + added
+
+        coo_qubo = qubo.IncrementalQubo(edges_base).get_coo_qubo(
+            added=added, removed=removed
+        )
+
+        assert coo_qubo.labels == qubo.get_labels(edges_problem)
+        assert coo_qubo.to_bqm() == qubo.get_coo_qubo(edges_problem).to_bqm()
+
+
+class TestIncrementalQubo:
+    def test_add_noise(self):
+        edges_base = graph.create_graph_hamiltonian_cycles(5, 4)
+        edges_problem = graph.add_noise(edges_base, 30, 0)
+
+        q = qubo.IncrementalQubo(edges_base).get_Q(
+            added=edges_problem[len(edges_base):]
+        )
+
+        assert list(q.items()) == list(qubo.get_Q(edges_problem).items())
+
+    def test_add_and_remove(self):
+        edges_base = [(0, 1), (1, 2), (2, 0), (2, 1), (1, 3), (3, 0)]
+        added = [(0, 2), (3, 1), (4, 0)]
+        removed = [(2, 1), (1, 3)]
+        edges_problem = [(0, 1), (1, 2), (2, 0), (3, 0)] + added
+
+        edges, row, col, bias = qubo.IncrementalQubo(edges_base).get_coo(
+            added=added, removed=removed
+        )
+
+        row_expected, col_expected, bias_expected = qubo.get_Q_coo(
+            edges_problem
+        )
+        assert edges.tolist() == [list(e) for e in edges_problem]
+        assert row.tolist() == row_expected.tolist()
+        assert col.tolist() == col_expected.tolist()
+        assert np.allclose(bias, bias_expected)
+
+    def test_invalid_edges(self):
+        incremental_qubo = qubo.IncrementalQubo([(0, 1), (1, 2), (2, 0)])
+        with pytest.raises(ValueError):
+            incremental_qubo.get_coo(removed=[(1, 0)])
+        with pytest.raises(ValueError):
+            incremental_qubo.get_coo(added=[(0, 1)])
+        with pytest.raises(ValueError):
+            incremental_qubo.get_coo(added=[(1, 0), (1, 0)])
+
 
 class TestCalculateEnergyForState:
     def test_individual_max_one_out_one_edge_noise(self):
@@ -86,10 +210,14 @@ class TestCalculateEnergyForState:
         q = qubo.get_Q(edges_problem)
 
         state_triangle = [(0, 1), (1, 2), (2, 0)]
-        energy_state_triangle = qubo.calculate_energy_for_state(q, state_triangle)
+        energy_state_triangle = qubo.calculate_energy_for_state(
+            q, state_triangle
+        )
 
         state_max_one_out_violated = [(0, 1), (1, 2), (2, 0), (2, 3)]
-        energy_state_max_one_out_violated = qubo.calculate_energy_for_state(q, state_max_one_out_violated)
+        energy_state_max_one_out_violated = qubo.calculate_energy_for_state(
+            q, state_max_one_out_violated
+        )
 
         assert energy_state_max_one_out_violated > energy_state_triangle
         assert energy_state_triangle == -3
@@ -100,29 +228,49 @@ class TestCalculateEnergyForState:
         q = qubo.get_Q(edges_problem)
 
         state_triangle = [(0, 1), (1, 2), (2, 0)]
-        energy_state_triangle = qubo.calculate_energy_for_state(q, state_triangle)
+        energy_state_triangle = qubo.calculate_energy_for_state(
+            q, state_triangle
+        )
 
         state_max_one_out_violated_one_edge = [(0, 1), (1, 2), (2, 0), (2, 3)]
-        energy_state_max_one_out_violated_one_edge = qubo.calculate_energy_for_state(q, state_max_one_out_violated_one_edge)
-
-        state_max_one_out_violated_two_edges = [(0, 1), (1, 2), (2, 0), (2, 3), (2, 4)]
-        energy_state_max_one_out_violated_two_edges = qubo.calculate_energy_for_state(q, state_max_one_out_violated_two_edges)
-
-        assert energy_state_max_one_out_violated_one_edge > energy_state_triangle
-        assert energy_state_max_one_out_violated_two_edges > energy_state_triangle
+        energy_state_max_one_out_violated_one_edge = \
+            qubo.calculate_energy_for_state(
+                q, state_max_one_out_violated_one_edge
+            )
+
+        state_max_one_out_violated_two_edges = [
+            (0, 1), (1, 2), (2, 0), (2, 3), (2, 4),
+        ]
+        energy_state_max_one_out_violated_two_edges = \
+            qubo.calculate_energy_for_state(
+                q, state_max_one_out_violated_two_edges
+            )
+
+        assert energy_state_max_one_out_violated_one_edge \
+            > energy_state_triangle
+        assert energy_state_max_one_out_violated_two_edges \
+            > energy_state_triangle
         assert energy_state_triangle == -3
-        assert np.isclose(energy_state_max_one_out_violated_one_edge, -4 + 1.01)
-        assert np.isclose(energy_state_max_one_out_violated_two_edges, -5 + 3 * 1.01)
+        assert np.isclose(
+            energy_state_max_one_out_violated_one_edge, -4 + 1.01
+        )
+        assert np.isclose(
+            energy_state_max_one_out_violated_two_edges, -5 + 3 * 1.01
+        )
 
     def test_individual_max_one_in_one_edge_noise(self):
         edges_problem = [(0, 1), (1, 2), (2, 0), (3, 2)]
         q = qubo.get_Q(edges_problem)
 
         state_triangle = [(0, 1), (1, 2), (2, 0)]
-        energy_state_triangle = qubo.calculate_energy_for_state(q, state_triangle)
+        energy_state_triangle = qubo.calculate_energy_for_state(
+            q, state_triangle
+        )
 
         state_max_one_in_violated = [(0, 1), (1, 2), (2, 0), (3, 2)]
-        energy_state_max_one_in_violated = qubo.calculate_energy_for_state(q, state_max_one_in_violated)
+        energy_state_max_one_in_violated = qubo.calculate_energy_for_state(
+            q, state_max_one_in_violated
+        )
 
         assert energy_state_max_one_in_violated > energy_state_triangle
         assert energy_state_triangle == -3
@@ -133,62 +281,92 @@ class TestCalculateEnergyForState:
         q = qubo.get_Q(edges_problem)
 
         state_triangle = [(0, 1), (1, 2), (2, 0)]
-        energy_state_triangle = qubo.calculate_energy_for_state(q, state_triangle)
+        energy_state_triangle = qubo.calculate_energy_for_state(
+            q, state_triangle
+        )
 
         state_max_one_in_violated_one_edge = [(0, 1), (1, 2), (2, 0), (3, 2)]
-        energy_state_max_one_in_violated_one_edge = qubo.calculate_energy_for_state(q, state_max_one_in_violated_one_edge)
-
-        state_max_one_in_violated_two_edges = [(0, 1), (1, 2), (2, 0), (3, 2), (4, 2)]
-        energy_state_max_one_in_violated_two_edges = qubo.calculate_energy_for_state(q, state_max_one_in_violated_two_edges)
-
-        assert energy_state_max_one_in_violated_one_edge > energy_state_triangle
-        assert energy_state_max_one_in_violated_two_edges > energy_state_triangle
+        energy_state_max_one_in_violated_one_edge = \
+            qubo.calculate_energy_for_state(
+                q, state_max_one_in_violated_one_edge
+            )
+
+        state_max_one_in_violated_two_edges = [
+            (0, 1), (1, 2), (2, 0), (3, 2), (4, 2),
+        ]
+        energy_state_max_one_in_violated_two_edges = \
+            qubo.calculate_energy_for_state(
+                q, state_max_one_in_violated_two_edges
+            )
+
+        assert energy_state_max_one_in_violated_one_edge \
+            > energy_state_triangle
+        assert energy_state_max_one_in_violated_two_edges \
+            > energy_state_triangle
         assert energy_state_triangle == -3
         assert np.isclose(energy_state_max_one_in_violated_one_edge, -4 + 1.01)
-        assert np.isclose(energy_state_max_one_in_violated_two_edges, -5 + 3 * 1.01)
+        assert np.isclose(
+            energy_state_max_one_in_violated_two_edges, -5 + 3 * 1.01
+        )
 
     def test_individual_no_pairs(self):
         edges_problem = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 3)]
         q = qubo.get_Q(edges_problem)
 
         state_triangle = [(0, 1), (1, 2), (2, 0)]
-        energy_state_triangle = qubo.calculate_energy_for_state(q, state_triangle)
+        energy_state_triangle = qubo.calculate_energy_for_state(
+            q, state_triangle
+        )
 
         state_triangle_and_pair = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 3)]
-        energy_state_triangle_and_pair = qubo.calculate_energy_for_state(q, state_triangle_and_pair)
+        energy_state_triangle_and_pair = qubo.calculate_energy_for_state(
+            q, state_triangle_and_pair
+        )
 
         assert energy_state_triangle_and_pair > energy_state_triangle
         assert energy_state_triangle == -3
         assert np.isclose(energy_state_triangle_and_pair, -5 + 2.01)
 
     def test_constraint_max_one_in_and_max_one_out_one_edge_noise(self):
-        edges_problem = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3)]
+        edges_problem = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3),
+        ]
         q = qubo.get_Q(edges_problem)
 
         legit_state = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)]
         energy_legit_state = qubo.calculate_energy_for_state(q, legit_state)
 
-        forbidden_state = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3)]
-        energy_forbidden_state = qubo.calculate_energy_for_state(q, forbidden_state)
+        forbidden_state = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3),
+        ]
+        energy_forbidden_state = qubo.calculate_energy_for_state(
+            q, forbidden_state
+        )
 
         assert energy_forbidden_state > energy_legit_state
         assert energy_legit_state == -6
         assert energy_forbidden_state == -7 + 2 * 1.01
 
     def test_constraint_max_one_in_and_max_one_out_two_edges_noise(self):
-        edges_problem = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5)]
+        edges_problem = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5),
+        ]
         q = qubo.get_Q(edges_problem)
 
         legit_state = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)]
         energy_legit_state = qubo.calculate_energy_for_state(q, legit_state)
 
-        forbidden_state = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5)]
-        energy_forbidden_state = qubo.calculate_energy_for_state(q, forbidden_state)
+        forbidden_state = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5),
+        ]
+        energy_forbidden_state = qubo.calculate_energy_for_state(
+            q, forbidden_state
+        )
 
         assert energy_forbidden_state > energy_legit_state
         assert energy_legit_state == -6
-        # the 1.01 * 3 is for the max one out violated once for 3 possible pairs
-        # of edge and the 1.01 * 2 for the max one in violated twice
+        # the 1.01 * 3 is for the max one out violated once for 3 possible
+        # pairs of edge and the 1.01 * 2 for the max one in violated twice
         assert np.isclose(energy_forbidden_state, -8 + 1.01 * 3 + 1.01 * 2)
 
     def test_constraint_no_pairs_square(self):
@@ -201,7 +379,9 @@ class TestCalculateEnergyForState:
 
         # the two pairs are a forbidden configuration
         forbidden_state = [(1, 2), (2, 1), (3, 0), (0, 3)]
-        energy_forbidden_state = qubo.calculate_energy_for_state(q, forbidden_state)
+        energy_forbidden_state = qubo.calculate_energy_for_state(
+            q, forbidden_state
+        )
 
         assert energy_forbidden_state > energy_legit_state
         assert energy_legit_state == -4
@@ -215,12 +395,49 @@ class TestCalculateEnergyForState:
         energy_legit_state = qubo.calculate_energy_for_state(q, legit_state)
 
         forbidden_state = [(0, 1), (1, 2), (2, 0), (2, 1)]
-        energy_forbidden_state = qubo.calculate_energy_for_state(q, forbidden_state)
+        energy_forbidden_state = qubo.calculate_energy_for_state(
+            q, forbidden_state
+        )
 
         assert energy_forbidden_state > energy_legit_state
         assert energy_legit_state == -3
-        # there is a 1.01 for max one in, a 1.01 for max one in, a 1.01 for no pairs
+        # there is a 1.01 for max one in, a 1.01 for max one in, a 1.01 for
+        # no pairs
         assert np.isclose(energy_forbidden_state, -4 + 1.01 + 1.01 + 2.01)
 
 
+class TestCalculateEnergies:
+    def test_batch_matches_single_state(self):
+        edges_problem = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5),
+        ]
+        q = qubo.get_Q(edges_problem)
+        q_sparse = qubo.get_Q_sparse(edges_problem)
+
+        states = [
+            [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)],
+            [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (2, 5)],
+            [(2, 3), (2, 5)],
+            [],
+        ]
+        samples = np.array([
+            [edge in state for edge in edges_problem] for state in states
+        ])
+        energies = qubo.calculate_energies(q_sparse, samples)
+
+        expected_energies = [
+            qubo.calculate_energy_for_state(q, state) for state in states
+        ]
+        assert np.allclose(energies, expected_energies)
+        assert np.allclose(
+            energies, [-6, -8 + 1.01 * 3 + 1.01 * 2, -2 + 1.01, 0]
+        )
+
+    def test_sparse_samples(self):
+        edges_problem = [(0, 1), (1, 2), (2, 0), (2, 1)]
+        q_sparse = qubo.get_Q_sparse(edges_problem)
+        samples = sparse.csr_matrix(np.array([[1, 1, 1, 0], [1, 1, 1, 1]]))
+
+        energies = qubo.calculate_energies(q_sparse, samples)
 
+        assert np.allclose(energies, [-3, -4 + 1.01 + 1.01 + 2.01])
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from quantumglare.common import result_store, utils
+
+
+INPUT_GRAPH = [(1, 2), (2, 3), (3, 1), (3, 2)]
+
+
+def _get_output(tag, seed_embedding):
+    record = {column: 0 for column in utils.OUTPUT_COLUMNS}
+    record.update({
+        'tag': tag,
+        'seed_embedding': seed_embedding,
+        'backend': 'exact',
+        'embedding_cache_hit': None,
+        'solution_frequency': 0.8,
+        'runs_to_solution': None,
+        'input_graph': INPUT_GRAPH,
+        'solutions': [[(1, 2), (2, 3), (3, 1)]],
+        'dwave_solution_df': pd.DataFrame({
+            'state': [np.array([0, 1, 2]), np.array([1, 3])],
+            'energy': [-3.0, -1.98],
+            'absolute_frequency': [8, 2],
+            'relative_frequency': [0.8, 0.2],
+            'is_valid': [True, False],
+        }),
+        'embedding_context': 'null',
+    })
+    return [[record[column] for column in utils.OUTPUT_COLUMNS]]
+
+
+class TestResultStore:
+    def test_round_trip(self, tmp_path):
+        result_store.write_output(_get_output('tag_a', 0), str(tmp_path))
+
+        df = result_store.read_results(str(tmp_path))
+
+        assert df['tag'].tolist() == ['tag_a']
+        assert df['solution_frequency'].tolist() == [0.8]
+        assert df['input_graph'].tolist() == [INPUT_GRAPH]
+        assert df['solutions'].tolist() == [[[(1, 2), (2, 3), (3, 1)]]]
+        states_df = result_store.get_states_df(
+            df['states'].values[0], df['input_graph'].values[0]
+        )
+        assert states_df['state'].tolist() == [
+            [(1, 2), (2, 3), (3, 1)], [(2, 3), (3, 2)]
+        ]
+        assert states_df['is_valid'].tolist() == [True, False]
+
+    def test_selected_columns_and_tags(self, tmp_path):
+        for tag, seed in [('tag_a', 0), ('tag_a', 1), ('tag_b', 0)]:
+            result_store.write_output(_get_output(tag, seed), str(tmp_path))
+
+        df = result_store.read_results(
+            str(tmp_path), columns=['tag', 'seed_embedding'], tags=['tag_a']
+        )
+
+        assert df.columns.tolist() == ['tag', 'seed_embedding']
+        assert sorted(df['seed_embedding'].tolist()) == [0, 1]
+
+    def test_merge_stores(self, tmp_path):
+        for k in range(2):
+            result_store.write_output(
+                _get_output(f'tag_{k}', k), str(tmp_path / f'shard_{k}')
+            )
+
+        result_store.merge_stores(
+            [str(tmp_path / f'shard_{k}') for k in range(2)],
+            str(tmp_path / 'merged'),
+        )
+
+        df = result_store.read_results(str(tmp_path / 'merged'))
+        assert sorted(df['tag'].tolist()) == ['tag_0', 'tag_1']
+
+    def test_completed_keys(self, tmp_path):
+        assert result_store.get_completed_keys(str(tmp_path / 'none')) == set()
+        for tag, seed in [('tag_a', 0), ('tag_a', 1), ('tag_b', 0)]:
+            result_store.write_output(_get_output(tag, seed), str(tmp_path))
+
+        assert result_store.get_completed_keys(str(tmp_path)) == {
+            ('tag_a', 0, 0), ('tag_a', 0, 1), ('tag_b', 0, 0)
+        }
+        assert result_store.get_run_key(
+            {'tag': 'tag_a', 'seed_input_graph': 0, 'seed_embedding': 1}
+        ) in result_store.get_completed_keys(str(tmp_path))
+
+    def test_interrupted_write_is_skipped(self, tmp_path):
+        result_store.write_output(_get_output('tag_a', 0), str(tmp_path))
+        # partial file left by a write interrupted before the rename
+        with open(tmp_path / 'tag=tag_a' / '.interrupted.parquet.tmp',
+                  'wb') as f:
+            f.write(b'PAR1')
+
+        df = result_store.read_results(str(tmp_path))
+
+        assert df['tag'].tolist() == ['tag_a']
+
+    def test_files_without_new_columns(self, tmp_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        result_store.write_output(_get_output('tag_a', 0), str(tmp_path))
+        # file written before the QPU timing columns were added, read first
+        table = pq.read_table(str(tmp_path / 'tag=tag_a'))
+        old_columns = [
+            c for c in table.column_names if not c.startswith('qpu_')
+        ]
+        pq.write_table(
+            table.select(old_columns).set_column(
+                old_columns.index('seed_embedding'), 'seed_embedding',
+                pa.array([1], type=pa.int64()),
+            ),
+            str(tmp_path / 'tag=tag_a' / '0.parquet'),
+        )
+
+        df = result_store.read_results(
+            str(tmp_path), columns=['seed_embedding', 'qpu_access_time']
+        ).sort_values(by='seed_embedding')
+
+        assert df['seed_embedding'].tolist() == [0, 1]
+        assert df['qpu_access_time'].isna().tolist() == [False, True]
@@ -1,3 +1,8 @@
+import json
+import random
+
+import numpy as np
+import pandas as pd
 import pytest
 
 from quantumglare.common import graph, utils
@@ -11,6 +16,23 @@ class TestConvertListOfStringsToListOfLists:
         assert output == [(12, 5), (5, 12)]
 
 
+class TestRenderStatesDf:
+    def test(self):
+        states_df = pd.DataFrame({
+            'state': [np.array([0, 2]), np.array([], dtype=np.int32)],
+            'energy': [-2.0, 0.0],
+        })
+
+        rendered = utils.render_states_df(
+            states_df, np.array([(12, 5), (5, 7), (7, 12)])
+        )
+
+        assert json.loads(rendered) == [
+            {'state': "['(12, 5)', '(7, 12)']", 'energy': -2.0},
+            {'state': '[]', 'energy': 0.0},
+        ]
+
+
 class TestGetVertices:
     def test(self):
         edges = [(0, 1), (1, 2), (2, 0), (3, 4)]
@@ -19,6 +41,56 @@ class TestGetVertices:
         assert output == expected_output
 
 
+class TestDiGraph:
+    def test_degrees(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 1)]
+        digraph = graph.DiGraph(edges)
+        assert digraph.n_vertices == 4
+        assert digraph.n_edges == 5
+        assert digraph.out_degree(2) == 2
+        assert digraph.in_degree(1) == 2
+        assert digraph.out_degree(7) == 0
+        assert digraph.out_degrees.tolist() == [1, 1, 2, 1]
+        assert digraph.in_degrees.tolist() == [1, 2, 1, 1]
+
+    def test_edges_of_vertex(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 1)]
+        digraph = graph.DiGraph(edges)
+        assert digraph.edges_out(2).tolist() == [2, 3]
+        assert digraph.edges_in(1).tolist() == [0, 4]
+        assert digraph.edges_of(1).tolist() == [0, 1, 4]
+        assert digraph.edges_of(7).tolist() == []
+
+    def test_reverse_edges(self):
+        edges = [(0, 1), (1, 2), (2, 1), (2, 0)]
+        digraph = graph.DiGraph(edges)
+        assert digraph.reverse_edges.tolist() == [-1, 2, 1, -1]
+
+    def test_non_contiguous_vertices(self):
+        edges = [(10, 30), (30, 20), (20, 10)]
+        digraph = graph.DiGraph(edges)
+        assert digraph.vertices.tolist() == [10, 20, 30]
+        assert digraph.edges_out(30).tolist() == [1]
+        assert digraph.to_list() == edges
+
+    def test_helpers_accept_digraph(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 1)]
+        digraph = graph.DiGraph(edges)
+        assert graph.get_vertices(digraph) == [0, 1, 2, 3]
+        assert graph.get_edges_out_for_vertex(digraph, 2) == [(2, 0), (2, 3)]
+        assert graph.get_edges_in_for_vertex(digraph, 1) == [(0, 1), (3, 1)]
+        assert graph.get_edges_for_vertex(digraph, 3) == [(2, 3), (3, 1)]
+
+
+class TestGetEdgesForVertex:
+    def test(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 1)]
+        assert graph.get_edges_out_for_vertex(edges, 2) == [(2, 0), (2, 3)]
+        assert graph.get_edges_in_for_vertex(edges, 1) == [(0, 1), (3, 1)]
+        assert graph.get_edges_for_vertex(edges, 1) == [(0, 1), (1, 2), (3, 1)]
+        assert graph.get_edges_for_vertex(edges, 5) == []
+
+
 class TestIsValid:
     def test_true(self):
         edges_input = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (0, 3)]
@@ -61,3 +133,181 @@ class TestIsValid:
         edges_output = [(0, 1), (1, 0), (3, 4), (4, 5), (5, 3)]
         actual_is_legit_value = graph.is_valid(edges_output, edges_input)
         assert actual_is_legit_value is False
+
+    def test_false_self_loop(self):
+        edges_input = [(0, 0), (1, 2), (2, 3), (3, 1)]
+        edges_output = [(0, 0), (1, 2), (2, 3), (3, 1)]
+        actual_is_legit_value = graph.is_valid(edges_output, edges_input)
+        assert actual_is_legit_value is False
+
+    def test_false_edge_not_in_input(self):
+        edges_input = [(0, 1), (1, 2), (2, 0), (0, 2)]
+        edges_output = [(0, 2), (2, 1), (1, 0)]
+        actual_is_legit_value = graph.is_valid(edges_output, edges_input)
+        assert actual_is_legit_value is False
+
+
+class TestIsValidBatch:
+    def test(self):
+        edges_input = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (0, 3),
+                       (2, 1)]
+        samples = [
+            # two triangles
+            [1, 1, 1, 1, 1, 1, 0, 0],
+            # max one out not respected
+            [1, 1, 1, 1, 1, 1, 1, 0],
+            # not all vertices covered
+            [1, 1, 1, 0, 0, 0, 0, 0],
+            # cycle of length two
+            [0, 1, 0, 1, 1, 1, 0, 1],
+            # nothing selected
+            [0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        output = graph.is_valid_batch(np.array(samples, dtype=bool), edges_input)
+        assert output.tolist() == [True, False, False, False, False]
+
+    def test_digraph_input(self):
+        edges_input = [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2), (2, 0)]
+        samples = np.array([
+            [1, 1, 1, 1, 0, 0],
+            [1, 1, 0, 0, 0, 1],
+        ], dtype=bool)
+        output = graph.is_valid_batch(samples, graph.DiGraph(edges_input))
+        assert output.tolist() == [True, False]
+
+
+class TestGetComponents:
+    def test(self):
+        edges = [(0, 1), (1, 0), (5, 6), (6, 7), (7, 5), (2, 1)]
+        n_components, edge_components = graph.get_components(edges)
+        assert n_components == 2
+        assert edge_components.tolist() == [0, 0, 1, 1, 1, 0]
+
+
+class TestSaveGraph:
+    def test_round_trip(self, tmp_path):
+        filename = str(tmp_path / 'graph.npy')
+        edges = graph.create_graph_hamiltonian_cycles(3, 4)
+
+        graph.save_graph(filename, edges, metadata={'n_cycles': 3})
+
+        loaded = graph.load_graph(filename)
+        assert isinstance(loaded, np.memmap)
+        assert loaded.tolist() == [list(edge) for edge in edges]
+        assert graph.load_graph_metadata(filename) == {'n_cycles': 3}
+
+    def test_invalid_file(self, tmp_path):
+        filename = str(tmp_path / 'graph.npy')
+        np.save(filename, np.zeros((3, 3), dtype=np.int64))
+        with pytest.raises(ValueError):
+            graph.load_graph(filename)
+        assert graph.load_graph_metadata(filename) == {}
+
+
+def _add_noise_reference(edges, n_edges_to_add, seed):
+    # the original implementation of graph.add_noise
+    vertices = list(set(sum([list(e) for e in edges], [])))
+    edges_noise = []
+    random.seed(seed)
+    while len(edges_noise) < n_edges_to_add:
+        vertex_0 = random.choice(vertices)
+        other_vertices = list(set(vertices) - {vertex_0})
+        vertex_1 = random.choice(other_vertices)
+        edge_temp = (vertex_0, vertex_1)
+        if edge_temp not in (edges + edges_noise):
+            edges_noise += [edge_temp]
+    return edges + edges_noise
+
+
+class TestCreateGraphHamiltonianCycles:
+    def test(self):
+        edges = graph.create_graph_hamiltonian_cycles(2, 3)
+        assert edges == [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)]
+
+
+class TestAddNoise:
+    @pytest.mark.parametrize('seed', [0, 1, 2])
+    def test_same_as_reference(self, seed):
+        edges = graph.create_graph_hamiltonian_cycles(30, 4)
+        assert graph.add_noise(edges, 40, seed) == _add_noise_reference(
+            edges, 40, seed
+        )
+
+    def test_same_as_reference_any_labels(self):
+        edges = [(10, 20), (20, 35), (35, 10), (7, 99), (99, 7)]
+        for seed in range(5):
+            assert graph.add_noise(edges, 8, seed) == _add_noise_reference(
+                edges, 8, seed
+            )
+
+    @pytest.mark.parametrize('seed', [0, 1, 2])
+    def test_same_as_reference_relabelled(self, seed):
+        labels = random.Random(0).sample(range(10 ** 6), 120)
+        edges = [
+            (labels[u], labels[v])
+            for u, v in graph.create_graph_hamiltonian_cycles(30, 4)
+        ]
+        # the set of vertices is not in sorted order
+        assert list(set(labels)) != sorted(labels)
+        assert graph.add_noise(edges, 40, seed) == _add_noise_reference(
+            edges, 40, seed
+        )
+
+    def test_global_state_untouched(self):
+        random.seed(0)
+        expected = random.random()
+        random.seed(0)
+        graph.add_noise([(0, 1), (1, 2), (2, 0)], 2, 1)
+        assert random.random() == expected
+
+    def test_too_many_edges(self):
+        with pytest.raises(ValueError):
+            graph.add_noise([(0, 1), (1, 2), (2, 0)], 4, 0)
+
+
+class TestGenerateCycles:
+    def test_mixed_lengths(self):
+        edges = graph.generate_cycles([3, 2, 4])
+        assert edges.tolist() == [
+            [0, 1], [1, 2], [2, 0], [3, 4], [4, 3],
+            [5, 6], [6, 7], [7, 8], [8, 5],
+        ]
+
+    def test_relabel(self):
+        edges = graph.generate_cycles([3, 4, 5], seed=0, relabel=True)
+        assert sorted(np.unique(edges).tolist()) == list(range(12))
+        assert graph.is_valid(edges.tolist(), edges.tolist())
+        assert np.array_equal(
+            edges, graph.generate_cycles([3, 4, 5], seed=0, relabel=True)
+        )
+
+
+class TestGenerateNoiseEdges:
+    def test_new_distinct_edges(self):
+        edges = graph.generate_cycles([4] * 50)
+        noise = graph.generate_noise_edges(edges, 1000, seed=0)
+
+        all_edges = np.concatenate([edges, noise])
+        assert noise.shape == (1000, 2)
+        assert len(np.unique(all_edges, axis=0)) == len(all_edges)
+        assert not np.any(noise[:, 0] == noise[:, 1])
+        assert set(noise.ravel().tolist()) <= set(range(200))
+
+    def test_all_available_edges(self):
+        edges = graph.generate_cycles([3])
+        noise = graph.generate_noise_edges(edges, 3, seed=0)
+        assert sorted(noise.tolist()) == [[0, 2], [1, 0], [2, 1]]
+
+    def test_seed(self):
+        edges = graph.generate_cycles([4] * 50)
+        noise = graph.generate_noise_edges(edges, 10, seed=1)
+        assert np.array_equal(
+            noise, graph.generate_noise_edges(edges, 10, seed=1)
+        )
+        assert not np.array_equal(
+            noise, graph.generate_noise_edges(edges, 10, seed=2)
+        )
+
+    def test_too_many_edges(self):
+        with pytest.raises(ValueError):
+            graph.generate_noise_edges([(0, 1), (1, 2), (2, 0)], 4)
@@ -0,0 +1,243 @@
+import json
+import sys
+
+import pandas as pd
+import pytest
+
+from quantumglare.common import result_store, utils
+from quantumglare.results import generate_raw_data
+from quantumglare.solvers import quantum_solver
+
+
+def _get_output(tag):
+    record = {column: 0 for column in utils.OUTPUT_COLUMNS}
+    record.update({
+        'tag': tag,
+        'backend': 'exact',
+        'embedding_cache_hit': None,
+        'input_graph': [],
+        'solutions': [],
+        'dwave_solution_df': pd.DataFrame({'state': []}),
+        'embedding_context': 'null',
+    })
+    return [[record[column] for column in utils.OUTPUT_COLUMNS]]
+
+
+class TestGetJobs:
+    def test_p_noise(self):
+        jobs = generate_raw_data.get_jobs(
+            n_cycles=10, cycle_length=4, p_noise=1e-3, seeds_embedding=[0, 1]
+        )
+        assert [j['seed_embedding'] for j in jobs] == [0, 1]
+        assert [j['seed_input_graph'] for j in jobs] == [0, 1]
+        assert all(j['n_edges_noise'] == 2 for j in jobs)
+        assert all(
+            j['tag'] == 'n_cycles_10_cycle_length_4_n_edges_noise_2'
+            for j in jobs
+        )
+
+    def test_noise_not_set(self):
+        with pytest.raises(Exception):
+            generate_raw_data.get_jobs(n_cycles=10, cycle_length=4)
+
+
+class TestSweep:
+    SWEEP = {
+        'backend': 'exact',
+        'seeds_embedding': [0, 1],
+        'solver_params': {
+            'num_reads': 10,
+            'anneal_time': 20,
+            'pause_duration': 0,
+            'pause_start': 0.4,
+        },
+        'grids': [
+            {'cycle_length': 3, 'n_cycles': [4, 2], 'n_edges_noise': [0]},
+            {'cycle_length': 4, 'n_cycles': [1], 'p_noise': [0]},
+        ],
+    }
+
+    def test_read_sweep(self, tmp_path):
+        filename = str(tmp_path / 'sweep.json')
+        with open(filename, 'w') as f:
+            json.dump(self.SWEEP, f)
+        assert generate_raw_data.read_sweep(filename) == self.SWEEP
+
+        with open(filename, 'w') as f:
+            json.dump({**self.SWEEP, 'seeds': [0]}, f)
+        with pytest.raises(ValueError):
+            generate_raw_data.read_sweep(filename)
+
+    def test_get_sweep_jobs(self):
+        jobs = generate_raw_data.get_sweep_jobs(self.SWEEP)
+
+        assert [(j['n_cycles'], j['seed_embedding']) for j in jobs] == [
+            (4, 0), (4, 1), (2, 0), (2, 1), (1, 0), (1, 1)
+        ]
+        assert all(j['backend'] == 'exact' for j in jobs)
+        assert all(j['num_reads'] == 10 for j in jobs)
+
+    def test_article_sweep(self):
+        jobs = generate_raw_data.get_article_jobs(seeds_embedding=[0])
+        assert len(jobs) == 59
+        assert all('backend' not in j for j in jobs)
+        assert all(j['anneal_time'] == 200 for j in jobs)
+
+    def test_order_jobs(self):
+        jobs = generate_raw_data.order_jobs(
+            generate_raw_data.get_sweep_jobs(self.SWEEP)
+        )
+
+        assert [(j['n_cycles'], j['seed_embedding']) for j in jobs] == [
+            (1, 0), (2, 0), (4, 0), (1, 1), (2, 1), (4, 1)
+        ]
+
+    def test_plan_jobs(self):
+        jobs = generate_raw_data.get_sweep_jobs(self.SWEEP)
+        jobs[0] = {**jobs[0], 'num_reads': 1000}
+        time_ = generate_raw_data.get_estimated_time(jobs[1])
+
+        planned, left_out, estimated_time, spent_time = \
+            generate_raw_data.plan_jobs(jobs, budget=3.5 * time_)
+
+        assert planned == jobs[1:4]
+        assert left_out == [jobs[0]] + jobs[4:]
+        assert estimated_time == pytest.approx(3 * time_)
+        assert spent_time == 0.0
+        assert generate_raw_data.plan_jobs(jobs)[0] == jobs
+
+    def test_plan_jobs_completed(self):
+        jobs = generate_raw_data.get_sweep_jobs(self.SWEEP)
+        time_ = generate_raw_data.get_estimated_time(jobs[0])
+        completed_runs = {
+            result_store.get_run_key(jobs[0]): 1e6 * time_ / 2,
+            result_store.get_run_key(jobs[1]): None,
+        }
+
+        planned, left_out, estimated_time, spent_time = \
+            generate_raw_data.plan_jobs(
+                jobs, budget=3.5 * time_, completed_runs=completed_runs
+            )
+
+        assert planned == jobs[2:4]
+        assert left_out == jobs[4:]
+        assert estimated_time == pytest.approx(2 * time_)
+        assert spent_time == pytest.approx(1.5 * time_)
+
+
+class TestGetShard:
+    def test_shards_partition_the_jobs(self):
+        jobs = generate_raw_data.get_article_jobs(seeds_embedding=[0, 1])
+        shards = [generate_raw_data.get_shard(jobs, k, 3) for k in range(3)]
+        assert sorted(sum(shards, []), key=jobs.index) == jobs
+        assert max(len(s) for s in shards) - min(len(s) for s in shards) <= 1
+
+    def test_invalid_index(self):
+        with pytest.raises(ValueError):
+            generate_raw_data.get_shard([], 3, 3)
+
+
+class TestMergeShards:
+    def test(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for k in range(2):
+            result_store.write_output(
+                _get_output(f'tag_{k}'),
+                generate_raw_data.get_shard_directory(k, 2),
+            )
+
+        generate_raw_data.merge_shards(2, directory='merged')
+
+        merged_df = result_store.read_results('merged', columns=['tag'])
+        assert sorted(merged_df['tag'].tolist()) == ['tag_0', 'tag_1']
+
+    def test_missing_shard(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with pytest.raises(FileNotFoundError):
+            generate_raw_data.merge_shards(2, directory='merged')
+
+
+class TestRunJobs:
+    def test_resume(self, tmp_path, monkeypatch):
+        n_solved = []
+        solve = quantum_solver.solve
+
+        def solve_counted(**kwargs):
+            n_solved.append(1)
+            return solve(**kwargs)
+
+        monkeypatch.setattr(quantum_solver, 'solve', solve_counted)
+        jobs = [
+            {**params, 'backend': 'exact'}
+            for params in generate_raw_data.get_jobs(
+                n_cycles=2, cycle_length=3, n_edges_noise=0,
+                seeds_embedding=[0, 1, 2],
+            )
+        ]
+        directory = str(tmp_path / 'store')
+
+        generate_raw_data.run_jobs(jobs[:2], directory)
+        generate_raw_data.run_jobs(jobs, directory)
+
+        assert len(n_solved) == 3
+        df = result_store.read_results(directory, columns=['seed_embedding'])
+        assert sorted(df['seed_embedding'].tolist()) == [0, 1, 2]
+
+        generate_raw_data.run_jobs(jobs[:1], directory, resume=False)
+        assert len(n_solved) == 4
+
+    def test_budget(self, tmp_path):
+        jobs = [
+            {**params, 'backend': 'exact'}
+            for params in generate_raw_data.get_jobs(
+                n_cycles=2, cycle_length=3, n_edges_noise=0,
+                seeds_embedding=[0, 1, 2],
+            )
+        ]
+        directory = str(tmp_path / 'store')
+
+        generate_raw_data.run_jobs(
+            jobs,
+            directory,
+            budget=2.5 * generate_raw_data.get_estimated_time(jobs[0]),
+        )
+
+        df = result_store.read_results(directory, columns=['seed_embedding'])
+        assert sorted(df['seed_embedding'].tolist()) == [0, 1]
+
+
+class TestMain:
+    def _main(self, monkeypatch, *args):
+        monkeypatch.setattr(sys, 'argv', ['generate_raw_data', *args])
+        generate_raw_data.main()
+
+    def _get_n_runs(self, n_shards):
+        return sum(
+            len(result_store.get_completed_keys(
+                generate_raw_data.get_shard_directory(k, n_shards)
+            ))
+            for k in range(n_shards)
+        )
+
+    def test_budget_over_shards_and_resume(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with open('sweep.json', 'w') as f:
+            json.dump(TestSweep.SWEEP, f)
+        time_ = generate_raw_data.get_estimated_time(
+            generate_raw_data.get_sweep_jobs(TestSweep.SWEEP)[0]
+        )
+        args = ['--sweep', 'sweep.json', '--n-shards', '2',
+                '--budget', str(3.5 * time_)]
+
+        for shard in range(2):
+            self._main(monkeypatch, *args, '--shard', str(shard))
+        assert self._get_n_runs(2) == 3
+
+        for shard in range(2):
+            self._main(monkeypatch, *args, '--shard', str(shard))
+        assert self._get_n_runs(2) == 3
+
+        args[-1] = str(5.5 * time_)
+        for shard in range(2):
+            self._main(monkeypatch, *args, '--shard', str(shard))
+        assert self._get_n_runs(2) == 5
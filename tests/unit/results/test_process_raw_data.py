@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantumglare.common import result_store, utils
+from quantumglare.results import process_raw_data
+
+
+def _get_raw_df(tags, seeds):
+    rows = []
+    for i, tag in enumerate(tags):
+        for seed in seeds:
+            rows.append({
+                'tag': tag,
+                'n_cycles': 10 * (i + 1),
+                'cycle_length': 4,
+                'n_vertices': 40 * (i + 1),
+                'p_noise': 0.0,
+                'n_edges_noise': i,
+                'seed_input_graph': seed,
+                'seed_embedding': seed,
+                'anneal_time': 200,
+                'pause_duration': 100,
+                'num_reads': 100,
+                'qpu_anneal_time_per_sample': 300.0,
+                'qpu_access_time': 10000.0 + 100 * 360.0,
+                'time_overall_computation': 2.0 + seed,
+                'solution_frequency': ((seed + 1) * (i + 3) % 7) / 7,
+            })
+    return pd.DataFrame(rows)
+
+
+def _write_raw_df(raw_df, directory):
+    for _, row in raw_df.iterrows():
+        record = {column: 0 for column in utils.OUTPUT_COLUMNS}
+        record.update(row.to_dict())
+        record.update({
+            'backend': 'exact',
+            'embedding_cache_hit': None,
+            'input_graph': [],
+            'solutions': [],
+            'dwave_solution_df': pd.DataFrame({'state': []}),
+            'embedding_context': 'null',
+        })
+        result_store.write_output(
+            [[record[column] for column in utils.OUTPUT_COLUMNS]], directory
+        )
+
+
+class TestGetProcessedDf:
+    def test_matches_per_tag_computation(self):
+        raw_df = _get_raw_df(['tag_b', 'tag_a'], seeds=range(5))
+
+        processed_df = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        )
+
+        assert processed_df['tag'].tolist() == ['tag_b', 'tag_a']
+        for _, row in processed_df.iterrows():
+            freqs = raw_df[raw_df['tag'] == row['tag']].solution_frequency
+            p_sol_avg = freqs.mean()
+            p_sol_err = freqs.std() / np.sqrt(len(freqs))
+            tts_avg = 1e-3 * 300 * np.log(1 - 0.99) / np.log(1 - p_sol_avg)
+            assert row['n_observations'] == len(freqs)
+            assert row['p_sol_avg'] == pytest.approx(p_sol_avg)
+            assert row['p_sol_err'] == pytest.approx(p_sol_err)
+            assert row['tts_avg'] == pytest.approx(tts_avg)
+
+    def test_tts_variants(self):
+        raw_df = _get_raw_df(['tag_a'], seeds=range(4))
+        # runs of a backend without QPU timing
+        raw_df.loc[[0, 1], ['qpu_anneal_time_per_sample',
+                            'qpu_access_time']] = np.nan
+
+        row = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        ).iloc[0]
+
+        assert row['n_qpu_observations'] == 2
+        assert row['tts_anneal_avg'] == pytest.approx(row['tts_avg'])
+        assert row['tts_qpu_avg'] == pytest.approx(row['tts_avg'] * 460 / 300)
+        # 3.5 s per run on average, over 100 reads
+        assert row['tts_wall_avg'] == pytest.approx(
+            row['tts_avg'] * 35000 / 300
+        )
+        assert row['tts_wall_err'] == pytest.approx(
+            row['tts_err'] * 35000 / 300
+        )
+
+    def test_tts_partial_qpu_timing(self):
+        raw_df = _get_raw_df(['tag_a'], seeds=range(4))
+        raw_df.loc[[0, 1], ['qpu_anneal_time_per_sample',
+                            'qpu_access_time']] = np.nan
+        # a run reporting the access time but not the anneal time
+        raw_df.loc[2, 'qpu_anneal_time_per_sample'] = np.nan
+
+        row = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        ).iloc[0]
+
+        assert row['n_qpu_observations'] == 1
+        assert row['tts_anneal_avg'] == pytest.approx(row['tts_avg'])
+        assert row['tts_qpu_avg'] == pytest.approx(row['tts_avg'] * 460 / 300)
+
+    def test_tts_without_qpu_timing(self):
+        raw_df = _get_raw_df(['tag_a'], seeds=range(4)).assign(
+            qpu_anneal_time_per_sample=np.nan, qpu_access_time=np.nan
+        )
+
+        row = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        ).iloc[0]
+
+        assert np.isnan(row['tts_anneal_avg'])
+        assert np.isnan(row['tts_qpu_avg'])
+        assert row['tts_wall_avg'] > 0
+
+    def test_tts_without_schedule(self):
+        # the runs of the classical backend
+        raw_df = _get_raw_df(['tag_a'], seeds=range(4)).assign(
+            anneal_time=np.nan,
+            pause_duration=np.nan,
+            qpu_anneal_time_per_sample=np.nan,
+            qpu_access_time=np.nan,
+        )
+
+        row = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        ).iloc[0]
+
+        assert np.isnan(row['tts_avg'])
+        assert np.isnan(row['tts_err'])
+        assert row['tts_wall_avg'] > 0
+
+    def test_combine_statistics(self):
+        raw_df = _get_raw_df(['tag_a', 'tag_b'], seeds=range(6))
+        statistics_df = process_raw_data.combine_statistics([
+            process_raw_data.get_statistics(raw_df.iloc[:4]),
+            process_raw_data.get_statistics(raw_df.iloc[4:]),
+        ])
+
+        pd.testing.assert_frame_equal(
+            process_raw_data.get_processed_df(statistics_df),
+            process_raw_data.get_processed_df(
+                process_raw_data.get_statistics(raw_df)
+            ),
+        )
+
+    def test_duplicates(self):
+        raw_df = _get_raw_df(['tag_a'], seeds=[0, 0])
+        with pytest.raises(AssertionError):
+            process_raw_data.process_raw_data(raw_df, 'processed_data.csv')
+
+
+class TestUpdateProcessedData:
+    def test_incremental(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        raw_df = _get_raw_df(['tag_a', 'tag_b'], seeds=range(4))
+        _write_raw_df(raw_df.iloc[:3], 'data/raw_data')
+
+        n_runs = process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv'
+        )
+        assert n_runs == 3
+
+        _write_raw_df(raw_df.iloc[3:], 'data/raw_data')
+        n_runs = process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv', batch_size=2
+        )
+        assert n_runs == 5
+
+        processed_df = pd.read_csv('data/processed_data.csv')
+        expected_df = process_raw_data.get_processed_df(
+            process_raw_data.get_statistics(raw_df)
+        )
+        assert processed_df['tag'].tolist() == ['tag_a', 'tag_b']
+        assert processed_df['n_observations'].tolist() == [4, 4]
+        np.testing.assert_allclose(
+            processed_df['p_sol_err'], expected_df['p_sol_err']
+        )
+        assert process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv'
+        ) == 0
+
+    def test_path_spellings(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        raw_df = _get_raw_df(['tag_a', 'tag_b'], seeds=range(3))
+        _write_raw_df(raw_df, 'data/raw_data')
+        process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv'
+        )
+        processed_df = pd.read_csv('data/processed_data.csv')
+
+        for directory in ['./data/raw_data', str(tmp_path / 'data/raw_data')]:
+            n_runs = process_raw_data.update_processed_data(
+                directory, 'processed_data.csv'
+            )
+            assert n_runs == 0
+            pd.testing.assert_frame_equal(
+                pd.read_csv('data/processed_data.csv'), processed_df
+            )
+
+    def test_other_store(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        _write_raw_df(_get_raw_df(['tag_a'], seeds=range(3)), 'data/store_a')
+        _write_raw_df(_get_raw_df(['tag_b'], seeds=range(2)), 'data/store_b')
+        process_raw_data.update_processed_data('data/store_a', 'processed.csv')
+
+        n_runs = process_raw_data.update_processed_data(
+            'data/store_b', 'processed.csv'
+        )
+
+        assert n_runs == 2
+        processed_df = pd.read_csv('data/processed.csv')
+        assert processed_df['tag'].tolist() == ['tag_b']
+        assert processed_df['n_observations'].tolist() == [2]
+
+    def test_recomputed_without_qpu_statistics(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        raw_df = _get_raw_df(['tag_a'], seeds=range(3))
+        _write_raw_df(raw_df, 'data/raw_data')
+        process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv'
+        )
+        # processed data written before the QPU timing was processed
+        processed_df = pd.read_csv('data/processed_data.csv')
+        processed_df.drop(columns=['t_qpu_sum']).to_csv(
+            'data/processed_data.csv', index=False
+        )
+
+        n_runs = process_raw_data.update_processed_data(
+            'data/raw_data', 'processed_data.csv'
+        )
+
+        assert n_runs == 3
+        pd.testing.assert_frame_equal(
+            pd.read_csv('data/processed_data.csv'), processed_df
+        )
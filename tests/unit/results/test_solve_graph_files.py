@@ -0,0 +1,91 @@
+import json
+import os
+
+from quantumglare.common import graph, result_store
+from quantumglare.results import process_raw_data, solve_graph_files
+
+
+SOLVER_PARAMS = {
+    'backend': 'exact',
+    'num_reads': 10,
+    'anneal_time': 20,
+    'pause_duration': 0,
+    'pause_start': 0.4,
+}
+
+
+class TestSolveGraphFiles:
+    def test(self, tmp_path):
+        graph_directory = tmp_path / 'graphs'
+        graph_directory.mkdir()
+        graph.save_graph(
+            str(graph_directory / 'square.npy'),
+            [(0, 1), (1, 2), (2, 3), (3, 0), (2, 1), (0, 3)],
+        )
+        graph.save_graph(
+            str(graph_directory / 'triangles.npy'),
+            graph.create_graph_hamiltonian_cycles(2, 3),
+            metadata={'tag': 'two_triangles', 'n_cycles': 2},
+        )
+        filenames = solve_graph_files.get_graph_filenames(
+            str(graph_directory)
+        )
+
+        solve_graph_files.solve_graph_files(
+            filenames,
+            SOLVER_PARAMS,
+            [0, 1],
+            str(tmp_path / 'store'),
+            metrics_filename=str(tmp_path / 'metrics.jsonl'),
+        )
+
+        df = result_store.read_results(
+            str(tmp_path / 'store'),
+            columns=['tag', 'n_cycles', 'n_vertices', 'solution_frequency'],
+        ).sort_values(by='tag')
+        assert df['tag'].tolist() == ['square'] * 2 + ['two_triangles'] * 2
+        assert df['n_vertices'].tolist() == [4, 4, 6, 6]
+        assert df['n_cycles'].fillna(-1).tolist() == [-1, -1, 2, 2]
+        assert df['solution_frequency'].tolist() == [1.0] * 4
+
+        with open(tmp_path / 'metrics.jsonl') as f:
+            lines = [json.loads(line) for line in f]
+        assert [line['tag'] for line in lines] == \
+            ['square'] * 2 + ['two_triangles'] * 2
+        assert all(line['backend'] == 'exact' for line in lines)
+        assert all(line['time_write'] > 0 for line in lines)
+
+        # the runs already in the store are not solved again
+        solve_graph_files.solve_graph_files(
+            filenames, SOLVER_PARAMS, [1, 2], str(tmp_path / 'store')
+        )
+        df = result_store.read_results(
+            str(tmp_path / 'store'), columns=['tag', 'seed_embedding']
+        )
+        assert len(df) == 6
+        assert not df.duplicated().any()
+
+    def test_files_without_metadata(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.mkdir('graphs')
+        for name in ['a', 'b']:
+            graph.save_graph(
+                os.path.join('graphs', f'{name}.npy'),
+                graph.create_graph_hamiltonian_cycles(2, 3),
+            )
+
+        solve_graph_files.solve_graph_files(
+            solve_graph_files.get_graph_filenames('graphs'),
+            SOLVER_PARAMS,
+            [0],
+        )
+
+        # the runs are kept apart from the raw data of the article, and the
+        # runs of graphs with the same parameters are told apart by tag
+        assert not os.path.exists(os.path.join('data', 'raw_data'))
+        df = result_store.read_results(
+            solve_graph_files.GRAPH_RUNS_DIR,
+            columns=process_raw_data.DUPLICATE_KEY_COLUMNS,
+        )
+        assert sorted(df['tag'].tolist()) == ['a', 'b']
+        process_raw_data.check_duplicates(df)
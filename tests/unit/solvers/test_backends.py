@@ -0,0 +1,157 @@
+import threading
+
+import dimod
+import numpy as np
+import pytest
+
+from quantumglare.common import qubo
+from quantumglare.solvers import backends
+
+
+PARAMS = {
+    'num_reads': 10,
+    'anneal_time': 20,
+    'pause_duration': 10,
+    'pause_start': 0.4,
+    'seed_embedding': 0,
+}
+
+
+class TestGetAnnealSchedule:
+    def test_with_pause(self):
+        schedule = backends.get_anneal_schedule(200, 100, 0.4)
+        assert schedule == [[0.0, 0.0], [80.0, 0.4], [180.0, 0.4], [300, 1.0]]
+
+    def test_without_pause(self):
+        schedule = backends.get_anneal_schedule(200, 0, 0.4)
+        assert schedule == [[0.0, 0.0], [200, 1.0]]
+
+
+class TestEstimateQpuAccessTime:
+    def test(self):
+        time_ = backends.estimate_qpu_access_time(PARAMS)
+        assert time_ == pytest.approx(8468.2 + 10 * (30 + 41.54 + 20.54))
+
+
+class TestGetBackend:
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            backends.get_backend('unknown')
+
+    def test_by_name(self):
+        backend = backends.get_backend('exact')
+        assert isinstance(backend, backends.ExactBackend)
+
+
+class TestExactBackend:
+    def test_reads_split_among_ground_states(self):
+        # two ways of covering the square with a triangle plus a pair are
+        # forbidden, the square is the only ground state
+        q = qubo.get_Q([(0, 1), (1, 2), (2, 3), (3, 0), (2, 1), (0, 3)])
+        response, _ = backends.ExactBackend().sample_qubo(q, PARAMS)
+        assert len(response) == 1
+        assert response.record.num_occurrences.tolist() == [10]
+        assert response.first.energy == -4
+
+    def test_reduced(self):
+        # a path is the reduced graph of a presolve, not a valid graph
+        q = qubo.get_Q([(0, 1), (1, 2)])
+
+        response, _ = backends.ClassicalBackend().sample_qubo(
+            q, {**PARAMS, 'reduced': True}
+        )
+        assert response.first.sample == {'(0, 1)': 1, '(1, 2)': 1}
+        response, _ = backends.ClassicalBackend().sample_qubo(q, PARAMS)
+        assert response.first.sample == {'(0, 1)': 0, '(1, 2)': 0}
+
+    def test_coo_qubo(self):
+        edges = [(0, 1), (1, 2), (2, 3), (3, 0), (2, 1), (0, 3)]
+        response, _ = backends.ExactBackend().sample_qubo(
+            qubo.get_coo_qubo(edges), PARAMS
+        )
+        response_expected, _ = backends.ExactBackend().sample_qubo(
+            qubo.get_Q(edges), PARAMS
+        )
+        assert response.first.sample == response_expected.first.sample
+        assert response.first.energy == -4
+
+
+class TestSimulatedAnnealingBackend:
+    def test_finds_triangle(self):
+        q = qubo.get_Q([(0, 1), (1, 2), (2, 0), (2, 1)])
+        response, embedding_info = backends.SimulatedAnnealingBackend().sample_qubo(
+            q, PARAMS
+        )
+        assert response.first.energy == -3
+        assert response.record.num_occurrences.sum() == 10
+        assert embedding_info['embedding_cache_hit'] is None
+
+
+class TestClassicalBackend:
+    def test_all_reads_return_the_solution(self):
+        q = qubo.get_Q([(0, 1), (1, 2), (2, 3), (3, 0), (2, 1), (0, 3)])
+        response, _ = backends.ClassicalBackend().sample_qubo(q, PARAMS)
+        assert len(response) == 1
+        assert response.record.num_occurrences.tolist() == [10]
+        assert response.first.energy == -4
+
+
+class TestUnembedResponse:
+    def test_chain_statistics(self):
+        q = qubo.get_Q([(0, 1), (1, 2), (2, 0)])
+        bqm = dimod.BinaryQuadraticModel.from_qubo(q)
+        embedding_ = {'(0, 1)': [0, 1], '(1, 2)': [2], '(2, 0)': [3, 4, 5]}
+        target_response = dimod.SampleSet.from_samples(
+            (np.array([[1, 1, 1, 1, 1, 1], [1, 0, 1, 1, 1, 0]]), range(6)),
+            vartype='BINARY',
+            energy=[0, 0],
+            num_occurrences=[3, 1],
+        )
+
+        response, chain_info = backends.unembed_response(
+            target_response, embedding_, bqm
+        )
+
+        assert response.record.num_occurrences.tolist() == [3, 1]
+        assert response.record.chain_break_fraction.tolist() == [0, 2 / 3]
+        assert chain_info == {
+            'chain_length_max': 3,
+            'chain_length_mean': 2.0,
+            'chain_break_fraction': 1 / 6,
+        }
+
+
+class TestSolverSession:
+    def test_backend_reused(self):
+        with backends.SolverSession() as session:
+            backend = session.get_backend('exact')
+            assert session.get_backend('exact') is backend
+            assert session.get_backend('tabu') is not backend
+
+    def test_child_sampler_created_once(self, monkeypatch):
+        n_created = []
+        create = backends.MockQPUBackend._create_child_sampler
+
+        def create_counted(self):
+            n_created.append(1)
+            return create(self)
+
+        monkeypatch.setattr(
+            backends.MockQPUBackend, '_create_child_sampler', create_counted
+        )
+        session = backends.SolverSession()
+        threads = [
+            threading.Thread(
+                target=lambda: session.get_backend('mock')._get_child_sampler()
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(n_created) == 1
+
+        session.close()
+        session.get_backend('mock')._get_child_sampler()
+        assert len(n_created) == 2
@@ -0,0 +1,70 @@
+from itertools import product
+
+import numpy as np
+
+from quantumglare.common import graph, presolve
+from quantumglare.solvers import classical_solver
+
+
+class TestFindCycleCover:
+    def test_cycles_with_noise(self):
+        edges = graph.generate_cycles([3] * 5 + [5] * 5, seed=0, relabel=True)
+        edges = np.concatenate(
+            [edges, graph.generate_noise_edges(edges, 20, seed=0)]
+        )
+
+        selection = classical_solver.find_cycle_cover(edges)
+
+        assert graph.is_valid(graph.DiGraph(edges).to_list(selection), edges)
+
+    def test_repairs_cycles_of_length_two(self):
+        # a square with both diagonals in both directions, the square is
+        # the only valid solution
+        edges = [
+            (0, 1), (1, 2), (2, 3), (3, 0), (0, 2), (2, 0), (1, 3), (3, 1),
+        ]
+
+        selection = classical_solver.find_cycle_cover(edges)
+
+        assert selection.tolist() == [0, 1, 2, 3]
+
+    def test_no_solution(self):
+        assert classical_solver.find_cycle_cover([(0, 1), (1, 0)]) is None
+        assert classical_solver.find_cycle_cover(
+            [(0, 1), (1, 2), (2, 0), (2, 3)]
+        ) is None
+
+    def test_reduced_graph(self):
+        edges = [
+            (0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3), (5, 0),
+        ]
+        presolved = presolve.presolve(edges)
+
+        selection = classical_solver.find_cycle_cover(
+            presolved.reduced_graph, reduced=True
+        )
+
+        sample = np.zeros(presolved.reduced_graph.n_edges, dtype=bool)
+        sample[selection] = True
+        assert graph.is_valid_batch(presolved.lift(sample), edges)[0]
+
+    def test_finds_a_solution_whenever_there_is_one(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            n_vertices = rng.integers(3, 7)
+            all_edges = [
+                (u, v) for u in range(n_vertices) for v in range(n_vertices)
+                if u != v
+            ]
+            choice = rng.choice(
+                len(all_edges), min(len(all_edges), 12), replace=False
+            )
+            edges = [all_edges[i] for i in sorted(choice)]
+            samples = np.array(
+                list(product([False, True], repeat=len(edges))), dtype=bool
+            )
+
+            selection = classical_solver.find_cycle_cover(edges)
+
+            assert (selection is not None) \
+                == graph.is_valid_batch(samples, edges).any()
@@ -0,0 +1,55 @@
+import numpy as np
+
+from quantumglare.common import graph, qubo
+from quantumglare.solvers import local_search
+
+
+class TestRepair:
+    def test_valid_solution_does_not_move(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 1), (0, 2)]
+        samples = np.array([[1, 1, 1, 0, 0]], dtype=bool)
+
+        repaired = local_search.repair(samples, edges)
+
+        assert repaired.tolist() == samples.tolist()
+
+    def test_swap_and_refill(self):
+        # (3, 1) is selected instead of (0, 1) and (3, 4): adding either of
+        # them alone raises the energy
+        edges = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (3, 1)]
+        samples = np.array([[0, 1, 1, 0, 1, 1, 1]], dtype=bool)
+
+        repaired = local_search.repair(samples, edges)
+
+        assert repaired.tolist() == [[True] * 6 + [False]]
+
+    def test_energy_never_increases(self):
+        rng = np.random.default_rng(0)
+        edges = graph.generate_cycles([4] * 10, seed=0, relabel=True)
+        edges = np.concatenate(
+            [edges, graph.generate_noise_edges(edges, 10, seed=0)]
+        )
+        samples = rng.random((50, len(edges))) < 0.3
+        Q = qubo.get_Q_sparse(edges)
+
+        repaired = local_search.repair(samples, edges)
+
+        assert np.all(
+            qubo.calculate_energies(Q, repaired)
+            <= qubo.calculate_energies(Q, samples) + 1e-9
+        )
+
+    def test_perturbed_solutions_are_repaired(self):
+        rng = np.random.default_rng(0)
+        edges = graph.generate_cycles([4] * 10, seed=0)
+        edges = np.concatenate(
+            [edges, graph.generate_noise_edges(edges, 10, seed=0)]
+        )
+        samples = np.zeros((20, len(edges)), dtype=bool)
+        samples[:, :40] = True
+        for sample in samples:
+            sample[rng.choice(len(edges), 2, replace=False)] ^= True
+
+        repaired = local_search.repair(samples, edges)
+
+        assert np.all(graph.is_valid_batch(repaired, edges))
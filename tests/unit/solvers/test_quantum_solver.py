@@ -1,5 +1,10 @@
+import dimod
+import numpy as np
 import pandas as pd
-from quantumglare.solvers import quantum_solver
+import pytest
+
+from quantumglare.common import graph, metrics, qubo, utils
+from quantumglare.solvers import backends, quantum_solver
 
 
 class TestGetValidSolutions:
@@ -41,3 +46,317 @@ class TestGetValidSolutions:
             [(1, 2), (2, 3), (3, 1), (4, 5), (5, 6), (6, 4)],
             [(1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 1)],
         ]
+
+    def test_solution_not_at_lowest_energy(self):
+        states_df = pd.DataFrame(
+            columns=['state', 'energy', 'relative_frequency'],
+            data=[
+                ["['(1, 2)', '(2, 3)', '(3, 1)', '(3, 2)']", -3.5, 0.60],
+                ["['(1, 2)', '(2, 3)', '(3, 1)']", -3, 0.30],
+                ["['(2, 3)', '(3, 2)', '(1, 2)']", -3, 0.10],
+        ]
+        )
+        input_graph = [(1, 2), (2, 3), (3, 1), (3, 2)]
+
+        enriched_states_df, solution_frequency, solutions = \
+            quantum_solver.get_valid_solutions(states_df, input_graph)
+
+        assert solution_frequency == 0.30
+        assert solutions == [[(1, 2), (2, 3), (3, 1)]]
+        assert enriched_states_df['is_valid'].tolist() == [False, True, False]
+
+
+class TestGetQpuTiming:
+    def test_simulated_annealing_is_not_qpu_timed(self):
+        q = qubo.get_Q([(0, 1), (1, 2), (2, 0)])
+        response, _ = backends.SimulatedAnnealingBackend().sample_qubo(
+            q, TestSolve.PARAMS
+        )
+        assert response.info.get('timing')
+
+        qpu_timing = quantum_solver.get_qpu_timing([response])
+
+        assert set(qpu_timing.values()) == {None}
+
+    def test_packs(self):
+        responses = [
+            dimod.SampleSet.from_samples(
+                [[0]], 'BINARY', [0], info={'timing': timing}
+            )
+            for timing in [
+                {'qpu_access_time': 100.0, 'qpu_anneal_time_per_sample': 20.0},
+                {'qpu_access_time': 50.0, 'qpu_anneal_time_per_sample': 30.0},
+            ]
+        ]
+
+        qpu_timing = quantum_solver.get_qpu_timing(responses)
+
+        assert qpu_timing['qpu_access_time'] == 150.0
+        assert qpu_timing['qpu_anneal_time_per_sample'] == 30.0
+        # not reported, not zero
+        assert qpu_timing['qpu_programming_time'] is None
+        assert quantum_solver.get_qpu_timing(
+            responses + [dimod.SampleSet.from_samples([[0]], 'BINARY', [0])]
+        )['qpu_access_time'] is None
+
+
+class TestGetValidStates:
+    def test(self):
+        input_graph = [(1, 2), (2, 3), (3, 1), (3, 2)]
+        states = np.packbits(
+            np.array([[1, 1, 1, 0], [0, 1, 0, 1], [1, 1, 1, 0]], dtype=bool),
+            axis=1,
+        )
+        energies = np.array([-3, -1.99, -2.5])
+
+        is_valid = quantum_solver.get_valid_states(
+            states, energies, input_graph
+        )
+
+        assert is_valid.tolist() == [True, False, False]
+
+
+class TestExtractStatesAndCounts:
+    def test_aggregates_identical_samples(self):
+        labels = ['(1, 2)', '(2, 3)', '(3, 1)', '(3, 2)']
+        response = dimod.SampleSet.from_samples(
+            (
+                np.array([[0, 1, 1, 0], [1, 1, 1, 0], [0, 1, 1, 0]]),
+                ['(3, 1)', '(1, 2)', '(2, 3)', '(3, 2)'],
+            ),
+            vartype='BINARY',
+            energy=[-2.0, -3.0, -2.0],
+            num_occurrences=[5, 80, 15],
+        )
+
+        states_df = quantum_solver._extract_states_and_counts(response, labels)
+
+        assert states_df['state'].tolist() == [
+            "['(1, 2)', '(2, 3)', '(3, 1)']",
+            "['(1, 2)', '(2, 3)']",
+        ]
+        assert states_df['energy'].tolist() == [-3.0, -2.0]
+        assert states_df['absolute_frequency'].tolist() == [80, 20]
+
+    def test_render_states(self):
+        labels = [f'({i}, {i + 1})' for i in range(10)]
+        states = np.packbits(
+            np.array([[1] + [0] * 8 + [1], [0] * 10], dtype=bool), axis=1
+        )
+
+        assert quantum_solver.render_states(states, labels) == [
+            "['(0, 1)', '(9, 10)']", '[]'
+        ]
+
+    def test_get_state_edges(self):
+        states = np.packbits(
+            np.array([[1, 0, 1], [0, 0, 0], [0, 1, 1]], dtype=bool), axis=1
+        )
+
+        state_edges = quantum_solver.get_state_edges(
+            states, np.array([7, 3, 5])
+        )
+
+        assert [edges.tolist() for edges in state_edges] == [
+            [7, 5], [], [3, 5]
+        ]
+        assert quantum_solver.get_state_edges(states[:0], [7, 3, 5]) == []
+
+
+class TestGetPacks:
+    def test_one_component_per_pack(self):
+        packs = quantum_solver.get_packs(np.array([0, 0, 1, 2]), 3)
+        assert [pack.tolist() for pack in packs] == [[0], [1], [2]]
+
+    def test_pack_edges(self):
+        edge_components = np.array([0, 0, 0, 1, 1, 2, 2, 2, 2, 3])
+        packs = quantum_solver.get_packs(edge_components, 4, pack_edges=5)
+        assert [pack.tolist() for pack in packs] == [[0, 1], [2, 3]]
+
+
+class TestSolve:
+    PARAMS = {
+        'tag': 'test',
+        'n_cycles': 4,
+        'cycle_length': 4,
+        'n_vertices': 16,
+        'p_noise': 0,
+        'n_edges_noise': 16,
+        'seed_input_graph': 0,
+        'seed_embedding': 0,
+        'num_reads': 10,
+        'anneal_time': 20,
+        'pause_duration': 0,
+        'pause_start': 0.4,
+        'backend': 'exact',
+    }
+    # four squares, each with both diagonals in both directions, too large
+    # for the exact backend as a whole
+    INPUT_GRAPH = [
+        edge
+        for start in [0, 4, 8, 12]
+        for edge in [
+            (start, start + 1), (start + 1, start + 2),
+            (start + 2, start + 3), (start + 3, start),
+            (start, start + 2), (start + 2, start),
+            (start + 1, start + 3), (start + 3, start + 1),
+        ]
+    ]
+
+    def test_stage_metrics(self):
+        run_metrics = metrics.Metrics()
+        output = quantum_solver.solve(
+            self.INPUT_GRAPH,
+            {**self.PARAMS, 'decompose': True},
+            run_metrics=run_metrics,
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        for stage in ['qubo', 'submit', 'decode', 'validate']:
+            assert record[f'time_{stage}'] > 0
+            assert record[f'time_{stage}'] == run_metrics.get_time(stage)
+        assert record['time_wait'] == 0
+        assert record['time_repair'] == 0
+        assert record['peak_memory'] is None
+
+    def test_decompose(self):
+        output = quantum_solver.solve(
+            self.INPUT_GRAPH, {**self.PARAMS, 'decompose': True}
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['n_components'] == 4
+        assert record['solution_frequency'] == 1.0
+        assert len(record['solutions']) == 1
+        assert graph.is_valid(record['solutions'][0], self.INPUT_GRAPH)
+
+    def test_pack_components(self):
+        output = quantum_solver.solve(
+            self.INPUT_GRAPH[:16],
+            {**self.PARAMS, 'decompose': True, 'pack_edges': 16},
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['n_components'] == 2
+        assert record['solution_frequency'] == 1.0
+        assert graph.is_valid(record['solutions'][0], self.INPUT_GRAPH[:16])
+
+    def test_pack_joint_validity(self, monkeypatch):
+        # each read solves one of the two triangles only, so no read is a
+        # solution although each triangle is solved by half of the reads
+        input_graph = graph.create_graph_hamiltonian_cycles(2, 3)
+        response = dimod.SampleSet.from_samples(
+            (np.array([[1, 1, 1, 0, 0, 0], [0, 0, 0, 1, 1, 1]]),
+             qubo.get_labels(input_graph)),
+            vartype='BINARY',
+            energy=[-3, -3],
+            num_occurrences=[5, 5],
+        )
+
+        class Backend:
+            name = 'test'
+
+            def sample_qubo(self, Q, params):
+                return response, {
+                    'time_embedding': 0.0,
+                    'embedding_cache_hit': None,
+                    'time_embedding_saved': 0.0,
+                }
+
+        monkeypatch.setitem(backends.BACKENDS, 'test', Backend)
+        output = quantum_solver.solve(
+            input_graph,
+            {**self.PARAMS, 'backend': 'test', 'decompose': True,
+             'pack_edges': 6},
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['n_components'] == 2
+        assert record['solution_frequency'] == 0.0
+        states_df = record['dwave_solution_df']
+        assert states_df.groupby('component')['is_valid'].any().tolist() \
+            == [True, True]
+
+    def test_too_large_without_decomposition(self):
+        with pytest.raises(ValueError):
+            quantum_solver.solve(self.INPUT_GRAPH, self.PARAMS)
+
+    def test_presolve(self):
+        # the edges between the squares lie on no cycle
+        input_graph = self.INPUT_GRAPH + [(3, 4), (7, 8), (11, 12)]
+        output = quantum_solver.solve(
+            input_graph, {**self.PARAMS, 'presolve': True, 'decompose': True}
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['n_removed_edges'] == 3
+        assert record['n_components'] == 4
+        assert record['solution_frequency'] == 1.0
+        assert graph.is_valid(record['solutions'][0], input_graph)
+        # the states are indices of the edges of the input graph
+        states_df = record['dwave_solution_df']
+        for state, is_valid in zip(states_df['state'], states_df['is_valid']):
+            assert np.all(state < 32)
+            if is_valid:
+                edges = [input_graph[i] for i in state]
+                assert sorted(edges) == sorted(
+                    e for e in record['solutions'][0] if e in edges
+                )
+
+    def test_classical(self):
+        input_graph = self.INPUT_GRAPH + [(3, 4), (7, 8), (11, 12)]
+        output = quantum_solver.solve(
+            input_graph,
+            {**self.PARAMS, 'backend': 'classical', 'presolve': True},
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['solution_frequency'] == 1.0
+        assert graph.is_valid(record['solutions'][0], input_graph)
+        # the classical backend has no anneal schedule
+        assert record['anneal_time'] is None
+        assert record['pause_duration'] is None
+        assert record['pause_start'] is None
+        assert record['qpu_access_time'] is None
+
+    def test_presolve_fixes_every_edge(self):
+        input_graph = graph.create_graph_hamiltonian_cycles(3, 5)
+        output = quantum_solver.solve(
+            input_graph, {**self.PARAMS, 'presolve': True}
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['n_fixed_edges'] == 15
+        assert record['n_components'] == 0
+        assert record['solution_frequency'] == 1.0
+        assert graph.is_valid(record['solutions'][0], input_graph)
+
+    def test_repair(self, monkeypatch):
+        input_graph = [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (3, 1)]
+        response = dimod.SampleSet.from_samples(
+            (np.array([[0, 1, 1, 0, 1, 1, 1], [1, 1, 1, 1, 1, 1, 0]]),
+             qubo.get_labels(input_graph)),
+            vartype='BINARY',
+            energy=[-5, -6],
+            num_occurrences=[6, 4],
+        )
+
+        class Backend:
+            name = 'test'
+
+            def sample_qubo(self, Q, params):
+                return response, {
+                    'time_embedding': 0.0,
+                    'embedding_cache_hit': None,
+                    'time_embedding_saved': 0.0,
+                }
+
+        monkeypatch.setitem(backends.BACKENDS, 'test', Backend)
+        output = quantum_solver.solve(
+            input_graph, {**self.PARAMS, 'backend': 'test', 'repair': True}
+        )
+
+        record = dict(zip(utils.OUTPUT_COLUMNS, output[0]))
+        assert record['solution_frequency'] == 0.4
+        assert record['solution_frequency_repaired'] == 1.0
+        assert len(record['solutions']) == 1